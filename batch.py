@@ -0,0 +1,180 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_NO_SIGNAL_HANDLERS", "1")  # let Pool.terminate stop workers
+
+import bot
+import main
+
+metrics = ("survival", "score", "wave", "coinsEarned")
+# --check swaps one spec key at a time into checkBase; each swap has to change the frames the bot sends
+checkBase = {"aim": "nearest", "move": "collect", "dash": "never", "reload": "empty", "buys": []}
+checkVariants = [
+    ("aim", "jitter"), ("move", "stand"), ("move", "kite"), ("dash", "panic"), ("dash", "cooldown"),
+    ("reload", "lull"), ("buys", [option["effect"] for option in main.shopOptions]),
+]
+
+
+def applyOverrides(balance, costs):
+    # runs in every worker before its first job, so sweeps never touch the parent
+    main.balance.update(balance)
+    for option in main.shopOptions:
+        if option["name"] in costs:
+            option["cost"] = costs[option["name"]]
+
+
+def runJob(job):
+    seed, botName, seconds, backend = job
+    result = bot.playRun(seed, bot.botPresets[botName], seconds=seconds, backend=backend)
+    result["bot"] = botName
+    return result
+
+
+def summarize(results):
+    # per bot: how often it died, the spread of each metric and its favourite buys
+    summary = {}
+    for botName in sorted({result["bot"] for result in results}):
+        runs = [result for result in results if result["bot"] == botName]
+        entry = {"runs": len(runs), "died": sum(result["died"] for result in runs) / len(runs)}
+        for metric in metrics:
+            ordered = sorted(result[metric] for result in runs)
+            entry[metric] = {
+                "mean": sum(ordered) / len(ordered),
+                "p10": main.percentile(ordered, 0.1),
+                "p50": main.percentile(ordered, 0.5),
+                "p90": main.percentile(ordered, 0.9),
+            }
+        bought = {}
+        for result in runs:
+            for effect in result["bought"]:
+                bought[effect] = bought.get(effect, 0) + 1
+        entry["bought"] = dict(sorted(bought.items(), key=lambda item: -item[1]))
+        summary[botName] = entry
+    return summary
+
+
+def runBatch(jobs, workers, outPath, balance=None, costs=None):
+    # results are appended to outPath as JSON lines in completion order
+    results = []
+    # spawned rather than forked: a forked worker inherits pygame's SDL state and can hang on exit
+    context = multiprocessing.get_context("spawn")
+    with open(outPath, "w") as handle, context.Pool(
+        workers, initializer=applyOverrides, initargs=(balance or {}, costs or {})
+    ) as pool:
+        for result in pool.imap_unordered(runJob, jobs):
+            handle.write(json.dumps(result) + "\n")
+            handle.flush()
+            results.append(result)
+        pool.close()
+        pool.join()
+    return results
+
+
+def botFrames(spec, seed, seconds, backend=None):
+    state = main.buildGameState(backend, headless=True, seed=seed)
+    player = bot.createBot(spec, seed)
+    frames = []
+    while len(frames) < seconds * main.fps and not state["gameOver"]:
+        frame = bot.botFrame(player, state)
+        main.stepGame(state, 1 / main.fps, frame)
+        frames.append(sorted(frame.items()))
+    return frames
+
+
+def checkSpecKeys(seed, seconds, backend=None):
+    base = botFrames(checkBase, seed, seconds, backend)
+    return [f"{key}={value}" for key, value in checkVariants if botFrames(dict(checkBase, **{key: value}), seed, seconds, backend) == base]
+
+
+def checkPresets(results):
+    # two presets that finish every shared seed on the same numbers are one bot under two names
+    outcomes = {}
+    for result in results:
+        outcomes.setdefault(result["bot"], {})[result["seed"]] = tuple(result[metric] for metric in metrics)
+    names = sorted(outcomes)
+    return [(first, second) for index, first in enumerate(names) for second in names[index + 1:] if outcomes[first] == outcomes[second]]
+
+
+def printSummary(summary):
+    print(f"{'bot':<8} {'runs':>5} {'died':>5}  " + "  ".join(f"{metric + ' p10/p50/p90':>28}" for metric in metrics))
+    for botName, entry in summary.items():
+        spreads = "  ".join(
+            f"{entry[metric]['p10']:>8.0f} {entry[metric]['p50']:>9.0f} {entry[metric]['p90']:>9.0f}" for metric in metrics
+        )
+        print(f"{botName:<8} {entry['runs']:>5} {entry['died']:>5.0%}  {spreads}")
+        if entry["bought"]:
+            print(f"{'':<8} bought {entry['bought']}")
+
+
+def parseSetting(text):
+    name, _, value = text.partition("=")
+    if not value:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text!r}")
+    return name, float(value) if "." in value else int(value)
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Last Hope batch simulator for balance sweeps")
+    parser.add_argument("--runs", type=int, default=100, help="seeds per bot")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--bots", nargs="+", choices=list(bot.botPresets), default=list(bot.botPresets))
+    parser.add_argument("--seconds", type=float, default=600.0, help="cap on survival time per run")
+    parser.add_argument("--backend", choices=["dict", "numpy"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="batch.jsonl", help="per-run results, one JSON object per line")
+    parser.add_argument("--summary", help="also write the aggregated distributions to this JSON file")
+    parser.add_argument("--set", type=parseSetting, action="append", default=[], metavar="NAME=VALUE",
+                        help=f"override a balance knob: {', '.join(main.balance)}")
+    parser.add_argument("--cost", type=parseSetting, action="append", default=[], metavar="NAME=VALUE",
+                        help="override a shop card's cost, e.g. 'coin printer=12'")
+    parser.add_argument("--scaling", action="store_true", help="time the batch at 1..--workers processes")
+    parser.add_argument("--check", action="store_true",
+                        help="fail if a bot spec key leaves the input frames unchanged or two presets play identically")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+    unknown = [name for name, _ in args.set if name not in main.balance]
+    unknown += [name for name, _ in args.cost if name not in {option["name"] for option in main.shopOptions}]
+    if unknown:
+        raise SystemExit(f"unknown balance knobs or shop cards: {', '.join(unknown)}")
+    jobs = [
+        (seed, botName, args.seconds, args.backend)
+        for botName in args.bots
+        for seed in range(args.first_seed, args.first_seed + args.runs)
+    ]
+    if args.scaling:
+        baseline = None
+        for workers in sorted({1, 2, 4, 8, 16, args.workers} & set(range(1, args.workers + 1))):
+            started = time.perf_counter()
+            runBatch(jobs, workers, args.out, dict(args.set), dict(args.cost))
+            rate = len(jobs) / (time.perf_counter() - started)
+            baseline = baseline or rate
+            print(f"{workers:>3} workers {rate:8.1f} runs/s  {rate / baseline / workers:6.0%} per-core efficiency")
+        raise SystemExit
+    started = time.perf_counter()
+    results = runBatch(jobs, args.workers, args.out, dict(args.set), dict(args.cost))
+    elapsed = time.perf_counter() - started
+    print(f"{len(results)} runs on {args.workers} workers in {elapsed:.1f}s ({len(results) / elapsed:.1f} runs/s), wrote {args.out}")
+    summary = summarize(results)
+    printSummary(summary)
+    if args.summary:
+        with open(args.summary, "w") as handle:
+            json.dump({"balance": dict(main.balance, **dict(args.set)), "costs": dict(args.cost), "bots": summary}, handle, indent=2)
+    if args.check:
+        applyOverrides(dict(args.set), dict(args.cost))
+        inert = checkSpecKeys(args.first_seed, min(args.seconds, 60.0), args.backend)
+        twins = checkPresets(results)
+        for variant in inert:
+            print(f"check: {variant} sends the same frames as {checkBase}")
+        for first, second in twins:
+            print(f"check: {first} and {second} give identical results on every seed")
+        if inert or twins:
+            raise SystemExit(1)
+        print(f"check: {len(checkVariants)} spec variants change the frames, {len(summary)} presets all differ")
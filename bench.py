@@ -0,0 +1,697 @@
+import argparse
+import copy
+import gc
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import main
+
+
+def bruteForceCollisions(state, dt):
+    # all-pairs sweeps, kept as the reference for the grid path
+    player = state["player"]
+    enemies = state["enemies"]
+    hits = {}
+    for shot in state["shots"]:
+        target, first = None, None
+        for index, enemy in enumerate(enemies):
+            dx = shot.prev.x - enemy.prev.x
+            dy = shot.prev.y - enemy.prev.y
+            t = main.sweepHitTime(
+                dx, dy, shot.pos.x - enemy.pos.x - dx, shot.pos.y - enemy.pos.y - dy, enemy.size + shot.radius
+            )
+            if t is not None and (first is None or t < first):
+                target, first = index, t
+        if target is not None:
+            hits.setdefault(target, []).append(shot)
+    for index, enemy in enumerate(list(enemies)):
+        for shot in hits.get(index, []):
+            enemy.hp -= shot.damage
+            state["shots"].remove(shot)
+            state["score"] += 6
+        if enemy.hp <= 0:
+            enemies.remove(enemy)
+            state["score"] += 30
+            main.dropCoins(state, enemy.pos)
+            continue
+        if enemy.pos.distance_to(player.pos) < enemy.size + player.radius:
+            player.health -= 35 * dt
+            player.heat += 0.1 * dt * main.fps
+
+
+def buildCrowd(state, count, seed):
+    # spread the crowd over an arena that grows with it so density stays constant
+    rng = random.Random(seed)
+    scale = max(1.0, (count / 1000) ** 0.5)
+    arenaWidth, arenaHeight = main.width * scale, main.height * scale
+    state["player"].pos = pygame.Vector2(arenaWidth / 2, arenaHeight / 2)
+    state["enemies"] = [
+        main.Enemy(
+            pygame.Vector2(rng.uniform(0, arenaWidth), rng.uniform(0, arenaHeight)),
+            speed=150,
+            hp=rng.randint(1, 3),
+            size=rng.randint(18, 32),
+        )
+        for _ in range(count)
+    ]
+    state["shots"] = [
+        main.Shot(pos=(x, y), vel=(650, 0), life=1.3, prev=(x - 650 / main.fps, y))
+        for x, y in ((rng.uniform(0, arenaWidth), rng.uniform(0, arenaHeight)) for _ in range(count // 4))
+    ]
+    state["coins"] = [
+        main.Coin(pos=(rng.uniform(0, arenaWidth), rng.uniform(0, main.cityFloor)))
+        for _ in range(count)
+    ]
+
+
+def cloneSimulation(template):
+    # deep copy the mutable parts of a state, sharing the player's sprite frames
+    state = dict(template)
+    for key in ("shots", "enemies", "coins", "coinPiles", "rng"):
+        state[key] = copy.deepcopy(template[key])
+    state["player"] = copy.copy(template["player"])
+    state["player"].pos = template["player"].pos.copy()
+    return state
+
+
+def timeCollisions(template, collide, repeats):
+    samples = []
+    for _ in range(repeats):
+        state = cloneSimulation(template)
+        state["rng"].seed(1)
+        start = time.perf_counter()
+        collide(state, 1 / main.fps)
+        main.updateCoins(state, 1 / main.fps)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], state
+
+
+def checkAgainstReference(template):
+    results = []
+    for collide in (main.handleCollisions, bruteForceCollisions):
+        state = cloneSimulation(template)
+        state["rng"].seed(1)
+        collide(state, 1 / main.fps)
+        results.append((
+            state["score"],
+            len(state["shots"]),
+            [(enemy.pos.x, enemy.pos.y, enemy.hp) for enemy in state["enemies"]],
+            round(state["player"].health, 6),
+        ))
+    return results[0] == results[1]
+
+
+def edgeShotScore(backend, rate):
+    # a still enemy just past the left edge, in reach of the shot's last step before it leaves the arena
+    state = main.buildGameState(backend, headless=True, seed=1)
+    state["menu"] = False
+    state["spawnTimer"] = math.inf
+    state["player"].pos.update(100, 300)
+    state["player"].prev.update(100, 300)
+    main.addEntity(state, "enemies", main.Enemy(pygame.Vector2(-80, 300), speed=0, hp=1, size=32))
+    frame = main.createInputFrame(fire=True, aim=(-80, 300))
+    for _ in range(rate):
+        main.stepGame(state, 1 / rate, frame)
+    return state["score"]
+
+
+def checkTickRates():
+    # a shot must land the same at 20 ticks per second as at 60
+    for backend in ["dict"] + (["numpy"] if main.np is not None else []):
+        scores = {rate: edgeShotScore(backend, rate) for rate in (60, 20)}
+        if scores[20] != scores[60]:
+            raise SystemExit(f"{backend} collisions differ by tick rate: score {scores[60]} at 60 Hz, {scores[20]} at 20 Hz")
+
+
+def benchCollisions(counts, repeats, bruteLimit):
+    checkTickRates()
+    base = main.buildGameState(headless=True)
+    print(f"{'entities':>9} {'grid ms':>9} {'ns/entity':>10} {'brute ms':>9}")
+    for count in counts:
+        template = cloneSimulation(base)
+        buildCrowd(template, count, seed=count)
+        if not checkAgainstReference(template):
+            raise SystemExit(f"grid collisions diverged from the reference at {count} entities")
+        gridTime, _ = timeCollisions(template, main.handleCollisions, repeats)
+        entities = count + count // 4 + count
+        bruteText = "-"
+        if count <= bruteLimit:
+            bruteTime, _ = timeCollisions(template, bruteForceCollisions, max(1, repeats // 4))
+            bruteText = f"{bruteTime * 1000:9.2f}"
+        print(f"{count:>9} {gridTime * 1000:9.2f} {gridTime / entities * 1e9:10.0f} {bruteText:>9}")
+
+
+def populateSwarm(state, count, seed):
+    # identical synthetic swarm for either backend, ignoring maxEnemies
+    rng = random.Random(seed)
+    scatterEnemies(state, count, rng)
+    scatterShots(state, count // 4, rng)
+    scatterCoins(state, count, rng)
+
+
+def scatterEnemies(state, count, rng):
+    for _ in range(count):
+        main.addEntity(state, "enemies", main.Enemy(
+            pygame.Vector2(rng.uniform(-80, main.width + 80), rng.uniform(-80, main.height + 80)),
+            speed=rng.uniform(100, 190),
+            hp=rng.randint(1, 4),
+            size=rng.randint(18, 32),
+        ))
+
+
+def scatterShots(state, count, rng):
+    for _ in range(count):
+        angle = rng.uniform(0, 360)
+        main.addEntity(state, "shots", main.Shot(
+            pos=(rng.uniform(0, main.width), rng.uniform(0, main.height)),
+            vel=pygame.Vector2(650, 0).rotate(angle),
+            life=rng.uniform(0.2, 1.3),
+        ))
+
+
+def scatterCoins(state, count, rng):
+    for _ in range(count):
+        main.addEntity(state, "coins", main.Coin(
+            pos=(rng.uniform(0, main.width), rng.uniform(0, main.cityFloor)),
+            vel=(rng.uniform(-120, 120), rng.uniform(-260, -120)),
+            value=rng.choice([1, 1, 2]),
+        ))
+
+
+def entityLists(state):
+    if state["backend"] == "numpy":
+        return {kind: main.entityRecords(state[kind]) for kind in ("enemies", "shots", "coins")}
+    return {kind: state[kind] for kind in ("enemies", "shots", "coins")}
+
+
+def backendDrift(first, second):
+    if (first["score"], first["coinsBank"], first["coinPiles"]) != (second["score"], second["coinsBank"], second["coinPiles"]):
+        return float("inf")
+    drift = 0.0
+    firstLists, secondLists = entityLists(first), entityLists(second)
+    for kind in firstLists:
+        if len(firstLists[kind]) != len(secondLists[kind]):
+            return float("inf")
+        for a, b in zip(firstLists[kind], secondLists[kind]):
+            drift = max(drift, a.pos.distance_to(b.pos))
+    return drift
+
+
+def benchBackends(counts, frames):
+    if main.np is None:
+        raise SystemExit("numpy is not installed")
+    print(f"{'entities':>9} {'dict ms':>9} {'numpy ms':>9} {'speedup':>8} {'drift px':>9}")
+    dt = 1 / main.fps
+    idle = main.createInputFrame()
+    for count in counts:
+        states, timings = {}, {}
+        for backend in ("dict", "numpy"):
+            state = main.buildGameState(backend, headless=True, seed=count)
+            state["menu"] = False
+            populateSwarm(state, count, seed=count)
+            samples = []
+            for _ in range(frames):
+                start = time.perf_counter()
+                main.updateGame(state, dt, idle)
+                samples.append(time.perf_counter() - start)
+            samples.sort()
+            states[backend] = state
+            timings[backend] = samples[len(samples) // 2]
+        drift = backendDrift(states["dict"], states["numpy"])
+        print(
+            f"{count:>9} {timings['dict'] * 1000:9.2f} {timings['numpy'] * 1000:9.2f}"
+            f" {timings['dict'] / timings['numpy']:7.1f}x {drift:9.2g}"
+        )
+
+
+def importCosts(module):
+    # one fresh interpreter; -X importtime reports every module's cumulative cost in microseconds
+    probe = f"import {module}, pygame; raise SystemExit(pygame.get_init() or pygame.display.get_init() or pygame.font.get_init())"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe], capture_output=True, text=True, cwd=os.path.dirname(main.__file__)
+    )
+    costs = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and line.count("|") == 2:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                costs.setdefault(name.strip(), int(cumulative) / 1000)
+    return costs, result.returncode != 0
+
+
+def benchStartup(repeats, importBudget):
+    # import: a fresh `import main`, minus pygame's own import, which no change here can shave;
+    # it fails the run past importBudget ms or if importing brought up any SDL subsystem
+    samples, started = [], False
+    for _ in range(max(1, repeats // 4)):
+        costs, initialised = importCosts("main")
+        samples.append((costs["main"] - costs["pygame"], costs["pygame"]))
+        started = started or initialised
+    samples.sort()
+    own, pygameCost = samples[len(samples) // 2]
+    print(f"{'import':<12} {own:8.2f} ms  (+{pygameCost:.0f} ms importing pygame itself, budget {importBudget:.0f} ms)")
+    # cold: no disk cache; warm: disk cache but a fresh process; reboot: R in a running game
+    def timeBuild(clearDisk, clearMemory):
+        samples = []
+        for _ in range(repeats):
+            if clearDisk:
+                for name in ("player.json", "player.bgra"):
+                    path = os.path.join(main.assetCacheDir, name)
+                    if os.path.exists(path):
+                        os.remove(path)
+            if clearMemory:
+                main.spriteCache.clear()
+            start = time.perf_counter()
+            main.buildGameState()
+            samples.append(time.perf_counter() - start)
+        samples.sort()
+        return samples[len(samples) // 2] * 1000
+
+    print(f"{'cold start':<12} {timeBuild(True, True):8.2f} ms")
+    print(f"{'warm start':<12} {timeBuild(False, True):8.2f} ms")
+    print(f"{'reboot':<12} {timeBuild(False, False):8.2f} ms")
+    if started:
+        raise SystemExit("importing main started an SDL subsystem")
+    if own > importBudget:
+        raise SystemExit(f"importing main took {own:.2f} ms, over the {importBudget:.0f} ms budget")
+
+
+def countingRecord(base, counter):
+    # a drop-in record type that tallies every fresh allocation
+    class Counted(base):
+        __slots__ = ()
+
+        def __init__(self, *args, **kwargs):
+            counter[base.__name__] += 1
+            super().__init__(*args, **kwargs)
+
+    return Counted
+
+
+def sustainedFire(frames, seed):
+    # a turret that never stops shooting into a steady stream of enemies
+    state = main.buildGameState(headless=True, seed=seed)
+    state["menu"] = False
+    player = state["player"]
+    player.maxHealth = player.health = 10 ** 9
+    player.fireDelay = 0
+    player.coolRate = 10 ** 6
+    player.maxAmmo = player.ammo = 10 ** 9
+    dt = 1 / main.fps
+    pauses = []
+    started = {}
+
+    def watchGc(phase, info):
+        if phase == "start":
+            started["at"] = time.perf_counter()
+        elif "at" in started:
+            pauses.append(time.perf_counter() - started.pop("at"))
+
+    for _ in range(frames // 4):
+        main.stepGame(state, dt, main.turretPolicy(state))
+    gc.collect()
+    collections = sum(stats["collections"] for stats in gc.get_stats())
+    blocks = sys.getallocatedblocks()
+    counter = {"Shot": 0, "Coin": 0}
+    recordTypes = main.Shot, main.Coin
+    main.Shot, main.Coin = countingRecord(main.Shot, counter), countingRecord(main.Coin, counter)
+    gc.callbacks.append(watchGc)
+    samples = []
+    try:
+        for _ in range(frames):
+            if len(state["enemies"]) < 20:
+                main.addEntity(state, "enemies", main.createEnemy(state["rng"], state["wave"]))
+            start = time.perf_counter()
+            main.stepGame(state, dt, main.turretPolicy(state))
+            samples.append(time.perf_counter() - start)
+    finally:
+        gc.callbacks.remove(watchGc)
+        main.Shot, main.Coin = recordTypes
+    samples.sort()
+    return {
+        "frame": main.percentile(samples, 0.5) * 1000,
+        "frameP99": main.percentile(samples, 0.99) * 1000,
+        "collections": sum(stats["collections"] for stats in gc.get_stats()) - collections,
+        "gcWorst": max(pauses, default=0.0) * 1000,
+        "blocksPerFrame": (sys.getallocatedblocks() - blocks) / frames,
+        "recordsPerFrame": (counter["Shot"] + counter["Coin"]) / frames,
+    }
+
+
+def benchPools(frames, seed):
+    limit = main.poolLimit
+    print(
+        f"{'pools':<6} {'frame ms':>9} {'p99 ms':>8} {'new/frame':>10} {'gc runs':>8} {'gc worst':>9}"
+        f" {'blocks/frame':>13}"
+    )
+    try:
+        for label, poolLimit in (("off", 0), ("on", limit)):
+            main.poolLimit = poolLimit
+            main.shotPool.clear()
+            main.coinPool.clear()
+            report = sustainedFire(frames, seed)
+            print(
+                f"{label:<6} {report['frame']:9.3f} {report['frameP99']:8.3f} {report['recordsPerFrame']:10.2f}"
+                f" {report['collections']:8}"
+                f" {report['gcWorst']:9.3f} {report['blocksPerFrame']:13.1f}"
+            )
+    finally:
+        main.poolLimit = limit
+
+
+def benchSession(minutes, seed, backend):
+    # an immortal turret over a long run: per-tick cost should stay flat from minute to minute
+    state = main.buildGameState(backend, headless=True, seed=seed)
+    state["menu"] = False
+    state["player"].maxHealth = state["player"].health = 10 ** 9
+    dt = 1 / main.fps
+    print(f"{'minute':>6} {'tick ms':>8} {'p99 ms':>7} {'coins':>6} {'piled':>6} {'blocks':>9}")
+    for minute in range(1, minutes + 1):
+        samples = []
+        for _ in range(60 * main.fps):
+            start = time.perf_counter()
+            main.stepGame(state, dt, main.turretPolicy(state))
+            samples.append(time.perf_counter() - start)
+        samples.sort()
+        print(
+            f"{minute:>6} {sum(samples) / len(samples) * 1000:8.3f} {main.percentile(samples, 0.99) * 1000:7.3f}"
+            f" {main.entityCount(state, 'coins'):>6} {sum(state['coinPiles']):>6} {sys.getallocatedblocks():>9}"
+        )
+
+
+def benchPipeline(counts, frames, seed, backend):
+    # the windowed loop, serial and with the simulation on a worker thread; uncapped
+    # for throughput, then capped at fps for frame-time variance
+    print(
+        f"{'mode':<10} {'enemies':>8} {'fps':>7} {'ticks/s':>8} {'capped ms':>10} {'stdev ms':>9} {'p99 ms':>7}"
+    )
+    for count in counts:
+        for mode, play in (("serial", main.playSerial), ("pipelined", main.playPipelined)):
+            row = []
+            for maxFps in (0, main.fps):
+                session = main.openSession(backend, seed=seed)
+                state = session["state"]
+                state["menu"] = False
+                state["player"].maxHealth = state["player"].health = 10 ** 9
+                scatterEnemies(state, count, random.Random(seed))
+                session["frameTimes"] = []
+                start = time.perf_counter()
+                play(session, policy=main.turretPolicy, frames=frames, maxFps=maxFps)
+                elapsed = time.perf_counter() - start
+                samples = sorted(session["frameTimes"][1:])
+                mean = sum(samples) / len(samples)
+                stdev = (sum((sample - mean) ** 2 for sample in samples) / len(samples)) ** 0.5
+                row.append((frames / elapsed, session["ticks"] / elapsed, mean, stdev, main.percentile(samples, 0.99)))
+            (rate, ticks, _, _, _), (_, _, mean, stdev, p99) = row
+            print(
+                f"{mode:<10} {count:>8} {rate:7.1f} {ticks:8.1f} {mean * 1000:10.2f} {stdev * 1000:9.2f} {p99 * 1000:7.2f}"
+            )
+
+
+def benchSnapshots(counts, repeats):
+    # keyframes are taken during play, so writing one has to fit in a frame
+    backends = ["dict"] + (["numpy"] if main.np is not None else [])
+    print(f"{'backend':<8} {'entities':>9} {'KB':>7} {'save ms':>8} {'restore ms':>11}")
+    for backend in backends:
+        for count in counts:
+            state = main.buildGameState(backend, headless=True, seed=count)
+            state["menu"] = False
+            populateSwarm(state, count, seed=count)
+            target = main.buildGameState(backend, headless=True)
+            saves, restores = [], []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                data = main.snapshotState(state)
+                saves.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                main.restoreSnapshot(target, data)
+                restores.append(time.perf_counter() - start)
+            if main.snapshotState(target) != data:
+                raise SystemExit(f"{backend} snapshot did not round-trip at {count} entities")
+            saves.sort()
+            restores.sort()
+            entities = sum(main.entityCount(state, kind) for kind in ("enemies", "shots", "coins"))
+            print(
+                f"{backend:<8} {entities:>9} {len(data) / 1024:7.0f} {saves[len(saves) // 2] * 1000:8.2f}"
+                f" {restores[len(restores) // 2] * 1000:11.2f}"
+            )
+
+
+def benchReplay(path, repeats):
+    # a recorded session as a fixture: replay it headless and check it still lands where it did
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        state, recording = main.replayInputLog(path)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    frames = len(recording["frames"])
+    result = {key: state[key] for key in ("score", "wave", "coinsBank")}
+    print(f"{path}: {frames} frames, {samples[len(samples) // 2] / max(1, frames) * 1e6:.1f} us/frame, ending at {result}")
+    if recording["expected"] is not None and recording["expected"] != result:
+        raise SystemExit(f"replay diverged: the recording ended at {recording['expected']}")
+
+
+# stress scenarios: the real runGame frame, scripted, with per-phase timings
+
+def idlePolicy(state):
+    return main.createInputFrame()
+
+
+def setupMenu(state, rng):
+    pass
+
+
+def setupWave(state, rng):
+    state["menu"] = False
+
+
+def setupCrowd(state, rng):
+    state["menu"] = False
+    for _ in range(main.maxEnemies):
+        main.addEntity(state, "enemies", main.createEnemy(state["rng"], state["wave"]))
+
+
+def setupSwarm(state, rng):
+    state["menu"] = False
+    scatterEnemies(state, 5000, rng)
+
+
+def setupHorde(state, rng):
+    # most of the crowd still off-screen and closing in, where the LOD scheduler slices their updates
+    state["menu"] = False
+    for _ in range(3000):
+        angle, distance = rng.uniform(0, 2 * math.pi), rng.uniform(700, 2500)
+        main.addEntity(state, "enemies", main.Enemy(
+            pygame.Vector2(main.width / 2 + distance * math.cos(angle), main.height / 2 + distance * math.sin(angle)),
+            speed=rng.uniform(100, 190),
+            hp=rng.randint(1, 4),
+            size=rng.randint(18, 32),
+        ))
+
+
+def setupCoinLitter(state, rng):
+    state["menu"] = False
+    scatterCoins(state, 4000, rng)
+
+
+def setupParticles(state, rng):
+    # the full budget alive at once; a minute-long lifetime keeps the count there
+    state["menu"] = False
+    particles = state["particles"]
+    if particles is None:
+        return
+    count = len(particles["life"])
+    for field, value in (("life", 60.0), ("span", 60.0)):
+        particles[field][:] = value
+    particles["pos"][:] = [(rng.uniform(0, main.width), rng.uniform(0, main.cityFloor)) for _ in range(count)]
+    particles["prev"][:] = particles["pos"]
+    particles["vel"][:] = [(rng.uniform(-40, 40), rng.uniform(-40, 40)) for _ in range(count)]
+    particles["kind"][:] = [rng.randrange(len(main.particleNames)) for _ in range(count)]
+    particles["count"] = count
+
+
+scenarios = {
+    "menu": {"setup": setupMenu, "policy": idlePolicy, "frames": 600, "immortal": False},
+    "wave1": {"setup": setupWave, "policy": main.turretPolicy, "frames": 600, "immortal": False},
+    "crowd50": {"setup": setupCrowd, "policy": main.turretPolicy, "frames": 600, "immortal": True},
+    "swarm5000": {"setup": setupSwarm, "policy": main.turretPolicy, "frames": 120, "immortal": True},
+    "horde3000": {"setup": setupHorde, "policy": main.turretPolicy, "frames": 120, "immortal": True},
+    "coinLitter": {"setup": setupCoinLitter, "policy": main.turretPolicy, "frames": 600, "immortal": True},
+    "particles": {"setup": setupParticles, "policy": main.turretPolicy, "frames": 300, "immortal": True},
+}
+
+
+def runScenario(spec, frames, seed, backend, renderMode):
+    main.textCache.clear()
+    main.textCacheStats.update(hits=0, misses=0)
+    state = main.buildGameState(backend, renderMode=renderMode, seed=seed)
+    spec["setup"](state, random.Random(seed))
+    if spec["immortal"]:
+        # stress scenarios measure load, not survival
+        state["player"].maxHealth = state["player"].health = 10 ** 9
+    dt = 1 / main.fps
+    samples = {}
+    for _ in range(frames):
+        timings = {}
+        state["timings"] = timings
+        started = time.perf_counter()
+        main.runPhase(state, "input", main.readInputFrame, pygame.event.get())
+        main.stepGame(state, dt, spec["policy"](state))
+        dirty = main.renderGame(state["screen"], state)
+        main.runPhase(state, "flip", main.presentFrame, state, dirty)
+        timings["frame"] = time.perf_counter() - started
+        for phase, seconds in timings.items():
+            samples.setdefault(phase, []).append(seconds)
+    lookups = max(1, main.textCacheStats["hits"] + main.textCacheStats["misses"])
+    report = {
+        "frames": frames,
+        "textCache": dict(main.textCacheStats, hitRate=main.textCacheStats["hits"] / lookups),
+        "phases": {},
+    }
+    for phase, values in samples.items():
+        values.sort()
+        report["phases"][phase] = {
+            "calls": len(values),
+            "p50": main.percentile(values, 0.50) * 1000,
+            "p95": main.percentile(values, 0.95) * 1000,
+            "p99": main.percentile(values, 0.99) * 1000,
+        }
+    return report
+
+
+def currentCommit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def checkDashTrail(backend):
+    # a Shift tap through the windowed input path has to dash and leave its trail on screen
+    state = main.buildGameState(backend, seed=1)
+    state["menu"] = False
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_LSHIFT, mod=0, unicode="", scancode=0))
+    frame = main.readInputFrame(pygame.event.get())
+    main.stepGame(state, 1 / main.fps, frame)
+    main.renderGame(state["screen"], state)
+    particles = state["particles"]
+    trail = int((particles["kind"][:particles["count"]] == main.particleNames.index("dash")).sum())
+    if not frame["dash"] or not trail:
+        raise SystemExit(f"a Shift tap left no dash trail (dash input {frame['dash']}, {trail} trail particles)")
+
+
+def benchStress(names, frameScale, seed, backend, renderMode, outPath):
+    if "particles" in names and main.particleQuality > 0:
+        checkDashTrail(backend)
+    results = {
+        "meta": {
+            "commit": currentCommit(),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "backend": backend or main.simBackend,
+            "render": renderMode or main.defaultRenderMode,
+            "seed": seed,
+            "unit": "ms",
+        },
+        "scenarios": {},
+    }
+    for name in names:
+        spec = scenarios[name]
+        frames = max(1, int(spec["frames"] * frameScale))
+        report = runScenario(spec, frames, seed, backend, renderMode)
+        results["scenarios"][name] = report
+        print(f"{name} ({frames} frames, text cache hit rate {report['textCache']['hitRate']:.1%})")
+        print(f"  {'phase':<22} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for phase, stats in sorted(report["phases"].items(), key=lambda item: -item[1]["p95"]):
+            print(f"  {phase:<22} {stats['p50']:8.3f} {stats['p95']:8.3f} {stats['p99']:8.3f}")
+    if outPath:
+        with open(outPath, "w") as handle:
+            json.dump(results, handle, indent=2)
+        print(f"wrote {outPath}")
+    return results
+
+
+def compareResults(baseline, current, threshold, floor):
+    # phases whose p95 grew by more than threshold (ignoring sub-floor noise)
+    regressions = []
+    for name, report in current["scenarios"].items():
+        basePhases = baseline["scenarios"].get(name, {}).get("phases", {})
+        for phase, stats in report["phases"].items():
+            base = basePhases.get(phase)
+            if base is None or max(base["p95"], stats["p95"]) < floor:
+                continue
+            ratio = stats["p95"] / max(base["p95"], 1e-9)
+            if ratio > threshold:
+                regressions.append((name, phase, base["p95"], stats["p95"], ratio))
+    return regressions
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Last Hope benchmarks")
+    parser.add_argument("suite", nargs="?", choices=["stress", "collisions", "backends", "startup", "pools", "replay", "snapshots", "session", "pipeline"], default="stress")
+    parser.add_argument("--counts", type=int, nargs="+")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--brute-limit", type=int, default=2000)
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--log", help="input log for the replay suite (main.py --record)")
+    parser.add_argument("--import-budget", type=float, default=40.0, help="ms the startup suite allows for importing main")
+    parser.add_argument("--minutes", type=int, default=60, help="simulated length of the session suite")
+    parser.add_argument("--scenarios", nargs="+", choices=list(scenarios), default=list(scenarios))
+    parser.add_argument("--frame-scale", type=float, default=1.0, help="multiply every scenario's frame count")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--backend", choices=["dict", "numpy"])
+    parser.add_argument("--render", choices=["full", "dirty"])
+    parser.add_argument("--render-scale", type=float, help="internal resolution for the windowed suites, e.g. 0.5")
+    parser.add_argument("--out", help="write stress results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier stress run")
+    parser.add_argument("--threshold", type=float, default=1.25, help="p95 ratio that counts as a regression")
+    parser.add_argument("--noise-floor", type=float, default=0.05, help="ignore phases under this many ms")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+    if args.render_scale:
+        main.setRenderScale(args.render_scale)
+    if args.suite == "backends":
+        benchBackends(args.counts or [1000, 5000, 10000, 20000], args.frames)
+    elif args.suite == "pipeline":
+        benchPipeline(args.counts or [50, 500, 2000], args.frames * 10, args.seed, args.backend)
+    elif args.suite == "session":
+        benchSession(args.minutes, args.seed, args.backend)
+    elif args.suite == "snapshots":
+        benchSnapshots(args.counts or [500, 2000, 5000], args.repeats)
+    elif args.suite == "replay":
+        if not args.log:
+            raise SystemExit("the replay suite needs --log PATH")
+        benchReplay(args.log, args.repeats)
+    elif args.suite == "pools":
+        benchPools(args.frames * 50, args.seed)
+    elif args.suite == "startup":
+        benchStartup(args.repeats, args.import_budget)
+    elif args.suite == "collisions":
+        benchCollisions(args.counts or [250, 500, 1000, 2000, 4000, 8000], args.repeats, args.brute_limit)
+    else:
+        results = benchStress(args.scenarios, args.frame_scale, args.seed, args.backend, args.render, args.out)
+        if args.compare:
+            with open(args.compare) as handle:
+                baseline = json.load(handle)
+            regressions = compareResults(baseline, results, args.threshold, args.noise_floor)
+            for name, phase, before, after, ratio in regressions:
+                print(f"REGRESSION {name}/{phase}: p95 {before:.3f} -> {after:.3f} ms ({ratio:.2f}x)")
+            if regressions:
+                raise SystemExit(1)
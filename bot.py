@@ -0,0 +1,142 @@
+import math
+import os
+import random
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import main
+
+# scripted players for headless runs. A bot is a plain spec dict:
+#   aim   - "nearest" or "jitter" (nearest, off by up to spread degrees)
+#   move  - "stand", "kite" (back away from anything inside kiteRange) or "collect"
+#           (walk to the nearest coin or floor pile while nothing is inside kiteRange)
+#   dash  - "never", "panic" (when something is inside panicRange) or "cooldown"
+#   reload - "empty" (let the gun reload itself) or "lull" (top up a half-empty gun when nothing is inside kiteRange)
+#   buys  - upgrade effects in order of preference; anything else is skipped
+botPresets = {
+    "turret": {"aim": "nearest", "move": "stand", "dash": "never", "buys": []},
+    "gunner": {"aim": "nearest", "move": "collect", "dash": "never", "reload": "lull", "buys": ["fireRate", "damage", "heatSink"]},
+    "tank": {"aim": "nearest", "move": "collect", "dash": "panic", "buys": ["maxHealth", "heal", "damage"]},
+    "kiter": {"aim": "nearest", "move": "kite", "dash": "panic", "buys": ["speed", "damage", "heal"]},
+    "greedy": {"aim": "nearest", "move": "collect", "dash": "never", "buys": ["coinBonus", "damage", "fireRate"]},
+    "sloppy": {"aim": "jitter", "move": "kite", "dash": "cooldown", "buys": ["heal", "maxHealth"]},
+    # touches every input the game has, for soak runs
+    "soak": {
+        "aim": "jitter", "move": "kite", "dash": "panic", "reload": "lull",
+        "buys": ["damage", "fireRate", "heal", "maxHealth", "speed", "heatSink", "coinBonus"],
+    },
+}
+botDefaults = {"spread": 12.0, "kiteRange": 180.0, "panicRange": 90.0, "reload": "empty"}
+
+
+def createBot(spec, seed=0):
+    # the bot's own rng keeps its decisions off the simulation's random stream
+    return {"spec": dict(botDefaults, **spec), "rng": random.Random(seed), "bought": []}
+
+
+def nearestEnemy(state):
+    target = main.nearestEnemyPos(state)
+    if target is None:
+        return None, math.inf
+    return target, target.distance_to(state["player"].pos)
+
+
+def nearestLoot(state):
+    # loose coins and floor piles alike; piles are only reachable by walking over them
+    spots = [
+        ((index + 0.5) * main.coinPileWidth, main.cityFloor - main.pileRadius(value))
+        for index, value in enumerate(state["coinPiles"]) if value
+    ]
+    coins = state["coins"]
+    if state["backend"] == "numpy":
+        spots += coins["pos"][:coins["count"]].tolist()
+    else:
+        spots += [(coin.pos.x, coin.pos.y) for coin in coins]
+    if not spots:
+        return None
+    return min((pygame.Vector2(spot) for spot in spots), key=state["player"].pos.distance_squared_to)
+
+
+def seekMove(player, spot):
+    toward = spot - player.pos
+    return ((toward.x > 2) - (toward.x < -2), (toward.y > 2) - (toward.y < -2))
+
+
+def kiteMove(player, target):
+    # back away from the threat, turning toward the middle near the walls
+    away = player.pos - target
+    margin = player.radius + 20
+    if not margin < player.pos.x < main.width - margin:
+        away.x = main.width / 2 - player.pos.x
+    if not margin < player.pos.y < main.cityFloor - margin:
+        away.y = main.cityFloor / 2 - player.pos.y
+    return ((away.x > 0) - (away.x < 0), (away.y > 0) - (away.y < 0))
+
+
+def chooseCard(bot, state):
+    # the first affordable card in preference order, or skip the shop
+    cards = state["shopCards"]
+    for effect in bot["spec"]["buys"]:
+        for index, card in enumerate(cards):
+            if card["effect"] == effect and card["cost"] <= state["coinsBank"]:
+                bot["bought"].append(effect)
+                return index + 1
+    return len(cards) + 1
+
+
+def botFrame(bot, state):
+    spec = bot["spec"]
+    if state["menu"]:
+        return main.createInputFrame(start=True)
+    if state["shopActive"]:
+        return main.createInputFrame(shopChoice=chooseCard(bot, state))
+    player = state["player"]
+    target, distance = nearestEnemy(state)
+    frame = main.createInputFrame()
+    if spec["reload"] == "lull":
+        frame["reload"] = distance > spec["kiteRange"] and player.ammo <= player.maxAmmo // 2
+    if spec["move"] == "collect" and distance > spec["kiteRange"]:
+        loot = nearestLoot(state)
+        if loot is not None:
+            frame["move"] = seekMove(player, loot)
+    if target is None:
+        return frame
+    aim = pygame.Vector2(target)
+    if spec["aim"] == "jitter":
+        aim = player.pos + (aim - player.pos).rotate(bot["rng"].uniform(-spec["spread"], spec["spread"]))
+    frame["aim"] = (aim.x, aim.y)
+    frame["fire"] = True
+    if spec["move"] == "kite" and distance < spec["kiteRange"]:
+        frame["move"] = kiteMove(player, target)
+    if spec["dash"] == "panic":
+        frame["dash"] = distance < spec["panicRange"]
+    elif spec["dash"] == "cooldown":
+        frame["dash"] = player.heat < 1.0
+    return frame
+
+
+def playRun(seed, spec, seconds=600.0, dt=1 / main.fps, backend=None):
+    # one headless run until the player dies or the clock runs out
+    state = main.buildGameState(backend, headless=True, seed=seed)
+    bot = createBot(spec, seed)
+    elapsed, earned, bank = 0.0, 0, 0
+    while elapsed < seconds and not state["gameOver"]:
+        main.stepGame(state, dt, botFrame(bot, state))
+        if not state["menu"] and not state["shopActive"]:
+            elapsed += dt
+        if state["coinsBank"] > bank:
+            earned += state["coinsBank"] - bank
+        bank = state["coinsBank"]
+    return {
+        "seed": seed,
+        "survival": elapsed,
+        "died": state["gameOver"],
+        "score": state["score"],
+        "wave": state["wave"],
+        "coinsEarned": earned,
+        "coinsBank": state["coinsBank"],
+        "bought": bot["bought"],
+    }
@@ -0,0 +1,677 @@
+import argparse
+import heapq
+import json
+import os
+import random
+import socket
+import struct
+import time
+import zlib
+from collections import OrderedDict, deque
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import main
+
+# local co-op over UDP. The host runs the only simulation; its partners send
+# input frames (the newest few in every packet, so one lost datagram costs
+# nothing) and get back snapshots. A snapshot is split into sections, each
+# quantised to 16-bit words, delta-coded column by column against the last
+# version that client acknowledged, deflated, and left out entirely when the
+# client already has it. Sections past the per-tick byte budget wait for a
+# later tick, the least recently sent first, but one held back for starveTicks
+# goes out regardless so no section can starve. Clients predict their own
+# movement with movePlayer and replay unacknowledged inputs on every correction.
+
+defaultPort = 47650
+maxPlayers = 4
+inputRedundancy = 3  # input records per packet: the newest and the two before it
+inputBacklog = 6  # inputs a host holds for a client before it drops the oldest
+snapshotBudget = 1024  # snapshot bytes per client per tick, past which sections wait
+historyTicks = 120  # ticks a baseline stays usable, on both ends; under 256 to fit a section header
+resendTicks = 12  # an unchanged but unacknowledged section goes out again after this
+starveTicks = 15  # a section unsent this long goes out past the budget, one per tick
+clientTimeout = 5.0  # seconds of silence before a host frees the slot
+helloInterval = 0.25
+udpOverhead = 28  # IPv4 and UDP headers, for bandwidth figures
+
+kindHello, kindInput, kindSnapshot, kindWelcome, kindFull = range(5)
+helloPacket = struct.Struct("<B")
+welcomePacket = struct.Struct("<BBI")  # kind, slot, host tick
+inputHeader = struct.Struct("<BIIB")  # kind, newest snapshot tick received, newest input seq, records
+snapshotHeader = struct.Struct("<BIIB")  # kind, tick, newest input applied for this client, sections
+sectionHeader = struct.Struct("<BBH")  # section, ticks back to the baseline (0: none), length
+
+# sections in wire order, with their column counts and how much a tick of delay costs each one.
+# players is always sent: it anchors the client's prediction.
+sectionNames = ("hud", "players", "enemies", "shots", "coins", "piles")
+sectionColumns = {"hud": 6, "players": 13, "enemies": 4, "shots": 3, "coins": 3, "piles": 1}
+sectionWeights = {"hud": 4, "enemies": 4, "shots": 3, "coins": 2, "piles": 1}
+positionScale = 4  # entity positions in quarter units
+playerScale = 16  # player positions in sixteenths, so predictions restart close to the host's
+fractionScale = 1000  # timers, heat and rates in thousandths
+
+
+def quantize(value, scale=1):
+    return max(-32768, min(32767, round(value * scale))) & 0xFFFF
+
+
+def signed(word, scale=1):
+    return (word - 0x10000 if word & 0x8000 else word) / scale
+
+
+# sections: a tuple of equal-length columns of 16-bit words
+
+def entityValues(state, kind, field):
+    if state["backend"] == "numpy":
+        store = state[kind]
+        return store[field][:store["count"]].tolist()
+    return [getattr(record, field) for record in state[kind]]
+
+
+def hudColumns(state):
+    flags = state["menu"] | state["gameOver"] << 1 | state["shopActive"] << 2 | state["interpolate"] << 3
+    score, bank = int(state["score"]), int(state["coinsBank"])
+    words = (score & 0xFFFF, score >> 16 & 0xFFFF, state["wave"] & 0xFFFF, bank & 0xFFFF, bank >> 16 & 0xFFFF, flags)
+    return tuple([word] for word in words)
+
+
+def playerWords(player):
+    flags = (
+        player.isReloading | player.isDead << 1 | player.isMoving << 2
+        | (player.facing > 0) << 3 | (player.shootTimer > 0) << 4
+    )
+    return (
+        quantize(player.pos.x, playerScale), quantize(player.pos.y, playerScale),
+        quantize(player.health, playerScale), quantize(player.maxHealth, playerScale),
+        quantize(player.heat, fractionScale), quantize(player.dash, fractionScale),
+        quantize(player.cool, fractionScale), quantize(player.reload, fractionScale),
+        quantize(player.speed), quantize(player.coolRate, fractionScale),
+        quantize(player.ammo), quantize(player.maxAmmo), flags,
+    )
+
+
+def playerColumns(state):
+    rows = [playerWords(player) for player in [state["player"]] + state["allies"]]
+    return tuple(list(column) for column in zip(*rows))
+
+
+def entityColumns(state, kind, extra):
+    positions = entityValues(state, kind, "pos")
+    columns = [[quantize(x, positionScale) for x, _ in positions], [quantize(y, positionScale) for _, y in positions]]
+    for field, scale in extra:
+        columns.append([quantize(value, scale) for value in entityValues(state, kind, field)])
+    return tuple(columns)
+
+
+sectionEncoders = {
+    "hud": hudColumns,
+    "players": playerColumns,
+    "enemies": lambda state: entityColumns(state, "enemies", (("size", 1), ("mood", 16))),
+    "shots": lambda state: entityColumns(state, "shots", (("radius", 1),)),
+    "coins": lambda state: entityColumns(state, "coins", (("radius", 1),)),
+    "piles": lambda state: ([quantize(value) for value in state["coinPiles"]],),
+}
+
+
+def encodeSection(columns, baseline=None):
+    # each column minus the baseline's column, as far as both go; rows past that travel as they are
+    rows = len(columns[0])
+    words = []
+    for index, column in enumerate(columns):
+        base = baseline[index] if baseline is not None else ()
+        shared = min(rows, len(base))
+        words.extend([(column[row] - base[row]) & 0xFFFF for row in range(shared)])
+        words.extend(column[shared:])
+    packer = zlib.compressobj(9, zlib.DEFLATED, -15)
+    return packer.compress(struct.pack(f"<H{len(words)}H", rows, *words)) + packer.flush()
+
+
+def decodeSection(blob, columnCount, baseline=None):
+    data = zlib.decompressobj(-15).decompress(blob, 2 + 2 * 0xFFFF * columnCount)
+    (rows,) = struct.unpack_from("<H", data)
+    words = struct.unpack_from(f"<{rows * columnCount}H", data, 2)
+    columns = []
+    for index in range(columnCount):
+        column = list(words[index * rows:(index + 1) * rows])
+        if baseline is not None:
+            base = baseline[index]
+            for row in range(min(rows, len(base))):
+                column[row] = (column[row] + base[row]) & 0xFFFF
+        columns.append(column)
+    return tuple(columns)
+
+
+def sectionBytes(columns):
+    return 2 + 2 * sum(len(column) for column in columns)
+
+
+# lossy links: datagrams are dropped or held back before they reach the socket
+
+def createLink(sock, loss=0.0, latency=0.0, jitter=0.0, seed=0):
+    return {
+        "socket": sock, "loss": loss, "latency": latency, "jitter": jitter,
+        "rng": random.Random(seed), "queue": [], "order": 0, "packets": 0, "dropped": 0, "bytes": 0,
+    }
+
+
+def linkSend(link, data, address, now):
+    link["packets"] += 1
+    link["bytes"] += len(data)
+    if link["rng"].random() < link["loss"]:
+        link["dropped"] += 1
+        return
+    due = now + link["latency"] + link["rng"].uniform(0, link["jitter"])
+    heapq.heappush(link["queue"], (due, link["order"], data, address))
+    link["order"] += 1
+
+
+def linkFlush(link, now):
+    queue = link["queue"]
+    while queue and queue[0][0] <= now:
+        _, _, data, address = heapq.heappop(queue)
+        link["socket"].sendto(data, address)
+
+
+def drainSocket(sock):
+    packets = []
+    while True:
+        try:
+            packets.append(sock.recvfrom(65536))
+        except (BlockingIOError, InterruptedError):
+            return packets
+        except ConnectionResetError:
+            continue  # a peer went away; on Windows this surfaces on the next read
+
+
+def openSocket(host="127.0.0.1", port=0):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((host, port))
+    sock.setblocking(False)
+    return sock
+
+
+# host
+
+def createHost(state, link, budget=snapshotBudget):
+    return {
+        "state": state,
+        "link": link,
+        "budget": budget,
+        "tick": 0,
+        "remotes": {},  # address -> remote
+        "stats": {"sim": [], "net": [], "raw": 0, "dropped": 0, "forced": 0, "age": {name: [] for name in sectionWeights}},
+    }
+
+
+def createRemote(slot, now):
+    return {
+        "slot": slot,
+        "inputs": {},  # seq -> frame, not yet applied
+        "applied": 0,  # newest input seq applied
+        "frame": main.createInputFrame(),
+        "sent": {},  # tick -> {section: columns} sent that tick
+        "acked": {},  # section -> (tick, columns) the client is known to hold
+        "lastSent": {},  # section -> (tick, columns)
+        "fresh": {},  # section -> last tick the acknowledged copy still matched the host's
+        "seen": now,
+    }
+
+
+def joinRemote(host, address, now):
+    state, remotes = host["state"], host["remotes"]
+    taken = {remote["slot"] for remote in remotes.values()}
+    free = [slot for slot in range(1, len(state["allies"]) + 1) if slot not in taken]
+    if free:
+        slot = free[0]
+    elif len(state["allies"]) < maxPlayers - 1:
+        main.addAlly(state)
+        slot = len(state["allies"])
+    else:
+        return None
+    remotes[address] = createRemote(slot, now)
+    return remotes[address]
+
+
+def hostReceive(host, now):
+    for data, address in drainSocket(host["link"]["socket"]):
+        remote = host["remotes"].get(address)
+        try:
+            kind = data[0]
+            if kind == kindHello:
+                remote = remote or joinRemote(host, address, now)
+                if remote is None:
+                    linkSend(host["link"], helloPacket.pack(kindFull), address, now)
+                else:
+                    linkSend(host["link"], welcomePacket.pack(kindWelcome, remote["slot"], host["tick"]), address, now)
+                continue
+            if kind != kindInput or remote is None:
+                continue
+            ackTick, newest, count = inputHeader.unpack_from(data)[1:]
+            records = [
+                data[inputHeader.size + index * main.inputLogRecord.size:][:main.inputLogRecord.size]
+                for index in range(count)
+            ]
+            frames = [main.unpackInputFrame(record)[1] for record in records]
+        except (IndexError, struct.error, ValueError):
+            continue  # not one of ours
+        remote["seen"] = now
+        for offset, frame in enumerate(frames):
+            seq = newest - offset
+            if seq > remote["applied"]:
+                remote["inputs"].setdefault(seq, frame)
+        acknowledge(remote, ackTick)
+    for address, remote in list(host["remotes"].items()):
+        if now - remote["seen"] > clientTimeout:
+            del host["remotes"][address]  # the partner stands idle until someone takes the slot
+
+
+def acknowledge(remote, ackTick):
+    for name, columns in remote["sent"].get(ackTick, {}).items():
+        if ackTick > remote["acked"].get(name, (0, None))[0]:
+            remote["acked"][name] = (ackTick, columns)
+    for tick in [tick for tick in remote["sent"] if tick <= ackTick]:
+        del remote["sent"][tick]
+
+
+def nextInput(remote):
+    # the next input in order; with none waiting the partner keeps moving and aiming as before
+    inputs = remote["inputs"]
+    if not inputs:
+        return dict(remote["frame"], dash=False, reload=False)
+    waiting = sorted(inputs)
+    for seq in waiting[:-inputBacklog]:
+        del inputs[seq]  # too far behind: skip ahead rather than lag forever
+    seq = min(inputs)
+    remote["applied"] = seq
+    remote["frame"] = inputs.pop(seq)
+    return remote["frame"]
+
+
+def snapshotPacket(host, remote, current):
+    tick, budget = host["tick"], host["budget"]
+    candidates = []
+    for name in sectionNames:
+        columns = current[name]
+        sentTick, sentColumns = remote["lastSent"].get(name, (0, None))
+        ackTick, ackColumns = remote["acked"].get(name, (0, None))
+        if name != "players" and columns == sentColumns and (sentTick <= ackTick or tick - sentTick < resendTicks):
+            continue  # the client has it, or will once the last copy lands
+        baseline = ackColumns if ackTick and tick - ackTick < historyTicks else None
+        blob = encodeSection(columns, baseline)
+        urgency = float("inf") if name == "players" else sectionWeights[name] * (tick - sentTick)
+        candidates.append((urgency, name, tick - ackTick if baseline is not None else 0, blob, columns))
+    candidates.sort(key=lambda candidate: -candidate[0])
+    body, included, forced = [], {}, False
+    size = snapshotHeader.size
+    for urgency, name, back, blob, columns in candidates:
+        cost = sectionHeader.size + len(blob)
+        if size + cost > budget and name != "players":
+            # the most overdue section that never fits goes out anyway, or an oversize one would wait forever
+            if forced or tick - remote["lastSent"].get(name, (0, None))[0] < starveTicks:
+                host["stats"]["dropped"] += 1
+                continue
+            forced = True
+            host["stats"]["forced"] += 1
+        body.append(sectionHeader.pack(sectionNames.index(name), back, len(blob)) + blob)
+        size += cost
+        included[name] = columns
+        remote["lastSent"][name] = (tick, columns)
+    remote["sent"][tick] = included
+    for name, ages in host["stats"]["age"].items():
+        # how long the newest copy the client has confirmed has been out of date, counted from its join
+        ackTick, ackColumns = remote["acked"].get(name, (0, None))
+        if ackColumns == current[name] or name not in remote["fresh"]:
+            remote["fresh"][name] = tick
+        ages.append(tick - max(ackTick, remote["fresh"][name]))
+    for old in [old for old in remote["sent"] if old <= tick - historyTicks]:
+        del remote["sent"][old]
+    return snapshotHeader.pack(kindSnapshot, tick, remote["applied"], len(body)) + b"".join(body)
+
+
+def hostTick(host, dt, frame, now):
+    hostReceive(host, now)
+    start = time.perf_counter()
+    if frame["reboot"]:
+        host["state"] = main.rebootGame(host["state"])
+    state = host["state"]
+    for remote in host["remotes"].values():
+        state["allyFrames"][remote["slot"] - 1] = nextInput(remote)
+    main.stepGame(state, dt, frame)
+    encoded = time.perf_counter()
+    host["tick"] += 1
+    if host["remotes"]:
+        current = {name: encoder(state) for name, encoder in sectionEncoders.items()}
+        host["stats"]["raw"] += sum(map(sectionBytes, current.values())) * len(host["remotes"])
+        for address, remote in host["remotes"].items():
+            linkSend(host["link"], snapshotPacket(host, remote, current), address, now)
+    finished = time.perf_counter()
+    host["stats"]["sim"].append(encoded - start)
+    host["stats"]["net"].append(finished - encoded)
+    linkFlush(host["link"], now)
+
+
+# client: a mirror state that is only ever drawn, plus the local player's prediction
+
+def createClient(link, address, headless=True, screen=None):
+    mirror = main.buildGameState("dict", headless=headless, seed=0, screen=screen)
+    return {
+        "link": link,
+        "host": address,
+        "mirror": mirror,
+        "players": [mirror["player"]],
+        "slot": None,
+        "helloAt": -helloInterval,
+        "seq": 0,
+        "recent": deque(maxlen=inputRedundancy),  # packed records, newest first
+        "pending": deque(),  # (seq, dt, frame, moved) not yet applied by the host
+        "predicted": {},  # seq -> where prediction put the player after it
+        "sentAt": {},  # seq -> when it first went out
+        "ackTick": 0,
+        "ackInput": 0,
+        "sections": {name: OrderedDict() for name in sectionNames},  # tick -> columns received
+        "stats": {"latency": [], "error": [], "snapshots": 0, "bytes": 0},
+    }
+
+
+def applyPlayer(player, words):
+    x, y, health, maxHealth, heat, dash, cool, reload, speed, coolRate, ammo, maxAmmo, flags = words
+    player.pos.update(signed(x, playerScale), signed(y, playerScale))
+    player.prev.update(player.pos)
+    player.health, player.maxHealth = signed(health, playerScale), signed(maxHealth, playerScale)
+    player.heat, player.dash = signed(heat, fractionScale), signed(dash, fractionScale)
+    player.cool, player.reload = signed(cool, fractionScale), signed(reload, fractionScale)
+    player.speed, player.coolRate = signed(speed), signed(coolRate, fractionScale)
+    player.ammo, player.maxAmmo = int(signed(ammo)), int(signed(maxAmmo))
+    player.isReloading, player.isDead, player.isMoving = bool(flags & 1), bool(flags & 2), bool(flags & 4)
+    player.facing = 1 if flags & 8 else -1
+    player.shootTimer = (player.shootTimer or main.shootAnimDuration) if flags & 16 else 0.0
+
+
+def applySection(client, name, columns):
+    mirror = client["mirror"]
+    if name == "hud":
+        scoreLow, scoreHigh, wave, bankLow, bankHigh, flags = (column[0] for column in columns)
+        mirror["score"], mirror["wave"], mirror["coinsBank"] = scoreHigh << 16 | scoreLow, wave, bankHigh << 16 | bankLow
+        mirror["menu"], mirror["gameOver"] = bool(flags & 1), bool(flags & 2)
+        mirror["shopActive"], mirror["interpolate"] = bool(flags & 4), bool(flags & 8)
+    elif name == "players":
+        players = client["players"]
+        while len(players) < len(columns[0]):
+            players.append(main.createPlayer(convert=not mirror["headless"]))
+        del players[len(columns[0]):]
+        for player, words in zip(players, zip(*columns)):
+            applyPlayer(player, words)
+    elif name == "piles":
+        mirror["coinPiles"] = list(columns[0])
+    else:
+        x, y = ([signed(word, positionScale) for word in column] for column in columns[:2])
+        if name == "enemies":
+            mirror["enemies"] = [
+                main.Enemy(pygame.Vector2(position), 0.0, 1, size, signed(mood, 16))
+                for position, size, mood in zip(zip(x, y), columns[2], columns[3])
+            ]
+        elif name == "shots":
+            mirror["shots"] = [main.Shot(position, radius=radius) for position, radius in zip(zip(x, y), columns[2])]
+        else:
+            mirror["coins"] = [main.Coin(position, radius=radius) for position, radius in zip(zip(x, y), columns[2])]
+
+
+def predict(player, dt, frame):
+    # the host's order for a partner: move, then dash
+    main.movePlayer(player, dt, frame)
+    if frame["dash"]:
+        main.dashPlayer(player)
+
+
+def reconcile(client, ackInput, now):
+    # restart from the host's word on where this player was after ackInput, then replay the rest
+    stats, player = client["stats"], client["players"][client["slot"]]
+    if ackInput in client["predicted"]:
+        stats["error"].append(client["predicted"][ackInput].distance_to(player.pos))
+    if ackInput > client["ackInput"] and ackInput in client["sentAt"]:
+        stats["latency"].append(now - client["sentAt"][ackInput])
+    client["ackInput"] = max(client["ackInput"], ackInput)
+    for table in (client["predicted"], client["sentAt"]):
+        for seq in [seq for seq in table if seq <= ackInput]:
+            del table[seq]
+    pending = client["pending"]
+    while pending and pending[0][0] <= ackInput:
+        pending.popleft()
+    for seq, dt, frame, moved in pending:
+        if moved:
+            predict(player, dt, frame)
+        client["predicted"][seq] = pygame.Vector2(player.pos)
+
+
+def clientReceive(client, now):
+    for data, address in drainSocket(client["link"]["socket"]):
+        if address != client["host"]:
+            continue
+        try:
+            kind = data[0]
+            if kind == kindWelcome:
+                client["slot"] = welcomePacket.unpack(data)[1]
+                continue
+            if kind == kindFull:
+                raise SystemExit("the host is full")
+            if kind != kindSnapshot:
+                continue
+            tick, ackInput, count = snapshotHeader.unpack_from(data)[1:]
+            offset, received = snapshotHeader.size, {}
+            for _ in range(count):
+                index, back, length = sectionHeader.unpack_from(data, offset)
+                offset += sectionHeader.size
+                name = sectionNames[index]
+                baseline = client["sections"][name].get(tick - back) if back else None
+                if back and baseline is None:
+                    offset += length
+                    continue  # its baseline aged out here; the host will fall back to a full copy
+                received[name] = decodeSection(data[offset:offset + length], sectionColumns[name], baseline)
+                offset += length
+        except (IndexError, struct.error, zlib.error, ValueError):
+            continue
+        client["stats"]["snapshots"] += 1
+        client["stats"]["bytes"] += len(data)
+        for name, columns in received.items():
+            history = client["sections"][name]
+            history[tick] = columns
+            while history and next(iter(history)) <= tick - historyTicks:
+                history.popitem(last=False)
+            if tick >= max(history):
+                applySection(client, name, columns)
+        client["ackTick"] = max(client["ackTick"], tick)
+        if "players" in received and client["slot"] is not None and client["slot"] < len(client["players"]):
+            reconcile(client, ackInput, now)
+    players = client["players"]
+    if client["slot"] is not None and client["slot"] < len(players):
+        mirror = client["mirror"]
+        mirror["player"] = players[client["slot"]]
+        mirror["allies"] = players[:client["slot"]] + players[client["slot"] + 1:]
+
+
+def clientTick(client, dt, frame, now):
+    clientReceive(client, now)
+    link = client["link"]
+    if client["slot"] is None or client["slot"] >= len(client["players"]):
+        if now - client["helloAt"] >= helloInterval:
+            client["helloAt"] = now
+            linkSend(link, helloPacket.pack(kindHello), client["host"], now)
+        linkFlush(link, now)
+        return
+    # quantised exactly as the host will see it, so prediction and host agree
+    record = main.packInputFrame(dt, frame)
+    frame = main.unpackInputFrame(record)[1]
+    client["seq"] += 1
+    seq = client["seq"]
+    client["recent"].appendleft(record)
+    packet = inputHeader.pack(kindInput, client["ackTick"], seq, len(client["recent"])) + b"".join(client["recent"])
+    linkSend(link, packet, client["host"], now)
+    client["sentAt"][seq] = now
+    player = client["mirror"]["player"]
+    moved = client["mirror"]["interpolate"] and not player.isDead
+    if moved:
+        predict(player, dt, frame)
+    client["pending"].append((seq, dt, frame, moved))
+    client["predicted"][seq] = pygame.Vector2(player.pos)
+    for other in client["players"]:
+        main.updatePlayerAnimation(other, dt)
+    linkFlush(link, now)
+
+
+# loopback harness: a host and bot-driven partners on localhost, through lossy links
+
+def loopback(players, seconds, loss, latency, jitter, budget, backend, seed, botName):
+    import bot  # only here: it points SDL at the dummy driver, which would blank the windowed modes
+
+    dt = 1 / main.fps
+    hostSocket = openSocket()
+    state = main.buildGameState(backend, headless=True, seed=seed)
+    host = createHost(state, createLink(hostSocket, loss, latency, jitter, seed), budget)
+    hostBot = bot.createBot(bot.botPresets[botName], seed)
+    clients = []
+    for index in range(players - 1):
+        link = createLink(openSocket(), loss, latency, jitter, seed + index + 1)
+        clients.append((createClient(link, hostSocket.getsockname()), bot.createBot(bot.botPresets[botName], seed + index + 1)))
+    reboots = 0
+    for tick in range(int(seconds * main.fps)):
+        now = tick * dt
+        for client, clientBot in clients:
+            clientTick(client, dt, bot.botFrame(clientBot, client["mirror"]), now)
+        frame = bot.botFrame(hostBot, host["state"])
+        if host["state"]["gameOver"]:
+            frame["reboot"] = True
+            reboots += 1
+        hostTick(host, dt, frame, now)
+    ticks = int(seconds * main.fps)
+    sim, net = sorted(host["stats"]["sim"]), sorted(host["stats"]["net"])
+    latencies = sorted(value for client, _ in clients for value in client["stats"]["latency"])
+    errors = sorted(value for client, _ in clients for value in client["stats"]["error"])
+    down = host["link"]["bytes"] / max(1, len(clients)) / ticks
+    report = {
+        "players": players, "seconds": seconds, "loss": loss, "latency": latency, "jitter": jitter, "budget": budget,
+        "joined": sum(client["slot"] is not None for client, _ in clients),
+        "hostSim": sum(sim) / len(sim) * 1000, "hostNet": sum(net) / len(net) * 1000,
+        "hostP99": main.percentile(sorted(a + b for a, b in zip(host["stats"]["sim"], host["stats"]["net"])), 0.99, 0.0) * 1000,
+        "down": down,
+        "downWire": down + udpOverhead * host["link"]["packets"] / max(1, len(clients)) / ticks,
+        "raw": host["stats"]["raw"] / max(1, len(clients)) / ticks,
+        "up": sum(client["link"]["bytes"] for client, _ in clients) / max(1, len(clients)) / ticks,
+        "droppedSections": host["stats"]["dropped"], "forcedSections": host["stats"]["forced"],
+        "sectionAge": {
+            name: {"mean": sum(ages) / len(ages) if ages else 0.0, "p95": main.percentile(sorted(ages), 0.95, 0), "max": max(ages, default=0)}
+            for name, ages in host["stats"]["age"].items()
+        },
+        "lostDown": host["link"]["dropped"], "sentDown": host["link"]["packets"],
+        "lostUp": sum(client["link"]["dropped"] for client, _ in clients),
+        "sentUp": sum(client["link"]["packets"] for client, _ in clients),
+        "latencyMean": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        "latencyP95": main.percentile(latencies, 0.95, 0.0) * 1000,
+        "errorMean": sum(errors) / len(errors) if errors else 0.0,
+        "errorP99": main.percentile(errors, 0.99, 0.0), "errorMax": errors[-1] if errors else 0.0,
+        "corrections": len(errors), "reboots": reboots,
+    }
+    for client, _ in clients:
+        client["link"]["socket"].close()
+    hostSocket.close()
+    return report
+
+
+def printReport(report):
+    print(
+        f"{report['players']} players ({report['joined']} joined), {report['seconds']:g}s, "
+        f"{report['loss']:.0%} loss, {report['latency'] * 1000:g}+{report['jitter'] * 1000:g} ms one way, "
+        f"budget {report['budget']} B/tick"
+    )
+    print(f"host tick       {report['hostSim']:.3f} ms sim + {report['hostNet']:.3f} ms snapshots, p99 {report['hostP99']:.3f} ms")
+    print(
+        f"down per client {report['down']:.0f} B/tick ({report['downWire']:.0f} with UDP/IP headers, "
+        f"{report['raw']:.0f} quantised in full), {report['droppedSections']} sections held back for the budget, "
+        f"{report['forcedSections']} sent past it"
+    )
+    ages = report["sectionAge"]
+    print("section age     " + ", ".join(f"{name} {age['mean']:.1f}/{age['p95']}/{age['max']}" for name, age in ages.items()) + " ticks mean/p95/max")
+    print(f"up per client   {report['up']:.0f} B/tick")
+    print(f"packets lost    {report['lostDown']}/{report['sentDown']} down, {report['lostUp']}/{report['sentUp']} up, host rebooted {report['reboots']} times")
+    print(f"input to ack    {report['latencyMean']:.1f} ms mean, p95 {report['latencyP95']:.1f} ms")
+    print(
+        f"prediction      {report['errorMean']:.2f} px mean error, p99 {report['errorP99']:.2f}, "
+        f"max {report['errorMax']:.2f} over {report['corrections']} corrections"
+    )
+
+
+# windowed play
+
+def hostWindow(port, backend, budget):
+    state = main.buildGameState(backend)
+    hostSocket = openSocket("0.0.0.0", port)
+    host = createHost(state, createLink(hostSocket), budget)
+    print(f"hosting on UDP port {hostSocket.getsockname()[1]}")
+    clock = pygame.time.Clock()
+    while True:
+        frame = main.readInputFrame(pygame.event.get())
+        if frame["quit"]:
+            break
+        hostTick(host, 1 / main.fps, frame, time.perf_counter())
+        state = host["state"]
+        main.presentFrame(state, main.renderGame(state["screen"], state))
+        clock.tick(main.fps)
+    hostSocket.close()
+
+
+def joinWindow(address):
+    hostName, _, port = address.partition(":")
+    target = (socket.gethostbyname(hostName), int(port or defaultPort))
+    client = createClient(createLink(openSocket("0.0.0.0")), target, headless=False)
+    mirror = client["mirror"]
+    clock = pygame.time.Clock()
+    while True:
+        frame = main.readInputFrame(pygame.event.get())
+        if frame["quit"]:
+            break
+        clientTick(client, 1 / main.fps, frame, time.perf_counter())
+        main.presentFrame(mirror, main.renderGame(mirror["screen"], mirror))
+        clock.tick(main.fps)
+    client["link"]["socket"].close()
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Last Hope co-op: host, join, or measure a loopback session")
+    modes = parser.add_subparsers(dest="mode", required=True)
+    hostMode = modes.add_parser("host", help="run the simulation and take up to three partners")
+    hostMode.add_argument("--port", type=int, default=defaultPort)
+    hostMode.add_argument("--backend", choices=["dict", "numpy"])
+    hostMode.add_argument("--budget", type=int, default=snapshotBudget, help="snapshot bytes per partner per tick")
+    joinMode = modes.add_parser("join", help="play as a partner of a host")
+    joinMode.add_argument("address", help=f"HOST[:PORT], port {defaultPort} by default")
+    loop = modes.add_parser("loopback", help="bots on localhost through lossy links; reports bandwidth, tick cost and latency")
+    loop.add_argument("--players", type=int, default=maxPlayers, choices=range(2, maxPlayers + 1))
+    loop.add_argument("--seconds", type=float, default=60.0, help="simulated time to play")
+    loop.add_argument("--loss", type=float, default=0.05, help="chance each datagram is dropped, both ways")
+    loop.add_argument("--latency", type=float, default=40.0, help="one-way delay in ms")
+    loop.add_argument("--jitter", type=float, default=10.0, help="extra one-way delay of up to this many ms")
+    loop.add_argument("--budget", type=int, default=snapshotBudget, help="snapshot bytes per partner per tick")
+    loop.add_argument("--backend", choices=["dict", "numpy"])
+    loop.add_argument("--seed", type=int, default=1)
+    loop.add_argument("--bot", default="kiter", help="bot preset for every player")
+    loop.add_argument("--out", help="write the figures to this JSON file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+    if args.mode == "loopback":
+        report = loopback(
+            args.players, args.seconds, args.loss, args.latency / 1000, args.jitter / 1000,
+            args.budget, args.backend, args.seed, args.bot,
+        )
+        printReport(report)
+        if args.out:
+            with open(args.out, "w") as handle:
+                json.dump(report, handle, indent=2)
+    elif args.mode == "host":
+        hostWindow(args.port, args.backend, args.budget)
+    else:
+        joinWindow(args.address)
@@ -1,14 +1,53 @@
+import argparse
+import bisect
+import copy
+import gc
+import hashlib
+import json
+import math
+import operator
 import os
+import queue
 import random
+import sqlite3
+import struct
 import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from itertools import chain
 
 import pygame
 
+try:
+    import numpy as np
+except ImportError:  # the array backend is optional
+    np = None
+
 width, height = 1100, 720
 fps = 60
 cityFloor = height - 120
-maxEnemies = 50
+maxEnemies = int(os.environ.get("LASTHOPE_MAX_ENEMIES", 50))
+lodBudget = 256  # off-screen enemies stepped per tick; the rest wait their turn and catch up on the time missed
+maxCoins = 200  # airborne coins past this settle oldest-first onto the floor
+coinPileWidth = 32  # coins resting within one floor slot stack into a single pile
+coinPileCount = math.ceil(width / coinPileWidth)
+coinSleepSpeed = 8.0  # a resting coin sliding slower than this joins its pile
 shootAnimDuration = 0.18
+playerScale = 3
+collisionCellSize = 64
+simBackend = os.environ.get("LASTHOPE_BACKEND", "dict")  # "dict" or "numpy"
+defaultRenderMode = os.environ.get("LASTHOPE_RENDER", "full")  # "full" or "dirty"
+dirtyRectLimit = 400  # past this many rects one bounding rect is cheaper
+simRate = int(os.environ.get("LASTHOPE_SIM_RATE", fps))  # fixed simulation ticks per second
+maxCatchUpSteps = 5  # after a longer hitch the game slows down instead of skipping ahead
+renderScale = float(os.environ.get("LASTHOPE_RENDER_SCALE", 1.0))  # internal resolution / window size
+renderScales = (1.0, 0.75, 0.5)  # quality presets cycled with F6
+particleBudget = 20000  # hard cap on live particles at full quality
+particleQuality = float(os.environ.get("LASTHOPE_PARTICLES", 1.0))  # scales bursts and the cap; 0 turns them off
+profileSeconds = 10  # history kept by the profiler and dumped as a trace
+traceDir = os.environ.get("LASTHOPE_TRACE_DIR", ".")
 
 darkBackdrop = (26, 26, 34)
 midGray = (44, 44, 58)
@@ -18,22 +57,78 @@ neonBlue = (119, 233, 255)
 coinGold = (254, 213, 82)
 heatOrange = (255, 180, 120)
 
-pygame.init()
-pygame.font.init()
-uiFont = pygame.font.Font(None, 34)
-bigFont = pygame.font.Font(None, 70)
-smallFont = pygame.font.Font(None, 24)
-
-
-def loadAnimationFrames(subfolder, allow_placeholder=True):
-    folder_path = os.path.join("assets", subfolder)
+# tuning knobs, module level so balance sweeps (batch.py) can override them per process
+balance = {
+    "waveScoreStep": 220,  # score needed per wave
+    "spawnInterval": 1.4,
+    "spawnIntervalPerWave": 0.08,
+    "spawnIntervalMin": 0.45,
+    "enemySpeedPerWave": 7,
+    "enemyHpBase": 2,
+    "enemyHpWaves": 3,  # waves per extra hit point
+}
+shopOptions = [
+    {"name": "heat sink", "desc": "vents faster cool down", "cost": 6, "effect": "heatSink"},
+    {"name": "side hustle", "desc": "+1 shot damage", "cost": 8, "effect": "damage"},
+    {"name": "restock", "desc": "+35 hp instantly", "cost": 5, "effect": "heal"},
+    {"name": "armor plating", "desc": "+15 max hp (and heal)", "cost": 7, "effect": "maxHealth"},
+    {"name": "espresso skates", "desc": "+45 move speed", "cost": 6, "effect": "speed"},
+    {"name": "trigger tweak", "desc": "faster fire rate", "cost": 7, "effect": "fireRate"},
+    {"name": "coin printer", "desc": "coins drop x2 value", "cost": 10, "effect": "coinBonus"},
+]
+
+# no pygame.init(): openDisplay starts video and getFont the font module, so
+# headless imports (bots, batch workers, benches) never bring up SDL at all
+fontSizes = {"ui": 34, "big": 70, "small": 24}  # at a render scale of 1
+fonts = {}  # loaded on first use at the current render scale
+baseDir = os.path.dirname(os.path.abspath(__file__))
+assetDir = os.path.join(baseDir, "assets")
+assetCacheDir = os.environ.get("LASTHOPE_ASSET_CACHE", os.path.join(baseDir, ".assetcache"))
+assetCacheVersion = 1
+scorePath = os.environ.get("LASTHOPE_SCORES", os.path.join(baseDir, "scores.db"))  # "" turns the store off
+leaderboardSize = 5  # top runs listed on the menu
+spriteCache = {}
+shotPool = []
+coinPool = []
+poolLimit = 4096  # 0 turns pooling off
+backgroundCache = None
+entitySprites = {}
+scaledFrames = {}  # player frames at the render scale
+enemyTintBuckets = 16
+spriteColorKey = (255, 0, 255)
+textCache = OrderedDict()
+textCacheLimit = 256
+textCacheStats = {"hits": 0, "misses": 0}
+profilerPanel = None
+inputLogMagic = b"LHIN"
+inputLogVersion = 1
+inputLogHeader = struct.Struct("<4sBBQ")  # magic, version, backend, seed
+inputLogRecord = struct.Struct("<fbbhhBB")  # dt, move, aim, buttons, shop choice
+inputLogSummary = struct.Struct("<qqq")  # score, wave, coinsBank after the last frame
+inputLogButtons = ("fire", "sprint", "dash", "reload", "start", "closeShop", "reboot", "quit")
+inputLogBackends = ("dict", "numpy")
+snapshotMagic = b"LHSS"
+snapshotVersion = 4
+snapshotHeader = struct.Struct("<4sBI")  # magic, version, metadata length
+snapshotInterval = 5.0  # seconds of simulated time between keyframes
+snapshotBudget = 64 * 1024 * 1024  # bytes of keyframes kept in memory
+snapshotKeys = (
+    "seed", "spawnTimer", "wave", "score", "coinsBank", "menu", "gameOver",
+    "shopActive", "shopMessage", "shopTimer", "coinBonus", "shopNoteTimer", "coinPiles", "lodCursor",
+)
+snapshotIntFields = {"hp", "size", "damage", "value", "radius"}
+keyframeHeader = struct.Struct("<II")  # frame index, snapshot length
+
+
+def loadAnimationFrames(subfolder, allow_placeholder=True, convert=True):
+    folder_path = os.path.join(assetDir, subfolder)
     frames = []
     if os.path.isdir(folder_path):
         for filename in sorted(os.listdir(folder_path)):
             if not filename.lower().endswith(".png"):
                 continue
-            frame = pygame.image.load(os.path.join(folder_path, filename)).convert_alpha()
-            frames.append(frame)
+            frame = pygame.image.load(os.path.join(folder_path, filename))
+            frames.append(frame.convert_alpha() if convert else frame)
     if not frames and allow_placeholder:
         # fallback circle sprite so the game can still run without assets
         placeholder = pygame.Surface((48, 48), pygame.SRCALPHA)
@@ -42,20 +137,19 @@ def loadAnimationFrames(subfolder, allow_placeholder=True):
     return frames
 
 
-def createPlayer():
-    # Scale factor for the player
-    scale_factor = 3
+def loadPlayerAnimations():
+    scale_factor = playerScale
     
     # Load animations first
-    idle_frames = loadAnimationFrames("idle")
-    run_frames = loadAnimationFrames("run")
-    reload_frames = loadAnimationFrames("reload")
-    dead_frames = loadAnimationFrames("dead")
-    shot_frames = loadAnimationFrames("shot", allow_placeholder=False)
+    idle_frames = loadAnimationFrames("idle", convert=False)
+    run_frames = loadAnimationFrames("run", convert=False)
+    reload_frames = loadAnimationFrames("reload", convert=False)
+    dead_frames = loadAnimationFrames("dead", convert=False)
+    shot_frames = loadAnimationFrames("shot", allow_placeholder=False, convert=False)
     if not shot_frames:
-        shot_frames = loadAnimationFrames("shoot", allow_placeholder=False)
+        shot_frames = loadAnimationFrames("shoot", allow_placeholder=False, convert=False)
     if not shot_frames:
-        shot_frames = loadAnimationFrames("shot")
+        shot_frames = loadAnimationFrames("shot", convert=False)
     
     # Scale each frame in the animations
     def scale_frames(frames):
@@ -67,120 +161,297 @@ def createPlayer():
             scaled.append(scaled_frame)
         return scaled
     
-    # Calculate hitbox size (slightly smaller than the visual representation)
-    base_radius = 16  # Base radius for hitbox (before scaling)
-    
     return {
-        "pos": pygame.Vector2(width / 2, height / 2),
-        "radius": base_radius * scale_factor,  # Scale the hitbox to match player size
-        "speed": 360,
-        "maxHealth": 130,
-        "health": 130,
-        "cool": 0.0,  # Cooldown between shots
-        "heat": 0.0,  # Heat from sprinting
-        "reload": 0.0,  # Reload timer
-        "isReloading": False,  # Whether the player is currently reloading
-        "ammo": 10,  # Current ammo count
-        "maxAmmo": 10,  # Maximum ammo capacity
-        "dash": 0.0,
-        "damage": 1,
-        "coolRate": 0.8,
-        "fireDelay": 0.18,
-        "animations": {
-            "idle": scale_frames(idle_frames) if idle_frames[0].get_size() != (48 * scale_factor, 48 * scale_factor) else idle_frames,
-            "run": scale_frames(run_frames) if run_frames and run_frames[0].get_size() != (48 * scale_factor, 48 * scale_factor) else run_frames,
-            "reload": scale_frames(reload_frames) if reload_frames and reload_frames[0].get_size() != (48 * scale_factor, 48 * scale_factor) else reload_frames,
-            "death": scale_frames(dead_frames) if dead_frames and dead_frames[0].get_size() != (48 * scale_factor, 48 * scale_factor) else dead_frames,
-            "shoot": scale_frames(shot_frames) if shot_frames and shot_frames[0].get_size() != (48 * scale_factor, 48 * scale_factor) else shot_frames,
-        },
-        "animState": "idle",
-        "animFrame": 0,
-        "animTimer": 0.0,
-        "animSpeeds": {"idle": 0.22, "run": 0.08, "reload": 0.12, "shoot": 0.12, "death": 0.28},
-        "isMoving": False,
-        "facing": 1,
-        "shootTimer": 0.0,
-        "isDead": False,
-        "deathPlayed": False,
+        "idle": scale_frames(idle_frames) if idle_frames[0].get_size() != (48 * scale_factor, 48 * scale_factor) else idle_frames,
+        "run": scale_frames(run_frames) if run_frames and run_frames[0].get_size() != (48 * scale_factor, 48 * scale_factor) else run_frames,
+        "reload": scale_frames(reload_frames) if reload_frames and reload_frames[0].get_size() != (48 * scale_factor, 48 * scale_factor) else reload_frames,
+        "death": scale_frames(dead_frames) if dead_frames and dead_frames[0].get_size() != (48 * scale_factor, 48 * scale_factor) else dead_frames,
+        "shoot": scale_frames(shot_frames) if shot_frames and shot_frames[0].get_size() != (48 * scale_factor, 48 * scale_factor) else shot_frames,
+    }
+
+
+def packSpriteSheet(animations):
+    # pack every animation frame, facing right and mirrored, into one surface
+    rows = []
+    for facing in (1, -1):
+        for name, frames in animations.items():
+            if frames:
+                rows.append((facing, name, frames))
+    sheetWidth = max((sum(frame.get_width() for frame in frames) for _, _, frames in rows), default=1)
+    sheetHeight = max(1, sum(max(frame.get_height() for frame in frames) for _, _, frames in rows))
+    sheet = pygame.Surface((sheetWidth, sheetHeight), pygame.SRCALPHA)
+    placements = []
+    y = 0
+    for facing, name, frames in rows:
+        x = 0
+        for frame in frames:
+            sheet.blit(frame if facing > 0 else pygame.transform.flip(frame, True, False), (x, y))
+            placements.append((facing, name, (x, y, frame.get_width(), frame.get_height())))
+            x += frame.get_width()
+        y += max(frame.get_height() for frame in frames)
+    return sheet, list(animations), placements
+
+
+def sliceSpriteSheet(sheet, names, placements):
+    # frames come back as subsurfaces of the sheet, so drawing never allocates
+    sprites = {"sheet": sheet, 1: {}, -1: {}}
+    for name in names:
+        sprites[1][name] = []
+        sprites[-1][name] = []
+    for facing, name, rect in placements:
+        sprites[facing][name].append(sheet.subsurface(pygame.Rect(rect)))
+    return sprites
+
+
+def assetFingerprint():
+    # changes whenever a source image is added, removed, touched or resized
+    digest = hashlib.sha1(f"v{assetCacheVersion} scale {playerScale}".encode())
+    for root, dirs, files in os.walk(assetDir):
+        dirs.sort()
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            info = os.stat(path)
+            digest.update(f"{os.path.relpath(path, assetDir)} {info.st_size} {info.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def readAssetCache(name, fingerprint):
+    indexPath = os.path.join(assetCacheDir, name + ".json")
+    try:
+        with open(indexPath) as handle:
+            index = json.load(handle)
+        if index["fingerprint"] != fingerprint:
+            return None
+        with open(os.path.join(assetCacheDir, name + ".bgra"), "rb") as handle:
+            pixels = handle.read()
+        # BGRA is the layout convert_alpha produces, so the blob is used as-is
+        sheet = pygame.image.frombuffer(pixels, tuple(index["size"]), "BGRA")
+    except (OSError, ValueError, KeyError):
+        return None
+    placements = [(facing, frameName, tuple(rect)) for facing, frameName, rect in index["frames"]]
+    return sheet, index["names"], placements
+
+
+def writeAssetCache(name, fingerprint, sheet, names, placements):
+    index = {
+        "fingerprint": fingerprint,
+        "size": list(sheet.get_size()),
+        "names": names,
+        "frames": [[facing, frameName, list(rect)] for facing, frameName, rect in placements],
     }
+    try:
+        os.makedirs(assetCacheDir, exist_ok=True)
+        # blob first, index last: a stale index never points at a half-written blob
+        for suffix, payload, mode in ((".bgra", pygame.image.tobytes(sheet, "BGRA"), "wb"), (".json", json.dumps(index), "w")):
+            path = os.path.join(assetCacheDir, name + suffix)
+            with open(path + ".tmp", mode) as handle:
+                handle.write(payload)
+            os.replace(path + ".tmp", path)
+    except OSError:
+        pass  # a read-only install still runs, it just rebuilds every launch
+
+
+def loadPlayerSprites(convert=True):
+    # decoded once per process and shared by every reboot; on disk the scaled,
+    # mirrored sheet is kept as raw pixels so later launches skip PNG decoding
+    if convert in spriteCache:
+        return spriteCache[convert]
+    fingerprint = assetFingerprint()
+    cached = readAssetCache("player", fingerprint)
+    if cached is None:
+        sheet, names, placements = packSpriteSheet(loadPlayerAnimations())
+        writeAssetCache("player", fingerprint, sheet, names, placements)
+        if convert:
+            sheet = sheet.convert_alpha()
+    else:
+        sheet, names, placements = cached
+    sprites = sliceSpriteSheet(sheet, names, placements)
+    spriteCache[convert] = sprites
+    return sprites
+
+
+class Player:
+    __slots__ = (
+        "pos", "prev", "radius", "speed", "maxHealth", "health", "cool", "heat", "reload", "isReloading",
+        "ammo", "maxAmmo", "dash", "damage", "coolRate", "fireDelay", "animations", "sprites",
+        "animState", "animFrame", "animTimer", "animSpeeds", "isMoving", "facing", "shootTimer",
+        "isDead", "deathPlayed",
+    )
+
+    def __init__(self, sprites):
+        # Calculate hitbox size (slightly smaller than the visual representation)
+        base_radius = 16  # Base radius for hitbox (before scaling)
+
+        self.pos = pygame.Vector2(width / 2, height / 2)
+        self.prev = pygame.Vector2(self.pos)  # position one tick ago, for render interpolation
+        self.radius = base_radius * playerScale  # Scale the hitbox to match player size
+        self.speed = 360
+        self.maxHealth = 130
+        self.health = 130
+        self.cool = 0.0  # Cooldown between shots
+        self.heat = 0.0  # Heat from sprinting
+        self.reload = 0.0  # Reload timer
+        self.isReloading = False  # Whether the player is currently reloading
+        self.ammo = 10  # Current ammo count
+        self.maxAmmo = 10  # Maximum ammo capacity
+        self.dash = 0.0
+        self.damage = 1
+        self.coolRate = 0.8
+        self.fireDelay = 0.18
+        self.animations = sprites[1]
+        self.sprites = sprites
+        self.animState = "idle"
+        self.animFrame = 0
+        self.animTimer = 0.0
+        self.animSpeeds = {"idle": 0.22, "run": 0.08, "reload": 0.12, "shoot": 0.12, "death": 0.28}
+        self.isMoving = False
+        self.facing = 1
+        self.shootTimer = 0.0
+        self.isDead = False
+        self.deathPlayed = False
+
+
+class Enemy:
+    __slots__ = ("pos", "speed", "hp", "size", "mood", "prev", "lag")
+
+    def __init__(self, pos, speed, hp, size, mood=0.0, prev=None, lag=0.0):
+        self.pos = pos
+        self.speed = speed
+        self.hp = hp
+        self.size = size
+        self.mood = mood
+        self.prev = pygame.Vector2(pos if prev is None else prev)
+        self.lag = lag  # simulated time owed since its last step, while off-screen
+
+
+class Shot:
+    __slots__ = ("pos", "vel", "damage", "life", "radius", "prev")
+
+    def __init__(self, pos=(0, 0), vel=(0, 0), damage=1, life=0.0, radius=6, prev=None):
+        self.pos = pygame.Vector2(pos)
+        self.vel = pygame.Vector2(vel)
+        self.damage = damage
+        self.life = life
+        self.radius = radius
+        self.prev = pygame.Vector2(pos if prev is None else prev)
+
+
+class Coin:
+    __slots__ = ("pos", "vel", "value", "radius", "prev")
+
+    def __init__(self, pos=(0, 0), vel=(0, 0), value=1, radius=10, prev=None):
+        self.pos = pygame.Vector2(pos)
+        self.vel = pygame.Vector2(vel)
+        self.value = value
+        self.radius = radius
+        self.prev = pygame.Vector2(pos if prev is None else prev)
+
+
+def releaseRecord(pool, record):
+    # spent shots and coins go back on a free list and are refilled in place
+    if len(pool) < poolLimit:
+        pool.append(record)
+
+
+def createPlayer(convert=True):
+    # headless runs skip convert_alpha, which needs a display
+    return Player(loadPlayerSprites(convert=convert))
 
 
 def createShot(player, target):
     # Can't shoot while cooling down, reloading, or out of ammo
-    if player["cool"] > 0 or player["isReloading"] or player["ammo"] <= 0:
+    if player.cool > 0 or player.isReloading or player.ammo <= 0:
         return None
         
-    direction = target - player["pos"]
+    direction = target - player.pos
     if direction.length_squared() == 0:
         direction = pygame.Vector2(1, 0)
     direction = direction.normalize()
     
     # Base speed with slight variation based on movement
-    speed = 650 + (player["heat"] * 30 if player["isMoving"] else 0)
+    speed = 650 + (player.heat * 30 if player.isMoving else 0)
     
-    shot = {
-        "pos": player["pos"].copy(),
-        "vel": direction * speed,
-        "damage": player["damage"],
-        "life": 1.3,
-        "radius": 6,
-    }
+    shot = shotPool.pop() if shotPool else Shot()
+    shot.pos.update(player.pos)
+    shot.prev.update(player.pos)
+    shot.vel.update(direction.x * speed, direction.y * speed)
+    shot.damage = player.damage
+    shot.life = 1.3
+    shot.radius = 6
     
-    player["cool"] = player["fireDelay"]
-    player["ammo"] -= 1
-    player["shootTimer"] = shootAnimDuration
+    player.cool = player.fireDelay
+    player.ammo -= 1
+    player.shootTimer = shootAnimDuration
     
     # Start reloading if out of ammo
-    if player["ammo"] <= 0:
-        player["isReloading"] = True
-        player["reload"] = 1.5  # 1.5 second reload time
+    if player.ammo <= 0:
+        player.isReloading = True
+        player.reload = 1.5  # 1.5 second reload time
     
     return shot
 
 
-def createEnemy(wave):
-    if random.random() < 0.25:
+def createEnemy(rng, wave):
+    if rng.random() < 0.25:
         edge = "top"
     else:
-        edge = random.choice(["bottom", "left", "right"])
+        edge = rng.choice(["bottom", "left", "right"])
     padding = 80
     if edge == "top":
-        pos = pygame.Vector2(random.randint(0, width), -padding)
+        pos = pygame.Vector2(rng.randint(0, width), -padding)
     elif edge == "bottom":
-        pos = pygame.Vector2(random.randint(0, width), height + padding)
+        pos = pygame.Vector2(rng.randint(0, width), height + padding)
     elif edge == "left":
-        pos = pygame.Vector2(-padding, random.randint(0, height))
+        pos = pygame.Vector2(-padding, rng.randint(0, height))
     else:
-        pos = pygame.Vector2(width + padding, random.randint(0, height))
-    return {
-        "pos": pos,
-        "speed": random.uniform(100, 190) + wave * 7,
-        "hp": 2 + wave // 3,
-        "size": random.randint(18, 32),
-        "mood": 0.0,
-    }
-
-
-def createCoin(position):
-    return {
-        "pos": position.copy(),
-        "vel": pygame.Vector2(random.uniform(-120, 120), random.uniform(-260, -120)),
-        "value": random.choice([1, 1, 2]),
-        "radius": 10,
-    }
-
-
-def buildGameState():
-    screen = pygame.display.set_mode((width, height))
-    pygame.display.set_caption("Last Hope")
+        pos = pygame.Vector2(width + padding, rng.randint(0, height))
+    return Enemy(
+        pos,
+        speed=rng.uniform(100, 190) + wave * balance["enemySpeedPerWave"],
+        hp=balance["enemyHpBase"] + wave // balance["enemyHpWaves"],
+        size=rng.randint(18, 32),
+    )
+
+
+def createCoin(rng, position):
+    coin = coinPool.pop() if coinPool else Coin()
+    coin.pos.update(position)
+    coin.prev.update(position)
+    coin.vel.update(rng.uniform(-120, 120), rng.uniform(-260, -120))
+    coin.value = rng.choice([1, 1, 2])
+    coin.radius = 10
+    return coin
+
+
+def buildGameState(backend=None, headless=False, renderMode=None, seed=None, screen=None):
+    backend = backend or simBackend
+    if seed is None:
+        seed = random.getrandbits(63)
+    if backend == "numpy" and np is None:
+        raise RuntimeError("the numpy backend needs numpy installed")
+    if not headless and screen is None:
+        screen = openDisplay()
     state = {
         "screen": screen,
         "clock": pygame.time.Clock(),
-        "player": createPlayer(),
-        "shots": [],
-        "enemies": [],
-        "coins": [],
+        "backend": backend,
+        "headless": headless,
+        "renderMode": renderMode or defaultRenderMode,
+        "dirtyRects": None,  # rects drawn last frame, in dirty-rect mode
+        "interpolate": False,  # whether the last tick moved anything, so renders may blend
+        "seed": seed,
+        "rng": random.Random(seed),  # every gameplay roll goes through this, so runs replay exactly
+        "player": createPlayer(convert=not headless),
+        "allies": [],  # co-op partners, each steered by the matching entry of allyFrames
+        "allyFrames": [],
+        "shots": createEntityStore("shots") if backend == "numpy" else [],
+        "enemies": createEntityStore("enemies") if backend == "numpy" else [],
+        "coins": createEntityStore("coins") if backend == "numpy" else [],
+        "coinPiles": [0] * coinPileCount,  # value resting in each floor slot
+        "particles": None if headless else createParticles(seed),
         "spawnTimer": 0.5,
+        "lodCursor": 0,  # first off-screen enemy (by rank) due a step this tick
+        "enemyDt": 0.0,  # longest step any enemy took this tick, for the collision sweep
         "wave": 1,
         "score": 0,
         "coinsBank": 0,
@@ -192,427 +463,1160 @@ def buildGameState():
         "shopCards": [],
         "coinBonus": 1,
         "shopNoteTimer": 0.0,
+        "timings": None,  # phase name -> seconds this frame, when profiling
+        "profiler": None,
         "dialog": [
             "dear dystopia journal: still no pizza",
             "i coded this resistance sim so people remember",
             "press SPACE to patrol the lunch plaza",
         ],
-        "shopPool": [
-            {"name": "heat sink", "desc": "vents faster cool down", "cost": 6, "effect": "heatSink"},
-            {"name": "side hustle", "desc": "+1 shot damage", "cost": 8, "effect": "damage"},
-            {"name": "restock", "desc": "+35 hp instantly", "cost": 5, "effect": "heal"},
-            {"name": "armor plating", "desc": "+15 max hp (and heal)", "cost": 7, "effect": "maxHealth"},
-            {"name": "espresso skates", "desc": "+45 move speed", "cost": 6, "effect": "speed"},
-            {"name": "trigger tweak", "desc": "faster fire rate", "cost": 7, "effect": "fireRate"},
-            {"name": "coin printer", "desc": "coins drop x2 value", "cost": 10, "effect": "coinBonus"},
-        ],
+        "shopPool": [dict(option) for option in shopOptions],
+        "runStats": {"time": 0.0, "upgrades": [], "peaks": {"shots": 0, "enemies": 0, "coins": 0}},
+        "scoreStore": None,  # background high-score writer, in windowed sessions
     }
     return state
 
 
+def runPhase(state, name, fn, *args):
+    # call fn, adding its wall time to state["timings"] when profiling is on
+    timings = state["timings"]
+    if timings is None:
+        return fn(*args)
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    timings[name] = timings.get(name, 0.0) + elapsed
+    if state["profiler"] is not None:
+        state["profiler"]["spans"].append((name, started, elapsed))
+    return result
+
+
+def percentile(ordered, fraction, default=None):
+    # nearest-rank percentile of an already sorted sequence; shared by the benches and tools
+    if not ordered:
+        return default
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
 # drawing helpers
+# The simulation works in width x height units. Everything is drawn at
+# renderScale of that and scaled up to the window, so weak machines can trade
+# sharpness for fill rate.
+
+def scaled(value):
+    return int(value * renderScale)
+
+
+def scaledRect(x, y, w, h):
+    return pygame.Rect(scaled(x), scaled(y), scaled(w), scaled(h))
+
+
+def spriteRadius(radius):
+    return max(1, round(radius * renderScale))
+
+
+def setRenderScale(scale):
+    # drop everything rasterised at the old scale
+    global renderScale, backgroundCache, profilerPanel
+    renderScale = scale
+    fonts.clear()
+    backgroundCache = None
+    profilerPanel = None
+    entitySprites.clear()
+    scaledFrames.clear()
+    textCache.clear()
+
+
+def openDisplay():
+    # SDL scales the small surface up to the window in hardware; without a
+    # renderer we draw off-screen and presentFrame scales it in one pass
+    pygame.display.init()
+    size = (scaled(width), scaled(height))
+    screen = None
+    # SCALED only ever picks a whole multiple, and the biggest the desktop fits,
+    # so it is kept only when that lands exactly on the full window size
+    if renderScale != 1 and width % size[0] == 0 and size[1] * (width // size[0]) == height:
+        try:
+            screen = pygame.display.set_mode(size, pygame.SCALED)
+            if pygame.display.get_window_size() != (width, height):
+                screen = None
+        except pygame.error:
+            pass
+    if screen is None:
+        window = pygame.display.set_mode((width, height))
+        screen = window if window.get_size() == size else pygame.Surface(size).convert()
+    pygame.display.set_caption("Last Hope")
+    return screen
 
-def drawBackground(screen):
-    screen.fill(darkBackdrop)
-    pygame.draw.rect(screen, midGray, pygame.Rect(0, cityFloor, width, height - cityFloor))
+
+def cycleRenderScale(state):
+    # F6: next quality preset, reopening the display at its internal resolution
+    index = renderScales.index(renderScale) if renderScale in renderScales else -1
+    setRenderScale(renderScales[(index + 1) % len(renderScales)])
+    prerenderEntitySprites()
+    state["screen"] = openDisplay()
+    state["dirtyRects"] = None
+
+
+def scaledSprite(surface):
+    sprite = scaledFrames.get(surface)
+    if sprite is None:
+        size = (max(1, scaled(surface.get_width())), max(1, scaled(surface.get_height())))
+        sprite = scaledFrames[surface] = surface if renderScale == 1 else pygame.transform.scale(surface, size)
+    return sprite
+
+def paintCity(surface):
+    surface.fill(darkBackdrop)
+    pygame.draw.rect(surface, midGray, pygame.Rect(0, cityFloor, width, height - cityFloor))
     for i in range(7):
         buildingWidth = 90
         gap = 110
         baseX = (i * gap + (i % 2) * 30) % width
         buildingHeight = 120 + (i * 27 % 180)
-        pygame.draw.rect(screen, lightGray, pygame.Rect(baseX, cityFloor - buildingHeight, 70, buildingHeight))
-        pygame.draw.rect(screen, (90, 90, 120), pygame.Rect(baseX + 15, cityFloor - buildingHeight - 16, 40, 18))
+        pygame.draw.rect(surface, lightGray, pygame.Rect(baseX, cityFloor - buildingHeight, 70, buildingHeight))
+        pygame.draw.rect(surface, (90, 90, 120), pygame.Rect(baseX + 15, cityFloor - buildingHeight - 16, 40, 18))
+
+
+def getFont(name):
+    font = fonts.get(name)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = fonts[name] = pygame.font.Font(None, max(8, round(fontSizes[name] * renderScale)))
+    return font
+
+
+def renderText(font, text, color, antialias=True):
+    # bounded LRU of rendered strings; most HUD and menu text repeats every frame
+    key = (font, text, color, antialias)
+    surface = textCache.get(key)
+    if surface is not None:
+        textCacheStats["hits"] += 1
+        textCache.move_to_end(key)
+        return surface
+    textCacheStats["misses"] += 1
+    surface = font.render(text, antialias, color)
+    textCache[key] = surface
+    if len(textCache) > textCacheLimit:
+        textCache.popitem(last=False)
+    return surface
+
+
+def blitGlyphText(screen, font, text, color, pos):
+    # compose fast-changing numbers from cached glyphs instead of rasterising
+    # the whole string again whenever a digit changes
+    x, y = pos
+    for char in text:
+        glyph = renderText(font, char, color)
+        screen.blit(glyph, (x, y))
+        x += glyph.get_width()
+    return pygame.Rect(pos[0], y, x - pos[0], font.get_height())
+
+
+def getBackground():
+    # the city never changes, so it is painted once and blitted after that
+    global backgroundCache
+    if backgroundCache is None:
+        surface = pygame.Surface((width, height))
+        paintCity(surface)
+        if renderScale != 1:
+            surface = pygame.transform.smoothscale(surface, (scaled(width), scaled(height)))
+        backgroundCache = surface.convert() if pygame.display.get_surface() else surface
+    return backgroundCache
+
 
+def drawBackground(screen):
+    return [screen.blit(getBackground(), (0, 0))]
+
+
+def restoreBackground(screen, rects):
+    background = getBackground()
+    for rect in rects:
+        screen.blit(background, rect, rect)
 
-def drawPlayer(screen, player):
-    frames = player["animations"].get(player["animState"], [])
+
+def drawPlayer(screen, player, alpha=1.0):
+    dirty = []
+    center = (
+        scaled(player.prev.x + (player.pos.x - player.prev.x) * alpha),
+        scaled(player.prev.y + (player.pos.y - player.prev.y) * alpha),
+    )
+    frames = player.sprites[1 if player.facing >= 0 else -1].get(player.animState, [])
     if frames:
-        base_frame = frames[player["animFrame"] % len(frames)]
-        sprite = base_frame if player["facing"] >= 0 else pygame.transform.flip(base_frame, True, False)
-        rect = sprite.get_rect(center=(int(player["pos"].x), int(player["pos"].y)))
-        screen.blit(sprite, rect)
+        sprite = scaledSprite(frames[player.animFrame % len(frames)])
+        rect = sprite.get_rect(center=center)
+        dirty.append(screen.blit(sprite, rect))
     else:
-        pygame.draw.circle(screen, neonBlue, (int(player["pos"].x), int(player["pos"].y)), player["radius"])
-    if player["dash"] > 0:
-        pygame.draw.circle(
+        dirty.append(pygame.draw.circle(screen, neonBlue, center, spriteRadius(player.radius)))
+    if player.dash > 0:
+        dirty.append(pygame.draw.circle(
             screen,
             (180, 255, 255),
-            (int(player["pos"].x), int(player["pos"].y)),
-            player["radius"],
-            width=2,
-        )
-
-
-def drawEnemies(screen, enemies):
+            center,
+            spriteRadius(player.radius),
+            width=spriteRadius(2),
+        ))
+    return dirty
+
+
+def circleSprite(radius, color, dot=None):
+    radius = spriteRadius(radius)
+    surface = pygame.Surface((radius * 2, radius * 2))
+    surface.fill(spriteColorKey)
+    pygame.draw.circle(surface, color, (radius, radius), radius)
+    if dot:
+        pygame.draw.circle(surface, dot, (radius, radius), spriteRadius(4))
+    if pygame.display.get_surface():
+        surface = surface.convert()
+    surface.set_colorkey(spriteColorKey, pygame.RLEACCEL)
+    return surface
+
+
+def enemySpriteRow(size):
+    # one sprite per tint bucket for this size; moods past the last bucket reuse it
+    row = entitySprites.get(("enemy", size))
+    if row is None:
+        row = []
+        for bucket in range(enemyTintBuckets):
+            red = 120 + bucket * 150 // (enemyTintBuckets - 1)
+            row.append(circleSprite(size, (min(255, red), 40, 60), (0, 0, 0)))
+        entitySprites[("enemy", size)] = row
+    return row
+
+
+def shotSprite(radius):
+    sprite = entitySprites.get(("shot", radius))
+    if sprite is None:
+        sprite = entitySprites[("shot", radius)] = circleSprite(radius, neonPink)
+    return sprite
+
+
+def coinSprite(radius):
+    sprite = entitySprites.get(("coin", radius))
+    if sprite is None:
+        sprite = entitySprites[("coin", radius)] = circleSprite(radius, coinGold, (255, 255, 255))
+    return sprite
+
+
+def prerenderEntitySprites():
+    # rasterise every enemy size and tint up front so the first waves never hitch
+    for size in range(18, 33):
+        enemySpriteRow(size)
+    shotSprite(6)
+    for radius in range(10, 17):  # loose coins and every pile size
+        coinSprite(radius)
+
+
+# entities are drawn alpha of the way from their previous tick to the current one
+
+def drawEnemies(screen, enemies, alpha=1.0):
+    rows = {}
+    bucketScale = (enemyTintBuckets - 1) / 7.5  # mood reaches the full tint (150) at 7.5
+    lastBucket = enemyTintBuckets - 1
+    batch = []
     for enemy in enemies:
-        tint = min(150, int(enemy["mood"] * 20))
-        color = (min(255, 120 + tint), 40, 60)
-        pygame.draw.circle(screen, color, (int(enemy["pos"].x), int(enemy["pos"].y)), enemy["size"])
-        pygame.draw.circle(screen, (0, 0, 0), (int(enemy["pos"].x), int(enemy["pos"].y)), 4)
+        size = enemy.size
+        pos, prev = enemy.pos, enemy.prev
+        if not onScreen(pos.x, pos.y, size):
+            continue
+        row = rows.get(size) or rows.setdefault(size, enemySpriteRow(size))
+        bucket = min(lastBucket, int(enemy.mood * bucketScale))
+        x = prev.x + (pos.x - prev.x) * alpha
+        y = prev.y + (pos.y - prev.y) * alpha
+        half = spriteRadius(size)
+        batch.append((row[bucket], (scaled(x) - half, scaled(y) - half)))
+    return screen.blits(batch)
 
 
-def drawShots(screen, shots):
+def drawShots(screen, shots, alpha=1.0):
+    batch = []
     for shot in shots:
-        pygame.draw.circle(screen, neonPink, (int(shot["pos"].x), int(shot["pos"].y)), shot["radius"])
+        radius = shot.radius
+        pos, prev = shot.pos, shot.prev
+        x = prev.x + (pos.x - prev.x) * alpha
+        y = prev.y + (pos.y - prev.y) * alpha
+        half = spriteRadius(radius)
+        batch.append((shotSprite(radius), (scaled(x) - half, scaled(y) - half)))
+    return screen.blits(batch)
 
 
-def drawCoins(screen, coins):
+def drawCoins(screen, coins, alpha=1.0):
+    batch = []
     for coin in coins:
-        pygame.draw.circle(screen, coinGold, (int(coin["pos"].x), int(coin["pos"].y)), coin["radius"])
-        pygame.draw.circle(screen, (255, 255, 255), (int(coin["pos"].x), int(coin["pos"].y)), 4)
+        radius = coin.radius
+        pos, prev = coin.pos, coin.prev
+        x = prev.x + (pos.x - prev.x) * alpha
+        y = prev.y + (pos.y - prev.y) * alpha
+        half = spriteRadius(radius)
+        batch.append((coinSprite(radius), (scaled(x) - half, scaled(y) - half)))
+    return screen.blits(batch)
+
+
+def drawCoinPiles(screen, piles):
+    batch = []
+    for index, value in enumerate(piles):
+        if value:
+            radius = pileRadius(value)
+            half = spriteRadius(radius)
+            x = scaled((index + 0.5) * coinPileWidth)
+            batch.append((coinSprite(radius), (x - half, scaled(cityFloor - radius) - half)))
+    return screen.blits(batch)
+
+
+def drawEntities(screen, state, alpha=1.0):
+    dirty = runPhase(state, "drawCoinPiles", drawCoinPiles, screen, state["coinPiles"])
+    if state["backend"] == "numpy":
+        dirty += runPhase(state, "drawCoins", drawCoinArrays, screen, state["coins"], alpha)
+        dirty += runPhase(state, "drawEnemies", drawEnemyArrays, screen, state["enemies"], alpha)
+        dirty += runPhase(state, "drawShots", drawShotArrays, screen, state["shots"], alpha)
+    else:
+        dirty += runPhase(state, "drawCoins", drawCoins, screen, state["coins"], alpha)
+        dirty += runPhase(state, "drawEnemies", drawEnemies, screen, state["enemies"], alpha)
+        dirty += runPhase(state, "drawShots", drawShots, screen, state["shots"], alpha)
+    return dirty
 
 
 def drawHud(screen, state):
     player = state["player"]
+    dirty = []
     
     # Health bar
-    pygame.draw.rect(screen, (55, 35, 45), pygame.Rect(30, 30, 340, 26), border_radius=8)
-    health_ratio = player["health"] / player["maxHealth"]
-    pygame.draw.rect(screen, neonPink, pygame.Rect(30, 30, 340 * health_ratio, 26), border_radius=8)
-    screen.blit(uiFont.render(f"HP {int(player['health'])}/{player['maxHealth']}", True, (255, 255, 255)), (40, 32))
+    dirty.append(pygame.draw.rect(screen, (55, 35, 45), scaledRect(30, 30, 340, 26), border_radius=scaled(8)))
+    health_ratio = player.health / player.maxHealth
+    pygame.draw.rect(screen, neonPink, scaledRect(30, 30, 340 * health_ratio, 26), border_radius=scaled(8))
+    dirty.append(blitGlyphText(screen, getFont("ui"), f"HP {int(player.health)}/{player.maxHealth}", (255, 255, 255), (scaled(40), scaled(32))))
     
     # Ammo counter
-    ammo_text = f"{player['ammo']}/{player['maxAmmo']}"
-    ammo_surface = uiFont.render(ammo_text, True, (255, 255, 255))
-    screen.blit(ammo_surface, (40, 65))
+    ammo_text = f"{player.ammo}/{player.maxAmmo}"
+    dirty.append(blitGlyphText(screen, getFont("ui"), ammo_text, (255, 255, 255), (scaled(40), scaled(65))))
     
     # Reload indicator
-    if player["isReloading"]:
-        reload_progress = 1 - (player["reload"] / 1.5)  # 1.5 second reload time
+    if player.isReloading:
+        reload_progress = 1 - (player.reload / 1.5)  # 1.5 second reload time
         reload_width = 100
-        pygame.draw.rect(screen, (50, 50, 60), pygame.Rect(120, 70, reload_width, 10), border_radius=5)
-        pygame.draw.rect(screen, neonBlue, pygame.Rect(120, 70, int(reload_width * reload_progress), 10), border_radius=5)
+        dirty.append(pygame.draw.rect(screen, (50, 50, 60), scaledRect(120, 70, reload_width, 10), border_radius=scaled(5)))
+        pygame.draw.rect(screen, neonBlue, scaledRect(120, 70, int(reload_width * reload_progress), 10), border_radius=scaled(5))
     
     # Heat meter
     heat_width = 100
-    heat_ratio = player["heat"] / 3.0
-    pygame.draw.rect(screen, (50, 40, 45), pygame.Rect(40, 90, heat_width, 8), border_radius=4)
+    heat_ratio = player.heat / 3.0
+    dirty.append(pygame.draw.rect(screen, (50, 40, 45), scaledRect(40, 90, heat_width, 8), border_radius=scaled(4)))
     if heat_ratio > 0:
         heat_color = (
             min(255, 150 + int(heat_ratio * 105)),  # R: 150-255
             max(0, 100 - int(heat_ratio * 100)),    # G: 100-0
             40                                      # B: 40
         )
-        pygame.draw.rect(screen, heat_color, pygame.Rect(40, 90, int(heat_width * heat_ratio), 8), border_radius=4)
+        pygame.draw.rect(screen, heat_color, scaledRect(40, 90, int(heat_width * heat_ratio), 8), border_radius=scaled(4))
     
     # Game info
-    screen.blit(uiFont.render(f"score {state['score']}", True, (215, 255, 200)), (width - 230, 34))
-    screen.blit(uiFont.render(f"coins {state['coinsBank']}", True, coinGold), (width - 230, 66))
-    screen.blit(uiFont.render(f"wave {state['wave']}", True, (200, 220, 255)), (width - 230, 98))
+    dirty.append(blitGlyphText(screen, getFont("ui"), f"score {state['score']}", (215, 255, 200), (scaled(width - 230), scaled(34))))
+    dirty.append(blitGlyphText(screen, getFont("ui"), f"coins {state['coinsBank']}", coinGold, (scaled(width - 230), scaled(66))))
+    dirty.append(blitGlyphText(screen, getFont("ui"), f"wave {state['wave']}", (200, 220, 255), (scaled(width - 230), scaled(98))))
     
     # Shop message
     if state["shopMessage"]:
-        note = smallFont.render(state["shopMessage"], True, (255, 255, 255))
-        screen.blit(note, (width // 2 - note.get_width() // 2, 20))
+        note = renderText(getFont("small"), state["shopMessage"], (255, 255, 255))
+        dirty.append(screen.blit(note, (scaled(width // 2) - note.get_width() // 2, scaled(20))))
     
     # Overheat warning
-    if player["heat"] > 2.5:
-        warning = smallFont.render("OVERHEAT! SLOWED", True, heatOrange)
-        screen.blit(warning, (40, 110))
+    if player.heat > 2.5:
+        warning = renderText(getFont("small"), "OVERHEAT! SLOWED", heatOrange)
+        dirty.append(screen.blit(warning, (scaled(40), scaled(110))))
+    return dirty
 
 
-def drawMenu(screen, dialog):
-    title = bigFont.render("LAST HOPE", True, neonBlue)
-    screen.blit(title, (width // 2 - title.get_width() // 2, 160))
+def drawMenu(screen, dialog, scores=None):
+    title = renderText(getFont("big"), "LAST HOPE", neonBlue)
+    dirty = [screen.blit(title, (scaled(width // 2) - title.get_width() // 2, scaled(160)))]
     for idx, line in enumerate(dialog):
-        txt = uiFont.render(line, True, (230, 230, 230))
-        screen.blit(txt, (width // 2 - txt.get_width() // 2, 260 + 40 * idx))
+        txt = renderText(getFont("ui"), line, (230, 230, 230))
+        dirty.append(screen.blit(txt, (scaled(width // 2) - txt.get_width() // 2, scaled(260 + 40 * idx))))
+    # top runs appear once the score store has loaded them; until then the menu skips them
+    lines = [f"{idx + 1}. {score}  wave {wave}  {int(survival) // 60}m{int(survival) % 60:02d}s"
+             for idx, (score, wave, survival, _) in enumerate(scores or ())]
+    if lines:
+        lines.insert(0, "best runs")
+    for idx, line in enumerate(lines):
+        txt = renderText(getFont("small"), line, coinGold if idx == 0 else (200, 200, 215))
+        dirty.append(screen.blit(txt, (scaled(width // 2) - txt.get_width() // 2, scaled(400 + 26 * idx))))
+    return dirty
 
 
 def drawGameOver(screen):
-    msg = bigFont.render("system failure", True, heatOrange)
-    tip = uiFont.render("press R to reboot the rebellion", True, (255, 255, 255))
-    screen.blit(msg, (width // 2 - msg.get_width() // 2, height // 2 - 40))
-    screen.blit(tip, (width // 2 - tip.get_width() // 2, height // 2 + 10))
+    msg = renderText(getFont("big"), "system failure", heatOrange)
+    tip = renderText(getFont("ui"), "press R to reboot the rebellion", (255, 255, 255))
+    return [
+        screen.blit(msg, (scaled(width // 2) - msg.get_width() // 2, scaled(height // 2 - 40))),
+        screen.blit(tip, (scaled(width // 2) - tip.get_width() // 2, scaled(height // 2 + 10))),
+    ]
 
 
 def drawShop(screen, state):
     cards = state["shopCards"]
     optionCount = len(cards)
     panelWidth, panelHeight = 520, 70 + optionCount * 60
-    px = state["player"]["pos"].x - panelWidth / 2
+    px = state["player"].pos.x - panelWidth / 2
     px = max(40, min(width - panelWidth - 40, px))
-    py = max(80, state["player"]["pos"].y - state["player"]["radius"] - panelHeight - 20)
-    panel = pygame.Rect(px, py, panelWidth, panelHeight)
-    pygame.draw.rect(screen, (30, 30, 40), panel, border_radius=12)
-    pygame.draw.rect(screen, neonBlue, panel, width=3, border_radius=12)
+    py = max(80, state["player"].pos.y - state["player"].radius - panelHeight - 20)
+    panel = scaledRect(px, py, panelWidth, panelHeight)
+    pygame.draw.rect(screen, (30, 30, 40), panel, border_radius=scaled(12))
+    pygame.draw.rect(screen, neonBlue, panel, width=spriteRadius(3), border_radius=scaled(12))
     skipValue = optionCount + 1
-    title = uiFont.render(f"pop-up shop: pick (1-{optionCount}) or skip ({skipValue})", True, (255, 255, 255))
-    screen.blit(title, (panel.x + 18, panel.y + 18))
+    title = renderText(getFont("ui"), f"pop-up shop: pick (1-{optionCount}) or skip ({skipValue})", (255, 255, 255))
+    screen.blit(title, (panel.x + scaled(18), panel.y + scaled(18)))
     for idx, card in enumerate(cards):
         affordable = state["coinsBank"] >= card["cost"]
-        label = uiFont.render(
+        label = renderText(
+            getFont("ui"),
             f"{idx + 1}) {card['name']} [{card['cost']}c]",
-            True,
             (200, 255, 220) if affordable else (130, 130, 130),
         )
-        screen.blit(label, (panel.x + 24, panel.y + 60 + idx * 60))
-        detail = smallFont.render(card["desc"], True, (180, 180, 200))
-        screen.blit(detail, (panel.x + 32, panel.y + 90 + idx * 60))
-    skipText = uiFont.render(f"{skipValue}) close shop", True, (255, 255, 255))
-    screen.blit(skipText, (panel.x + 24, panel.y + panelHeight - 40))
+        screen.blit(label, (panel.x + scaled(24), panel.y + scaled(60 + idx * 60)))
+        detail = renderText(getFont("small"), card["desc"], (180, 180, 200))
+        screen.blit(detail, (panel.x + scaled(32), panel.y + scaled(90 + idx * 60)))
+    skipText = renderText(getFont("ui"), f"{skipValue}) close shop", (255, 255, 255))
+    screen.blit(skipText, (panel.x + scaled(24), panel.y + scaled(panelHeight - 40)))
+    return [panel]
+
+
+# input
+
+def createInputFrame(**fields):
+    # everything the simulation reads from the player for one tick
+    frame = {
+        "move": (0, 0),
+        "aim": (width / 2, height / 2),
+        "fire": False,
+        "sprint": False,
+        "dash": False,
+        "reload": False,
+        "start": False,
+        "shopChoice": 0,
+        "closeShop": False,
+        "reboot": False,
+        "toggleProfiler": False,
+        "dumpTrace": False,
+        "cycleQuality": False,
+        "quit": False,
+    }
+    frame.update(fields)
+    return frame
+
+
+def readInputFrame(events):
+    frame = createInputFrame()
+    for event in events:
+        if event.type == pygame.QUIT:
+            frame["quit"] = True
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                frame["quit"] = True
+            if event.key == pygame.K_r:
+                frame["reboot"] = True
+            if event.key == pygame.K_F3:
+                frame["toggleProfiler"] = True
+            if event.key == pygame.K_F4:
+                frame["dumpTrace"] = True
+            if event.key == pygame.K_F6:
+                frame["cycleQuality"] = True
+            if event.key == pygame.K_SPACE:
+                frame["start"] = True
+            if event.key in (pygame.K_LSHIFT, pygame.K_RSHIFT):
+                frame["dash"] = True  # a tap dashes; holding on keeps sprinting
+            digit = event.unicode if event.unicode else ""
+            if digit.isdigit():
+                frame["shopChoice"] = int(digit)
+            if event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
+                frame["closeShop"] = True
+    keys = pygame.key.get_pressed()
+    frame["move"] = (
+        (keys[pygame.K_d] or keys[pygame.K_RIGHT]) - (keys[pygame.K_a] or keys[pygame.K_LEFT]),
+        (keys[pygame.K_s] or keys[pygame.K_DOWN]) - (keys[pygame.K_w] or keys[pygame.K_UP]),
+    )
+    frame["sprint"] = bool(keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT])
+    frame["fire"] = bool(pygame.mouse.get_pressed()[0] or keys[pygame.K_SPACE])
+    frame["reload"] = bool(keys[pygame.K_r])
+    # the mouse is in screen pixels, which are renderScale of a simulation unit under SCALED
+    mouseX, mouseY = pygame.mouse.get_pos()
+    surface = pygame.display.get_surface()
+    unit = width / surface.get_width() if surface is not None else 1
+    frame["aim"] = (mouseX * unit, mouseY * unit)
+    return frame
+
+
+# input logs: a header, then one fixed-size record per frame. Frames are
+# quantised through the record format before the simulation sees them, so a
+# replay feeds stepGame bit-identical input and dt.
+
+def packInputFrame(dt, frame):
+    buttons = 0
+    for bit, name in enumerate(inputLogButtons):
+        if frame[name]:
+            buttons |= 1 << bit
+    aimX, aimY = (max(-32768, min(32767, round(value))) for value in frame["aim"])
+    moveX, moveY = (max(-1, min(1, int(value))) for value in frame["move"])
+    return inputLogRecord.pack(dt, moveX, moveY, aimX, aimY, buttons, frame["shopChoice"])
+
+
+def unpackInputFrame(data):
+    dt, moveX, moveY, aimX, aimY, buttons, shopChoice = inputLogRecord.unpack(data)
+    frame = createInputFrame(move=(moveX, moveY), aim=(aimX, aimY), shopChoice=shopChoice)
+    for bit, name in enumerate(inputLogButtons):
+        frame[name] = bool(buttons >> bit & 1)
+    return dt, frame
+
+
+def openInputLog(path, state):
+    log = open(path, "wb")
+    log.write(inputLogHeader.pack(inputLogMagic, inputLogVersion, inputLogBackends.index(state["backend"]), state["seed"]))
+    return log
+
+
+def recordInput(log, dt, frame):
+    data = packInputFrame(dt, frame)
+    log.write(data)
+    return unpackInputFrame(data)
+
+
+def closeInputLog(log, state):
+    # a negative dt marks the trailing summary the replay is checked against
+    log.write(inputLogRecord.pack(-1.0, 0, 0, 0, 0, 0, 0))
+    log.write(inputLogSummary.pack(state["score"], state["wave"], state["coinsBank"]))
+    log.close()
+
+
+def readInputLog(path):
+    with open(path, "rb") as handle:
+        data = handle.read()
+    if len(data) < inputLogHeader.size:
+        raise ValueError(f"{path} is not a Last Hope input log")
+    magic, version, backend, seed = inputLogHeader.unpack_from(data)
+    if magic != inputLogMagic or version != inputLogVersion:
+        raise ValueError(f"{path} is not a Last Hope input log (version {inputLogVersion})")
+    frames, expected = [], None
+    offset = inputLogHeader.size
+    while offset + inputLogRecord.size <= len(data):
+        dt, frame = unpackInputFrame(data[offset:offset + inputLogRecord.size])
+        offset += inputLogRecord.size
+        if dt < 0:
+            score, wave, coinsBank = inputLogSummary.unpack_from(data, offset)
+            expected = {"score": score, "wave": wave, "coinsBank": coinsBank}
+            break
+        frames.append((dt, frame))
+    return {"backend": inputLogBackends[backend], "seed": seed, "frames": frames, "expected": expected}
 
 
 # logic
 
-def movePlayer(player, dt, keys):
-    direction = pygame.Vector2(0, 0)
-    
+def movePlayer(player, dt, frame):
+    player.prev.update(player.pos)
+
     # Handle movement input
-    if keys[pygame.K_w] or keys[pygame.K_UP]:
-        direction.y -= 1
-    if keys[pygame.K_s] or keys[pygame.K_DOWN]:
-        direction.y += 1
-    if keys[pygame.K_a] or keys[pygame.K_LEFT]:
-        direction.x -= 1
-    if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
-        direction.x += 1
+    direction = pygame.Vector2(frame["move"])
     
-    # Handle sprinting (left shift)
-    isSprinting = (keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT]) and direction.length_squared() > 0
+    # Handle sprinting (shift)
+    isSprinting = frame["sprint"] and direction.length_squared() > 0
     
     if direction.length_squared() > 0:
         direction = direction.normalize()
-        player["isMoving"] = True
+        player.isMoving = True
         if abs(direction.x) > 0.05:
-            player["facing"] = 1 if direction.x > 0 else -1
+            player.facing = 1 if direction.x > 0 else -1
             
         # Apply sprinting effects
         if isSprinting:
-            player["heat"] = min(3.0, player["heat"] + dt * 2)  # Build up heat when sprinting
+            player.heat = min(3.0, player.heat + dt * 2)  # Build up heat when sprinting
         else:
-            player["heat"] = max(0, player["heat"] - dt * player["coolRate"])  # Cool down when not sprinting
+            player.heat = max(0, player.heat - dt * player.coolRate)  # Cool down when not sprinting
     else:
-        player["isMoving"] = False
-        player["heat"] = max(0, player["heat"] - dt * player["coolRate"])  # Cool down when not moving
+        player.isMoving = False
+        player.heat = max(0, player.heat - dt * player.coolRate)  # Cool down when not moving
     
     # Apply movement speed (reduced when overheated)
     speed_multiplier = 1.0
-    if player["heat"] > 2.5:  # Overheat penalty
+    if player.heat > 2.5:  # Overheat penalty
         speed_multiplier = 0.6
     elif isSprinting:
         speed_multiplier = 1.5  # Sprint speed boost
     
-    dash_speed = 1.65 if player["dash"] > 0 else 1.0
-    move_speed = player["speed"] * speed_multiplier * dash_speed * dt
+    dash_speed = 1.65 if player.dash > 0 else 1.0
+    move_speed = player.speed * speed_multiplier * dash_speed * dt
     
     if direction.length_squared() > 0:
-        player["pos"] += direction * move_speed
+        player.pos += direction * move_speed
     
     # Keep player in bounds
-    player["pos"].x = max(player["radius"], min(width - player["radius"], player["pos"].x))
-    player["pos"].y = max(player["radius"], min(cityFloor - player["radius"], player["pos"].y))
+    player.pos.x = max(player.radius, min(width - player.radius, player.pos.x))
+    player.pos.y = max(player.radius, min(cityFloor - player.radius, player.pos.y))
     
     # Update cooldowns
-    player["cool"] = max(0, player["cool"] - dt)
-    player["dash"] = max(0, player["dash"] - dt)
+    player.cool = max(0, player.cool - dt)
+    player.dash = max(0, player.dash - dt)
     
     # Handle reloading
-    if player["isReloading"]:
-        player["reload"] -= dt
-        if player["reload"] <= 0:
-            player["isReloading"] = False
-            player["ammo"] = player["maxAmmo"]
+    if player.isReloading:
+        player.reload -= dt
+        if player.reload <= 0:
+            player.isReloading = False
+            player.ammo = player.maxAmmo
 
 
 def dashPlayer(player):
-    if player["heat"] > 2.7 or player["dash"] > 0:
+    if player.heat > 2.7 or player.dash > 0:
         return
-    player["dash"] = 0.3
-    player["heat"] += 0.5
+    player.dash = 0.3
+    player.heat += 0.5
+    return True
+
+
+def buildSpatialHash(entities, radiusKey, cellSize=None):
+    # uniform grid of list indices, rebuilt every tick
+    cellSize = cellSize or collisionCellSize
+    cells = {}
+    reach = 0
+    for index, entity in enumerate(entities):
+        pos = entity.pos
+        key = (int(pos.x // cellSize), int(pos.y // cellSize))
+        bucket = cells.get(key)
+        if bucket is None:
+            cells[key] = [index]
+        else:
+            bucket.append(index)
+        radius = getattr(entity, radiusKey)
+        if radius > reach:
+            reach = radius
+    return {"cells": cells, "cellSize": cellSize, "reach": reach}
+
+
+def queryCircle(grid, pos, radius):
+    # candidate indices for anything that could overlap a circle at pos
+    cells = grid["cells"]
+    if not cells:
+        return []
+    cellSize = grid["cellSize"]
+    reach = radius + grid["reach"]
+    minX = int((pos.x - reach) // cellSize)
+    maxX = int((pos.x + reach) // cellSize)
+    minY = int((pos.y - reach) // cellSize)
+    maxY = int((pos.y + reach) // cellSize)
+    found = []
+    for cx in range(minX, maxX + 1):
+        for cy in range(minY, maxY + 1):
+            bucket = cells.get((cx, cy))
+            if bucket:
+                found.extend(bucket)
+    return found
+
+
+def sweepHitTime(dx, dy, vx, vy, reach):
+    # earliest t in [0, 1] at which a point starting at (dx, dy) and moving by
+    # (vx, vy) comes within reach of the origin, or None if it never does
+    gap = dx * dx + dy * dy - reach * reach
+    if gap < 0:
+        return 0.0
+    closing = dx * vx + dy * vy
+    if closing >= 0:
+        return None
+    speed = vx * vx + vy * vy
+    disc = closing * closing - speed * gap
+    if disc < 0:
+        return None
+    t = (-closing - math.sqrt(disc)) / speed
+    return t if t <= 1 else None
 
 
 def updateShot(shot, dt):
-    shot["pos"] += shot["vel"] * dt
-    shot["life"] -= dt
-    return shot["life"] > 0 and -60 < shot["pos"].x < width + 60 and -60 < shot["pos"].y < height + 60
+    pos = shot.pos
+    shot.prev.update(pos)
+    pos.x += shot.vel.x * dt
+    pos.y += shot.vel.y * dt
+    shot.life -= dt
+
+
+def shotAlive(shot):
+    return shot.life > 0 and -60 < shot.pos.x < width + 60 and -60 < shot.pos.y < height + 60
 
 
 def updateEnemy(enemy, dt, playerPos):
-    direction = playerPos - enemy["pos"]
-    if direction.length_squared() == 0:
-        direction = pygame.Vector2(1, 0)
-    enemy["pos"] += direction.normalize() * enemy["speed"] * dt
-    enemy["mood"] += dt * 3
+    # scalar maths so the per-frame update allocates no vectors
+    pos = enemy.pos
+    enemy.prev.update(pos)
+    dx = playerPos.x - pos.x
+    dy = playerPos.y - pos.y
+    length = math.sqrt(dx * dx + dy * dy)
+    if length == 0:
+        dx, length = 1.0, 1.0
+    pos.x += dx / length * enemy.speed * dt
+    pos.y += dy / length * enemy.speed * dt
+    enemy.mood += dt * 3
 
 
 def updateCoin(coin, dt):
-    coin["vel"].y += 250 * dt
-    coin["pos"] += coin["vel"] * dt
-    if coin["pos"].y > cityFloor - coin["radius"]:
-        coin["pos"].y = cityFloor - coin["radius"]
-        coin["vel"].y *= -0.25
-        coin["vel"].x *= 0.75
+    coin.prev.update(coin.pos)
+    coin.vel.y += 250 * dt
+    coin.pos.x += coin.vel.x * dt
+    coin.pos.y += coin.vel.y * dt
+    if coin.pos.y > cityFloor - coin.radius:
+        coin.pos.y = cityFloor - coin.radius
+        coin.vel.y *= -0.25
+        coin.vel.x *= 0.75
 
 
 def updatePlayerAnimation(player, dt):
     # Update the shooting timer if active
-    if player["shootTimer"] > 0:
-        player["shootTimer"] = max(0, player["shootTimer"] - dt)
+    if player.shootTimer > 0:
+        player.shootTimer = max(0, player.shootTimer - dt)
 
     # Determine the desired animation state
-    if player["isDead"] and player["animations"].get("death"):
-        player["shootTimer"] = 0
+    if player.isDead and player.animations.get("death"):
+        player.shootTimer = 0
         desired_state = "death"
-    elif player["isReloading"]:
-        player["shootTimer"] = 0
+    elif player.isReloading:
+        player.shootTimer = 0
         desired_state = "reload"
-    elif player["shootTimer"] > 0 and player["animations"].get("shoot"):
+    elif player.shootTimer > 0 and player.animations.get("shoot"):
         desired_state = "shoot"
-    elif player["isMoving"]:
+    elif player.isMoving:
         desired_state = "run"
     else:
         desired_state = "idle"
         
     # Fallback to idle if the desired state doesn't exist
-    if desired_state not in player["animations"] or not player["animations"][desired_state]:
+    if desired_state not in player.animations or not player.animations[desired_state]:
         desired_state = "idle"
-    if player["animState"] != desired_state:
-        player["animState"] = desired_state
-        player["animFrame"] = 0
-        player["animTimer"] = 0.0
+    if player.animState != desired_state:
+        player.animState = desired_state
+        player.animFrame = 0
+        player.animTimer = 0.0
         if desired_state == "death":
-            player["deathPlayed"] = False
-    frames = player["animations"].get(player["animState"], [])
+            player.deathPlayed = False
+    frames = player.animations.get(player.animState, [])
     if not frames:
         return
-    frame_duration = player["animSpeeds"].get(player["animState"], 0.12)
-    player["animTimer"] += dt
-    if player["animState"] == "death":
-        if player["deathPlayed"]:
-            player["animFrame"] = len(frames) - 1
+    frame_duration = player.animSpeeds.get(player.animState, 0.12)
+    player.animTimer += dt
+    if player.animState == "death":
+        if player.deathPlayed:
+            player.animFrame = len(frames) - 1
             return
         # advance towards last frame without looping
-        while player["animTimer"] >= frame_duration and player["animFrame"] < len(frames) - 1:
-            player["animTimer"] -= frame_duration
-            player["animFrame"] += 1
-        if player["animFrame"] >= len(frames) - 1:
-            player["deathPlayed"] = True
+        while player.animTimer >= frame_duration and player.animFrame < len(frames) - 1:
+            player.animTimer -= frame_duration
+            player.animFrame += 1
+        if player.animFrame >= len(frames) - 1:
+            player.deathPlayed = True
         return
-    while player["animTimer"] >= frame_duration:
-        player["animTimer"] -= frame_duration
-        player["animFrame"] = (player["animFrame"] + 1) % len(frames)
+    while player.animTimer >= frame_duration:
+        player.animTimer -= frame_duration
+        player.animFrame = (player.animFrame + 1) % len(frames)
+
+
+def addEntity(state, kind, entity):
+    if state["backend"] == "numpy":
+        # the arrays copy the fields, so pooled records go straight back
+        pushEntityRecord(state[kind], entity)
+        if kind == "shots":
+            releaseRecord(shotPool, entity)
+        elif kind == "coins":
+            releaseRecord(coinPool, entity)
+    else:
+        state[kind].append(entity)
+
+
+def entityCount(state, kind):
+    if state["backend"] == "numpy":
+        return state[kind]["count"]
+    return len(state[kind])
+
+
+def trackRunStats(state, dt):
+    stats = state["runStats"]
+    stats["time"] += dt
+    peaks = stats["peaks"]
+    for kind in peaks:
+        peaks[kind] = max(peaks[kind], entityCount(state, kind))
 
 
 def spawnEnemy(state):
-    if len(state["enemies"]) >= maxEnemies:
+    if entityCount(state, "enemies") >= maxEnemies:
         return
-    state["enemies"].append(createEnemy(state["wave"]))
+    addEntity(state, "enemies", createEnemy(state["rng"], state["wave"]))
 
 
 def dropCoins(state, position):
-    for _ in range(random.randint(1, 3)):
-        state["coins"].append(createCoin(position))
+    for _ in range(state["rng"].randint(1, 3)):
+        addEntity(state, "coins", createCoin(state["rng"], position))
+    emitParticles(state, "coin", position)
 
 
 def updateWaves(state, dt):
     state["spawnTimer"] -= dt
     if state["spawnTimer"] <= 0:
         spawnEnemy(state)
-        state["spawnTimer"] = max(0.45, 1.4 - state["wave"] * 0.08)
-    if state["score"] > state["wave"] * 220:
+        state["spawnTimer"] = max(
+            balance["spawnIntervalMin"], balance["spawnInterval"] - state["wave"] * balance["spawnIntervalPerWave"]
+        )
+    if state["score"] > state["wave"] * balance["waveScoreStep"]:
         state["wave"] += 1
         player = state["player"]
-        player["health"] = min(player["maxHealth"], player["health"] + 20)
+        player.health = min(player.maxHealth, player.health + 20)
     state["shopTimer"] -= dt
     if state["shopTimer"] <= 0 and not state["shopActive"]:
         openShop(state)
 
 
+def removeIndices(items, doomed, pool=None):
+    # compact the list in place, keeping order, instead of building a new one
+    kept = 0
+    for index, item in enumerate(items):
+        if index in doomed:
+            if pool is not None:
+                releaseRecord(pool, item)
+            continue
+        items[kept] = item
+        kept += 1
+    del items[kept:]
+
+
+def updateShots(state, dt):
+    if state["backend"] == "numpy":
+        updateShotArrays(state["shots"], dt)
+        return
+    for shot in state["shots"]:
+        updateShot(shot, dt)
+
+
+def cullShots(state):
+    # after the collision sweep, so a shot's last step can still hit
+    if state["backend"] == "numpy":
+        cullShotArrays(state["shots"])
+        return
+    shots = state["shots"]
+    kept = 0
+    for shot in shots:
+        if shotAlive(shot):
+            shots[kept] = shot
+            kept += 1
+        else:
+            releaseRecord(shotPool, shot)
+    del shots[kept:]
+
+
+def onScreen(x, y, size):
+    return -size < x < width + size and -size < y < height + size
+
+
+def lodWindow(state, farCount):
+    # which off-screen ranks step this tick: lodBudget of them, round-robin
+    cursor = state["lodCursor"] % farCount if farCount else 0
+    state["lodCursor"] = (cursor + lodBudget) % farCount if farCount > lodBudget else 0
+    return cursor
+
+
+def chaseTargets(state):
+    # everyone still standing; enemies go for whichever is nearest (the host on ties)
+    targets = [player.pos for player in [state["player"]] + state["allies"] if not player.isDead]
+    return targets or [state["player"].pos]
+
+
+def updateEnemies(state, dt):
+    # on-screen enemies step every tick. Off-screen ones can't be seen or touch
+    # the player, so past lodBudget of them they take turns, each step covering
+    # the time it waited; with few enemies every one of them steps every tick.
+    targets = chaseTargets(state)
+    if state["backend"] == "numpy":
+        updateEnemyArrays(state, dt, targets)
+        return
+    playerPos = targets[0]
+    enemies = state["enemies"]
+    far = [index for index, enemy in enumerate(enemies) if not onScreen(enemy.pos.x, enemy.pos.y, enemy.size)]
+    cursor = lodWindow(state, len(far))
+    waiting = [False] * len(enemies)
+    if len(far) > lodBudget:
+        for index in far[cursor + lodBudget:] + far[max(0, cursor + lodBudget - len(far)):cursor]:
+            waiting[index] = True
+    longest = dt
+    for enemy, wait in zip(enemies, waiting):
+        if wait:
+            enemy.lag += dt
+            enemy.prev.update(enemy.pos)
+            continue
+        step = dt + enemy.lag
+        enemy.lag = 0.0
+        longest = max(longest, step)
+        if len(targets) > 1:
+            x, y = enemy.pos
+            playerPos = min(targets, key=lambda target: (target.x - x) * (target.x - x) + (target.y - y) * (target.y - y))
+        updateEnemy(enemy, step, playerPos)
+    state["enemyDt"] = longest
+
+
 def updateCoins(state, dt):
+    if state["backend"] == "numpy":
+        updateCoinArrays(state, dt)
+        return
     player = state["player"]
-    for coin in list(state["coins"]):
+    coins = state["coins"]
+    settled = set()
+    for index, coin in enumerate(coins):
         updateCoin(coin, dt)
-        if coin["pos"].distance_to(player["pos"]) < coin["radius"] + player["radius"]:
-            state["coinsBank"] += coin["value"] * state["coinBonus"]
-            state["coins"].remove(coin)
+        if coin.pos.y >= cityFloor - coin.radius and abs(coin.vel.y) < 5:
+            coin.vel.y = 0
+            if abs(coin.vel.x) < coinSleepSpeed:
+                settled.add(index)
+    excess = len(coins) - len(settled) - maxCoins
+    index = 0
+    while excess > 0:
+        if index not in settled:
+            settled.add(index)
+            excess -= 1
+        index += 1
+    if settled:
+        piles = state["coinPiles"]
+        for index in settled:
+            piles[pileIndex(coins[index].pos.x)] += coins[index].value
+        removeIndices(coins, settled, coinPool)
+    grid = buildSpatialHash(coins, "radius")
+    picked = set()
+    for index in queryCircle(grid, player.pos, player.radius):
+        coin = coins[index]
+        if coin.pos.distance_to(player.pos) < coin.radius + player.radius:
+            state["coinsBank"] += coin.value * state["coinBonus"]
+            picked.add(index)
+            emitParticles(state, "coin", coin.pos)
+    if picked:
+        removeIndices(coins, picked, coinPool)
+    pickCoinPiles(state)
+
+
+# settled coins leave the simulation and become a value per floor slot, so a
+# long run costs the same per tick as a short one however much is lying around
+
+def pileIndex(x):
+    return min(coinPileCount - 1, max(0, int(x // coinPileWidth)))
+
+
+def pileRadius(value):
+    return min(16, 10 + value // 5)
+
+
+def pickCoinPiles(state, player=None):
+    player = player or state["player"]
+    piles = state["coinPiles"]
+    reach = player.radius + pileRadius(max(piles))
+    for index in range(pileIndex(player.pos.x - reach), pileIndex(player.pos.x + reach) + 1):
+        value = piles[index]
+        if not value:
             continue
-        if coin["pos"].y >= cityFloor - coin["radius"] and abs(coin["vel"].y) < 5:
-            coin["vel"].y = 0
+        radius = pileRadius(value)
+        center = ((index + 0.5) * coinPileWidth, cityFloor - radius)
+        if player.pos.distance_to(center) < radius + player.radius:
+            state["coinsBank"] += value * state["coinBonus"]
+            piles[index] = 0
+            emitParticles(state, "coin", center)
 
 
 def updateShopNote(state, dt):
+    # purchase notes fade out; inside the shop the banner comes back
     if state["shopNoteTimer"] > 0:
         state["shopNoteTimer"] = max(0, state["shopNoteTimer"] - dt)
-        if state["shopNoteTimer"] == 0 and not state["shopActive"]:
-            state["shopMessage"] = ""
+        if state["shopNoteTimer"] == 0:
+            state["shopMessage"] = "shop paused reality" if state["shopActive"] else ""
 
 
 def handleCollisions(state, dt):
+    if state["backend"] == "numpy":
+        collideArrays(state, dt)
+        return
     player = state["player"]
-    for enemy in list(state["enemies"]):
-        for shot in list(state["shots"]):
-            if enemy["pos"].distance_to(shot["pos"]) < enemy["size"] + shot["radius"]:
-                enemy["hp"] -= shot["damage"]
-                state["shots"].remove(shot)
-                state["score"] += 6
-        if enemy["hp"] <= 0:
-            state["enemies"].remove(enemy)
+    enemies = state["enemies"]
+    shots = state["shots"]
+    grid = buildSpatialHash(enemies, "size")
+    enemyStep = max((enemy.speed for enemy in enemies), default=0) * max(dt, state["enemyDt"])
+
+    # shots are swept over this tick's movement, relative to each enemy's, so
+    # fast shots can't tunnel through at low tick rates. A shot is spent on the
+    # enemy it reaches first (ties go to list order).
+    hits = {}
+    for shotIndex, shot in enumerate(shots):
+        pos, prev = shot.pos, shot.prev
+        middle = pygame.Vector2((pos.x + prev.x) / 2, (pos.y + prev.y) / 2)
+        reach = shot.radius + pos.distance_to(prev) / 2 + enemyStep
+        # box around the swept shot, for a cheap reject before the exact test
+        pad = shot.radius + enemyStep
+        left, right = min(pos.x, prev.x) - pad, max(pos.x, prev.x) + pad
+        top, bottom = min(pos.y, prev.y) - pad, max(pos.y, prev.y) + pad
+        target, first = None, None
+        for index in queryCircle(grid, middle, reach):
+            enemy = enemies[index]
+            x, y = enemy.pos
+            size = enemy.size
+            if x + size < left or x - size > right or y + size < top or y - size > bottom:
+                continue
+            dx = prev.x - enemy.prev.x
+            dy = prev.y - enemy.prev.y
+            t = sweepHitTime(dx, dy, pos.x - x - dx, pos.y - y - dy, size + shot.radius)
+            if t is not None and (first is None or t < first or (t == first and index < target)):
+                target, first = index, t
+        if target is not None:
+            hits.setdefault(target, []).append(shotIndex)
+
+    dead = set()
+    for index in sorted(hits):
+        enemy = enemies[index]
+        for shotIndex in hits[index]:
+            enemy.hp -= shots[shotIndex].damage
+            state["score"] += 6
+            emitParticles(state, "spark", shots[shotIndex].pos)
+        if enemy.hp <= 0:
+            dead.add(index)
             state["score"] += 30
-            dropCoins(state, enemy["pos"])
-            continue
-        if enemy["pos"].distance_to(player["pos"]) < enemy["size"] + player["radius"]:
-            player["health"] -= 35 * dt
-            player["heat"] += 0.1 * dt * fps
-    if player["health"] <= 0 and not state["gameOver"]:
-        player["isDead"] = True
-        player["shootTimer"] = 0
+            emitParticles(state, "burst", enemy.pos)
+            dropCoins(state, enemy.pos)
+
+    touching = []
+    for index in queryCircle(grid, player.pos, player.radius):
+        enemy = enemies[index]
+        if index not in dead and enemy.pos.distance_to(player.pos) < enemy.size + player.radius:
+            touching.append(index)
+    for _ in touching:
+        player.health -= 35 * dt
+        player.heat += 0.1 * dt * fps
+
+    # drop everything that was used up in one pass instead of list.remove per hit
+    if hits:
+        removeIndices(shots, {shotIndex for shotIndices in hits.values() for shotIndex in shotIndices}, shotPool)
+    if dead:
+        removeIndices(enemies, dead)
+
+    if player.health <= 0 and not state["gameOver"]:
+        player.isDead = True
+        player.shootTimer = 0
         state["gameOver"] = True
         state["shopActive"] = False
 
 
-def updateGame(state, dt):
-    keys = pygame.key.get_pressed()
-    player = state["player"]
-    
-    # Handle movement
-    movePlayer(player, dt, keys)
+def actPlayer(state, player, frame):
+    if frame["dash"] and dashPlayer(player):
+        emitParticles(state, "dash", player.pos)
     
     # Handle shooting
-    mousePos = pygame.Vector2(pygame.mouse.get_pos())
-    if (pygame.mouse.get_pressed()[0] or keys[pygame.K_SPACE]) and not player["isReloading"]:
-        shot = createShot(player, mousePos)
+    if frame["fire"] and not player.isReloading:
+        shot = createShot(player, pygame.Vector2(frame["aim"]))
         if shot:
-            state["shots"].append(shot)
+            addEntity(state, "shots", shot)
     
     # Reload with R key
-    if keys[pygame.K_r] and not player["isReloading"] and player["ammo"] < player["maxAmmo"]:
-        player["isReloading"] = True
-        player["reload"] = 1.5  # 1.5 second reload time
+    if frame["reload"] and not player.isReloading and player.ammo < player.maxAmmo:
+        player.isReloading = True
+        player.reload = 1.5  # 1.5 second reload time
+
+
+def touchAllies(state, dt):
+    # what handleCollisions and updateCoins do for the host: contact damage and coin pickups
+    for ally in state["allies"]:
+        if ally.isDead:
+            continue
+        if state["backend"] == "numpy":
+            enemies, coins = state["enemies"], state["coins"]
+            offset = enemies["pos"][:enemies["count"]] - (ally.pos.x, ally.pos.y)
+            distance = np.sqrt(offset[:, 0] * offset[:, 0] + offset[:, 1] * offset[:, 1])
+            touching = int(np.count_nonzero(distance < enemies["size"][:enemies["count"]] + ally.radius))
+            count = coins["count"]
+            offset = coins["pos"][:count] - (ally.pos.x, ally.pos.y)
+            picked = np.sqrt(offset[:, 0] * offset[:, 0] + offset[:, 1] * offset[:, 1]) < coins["radius"][:count] + ally.radius
+            if picked.any():
+                state["coinsBank"] += int(coins["value"][:count][picked].sum()) * state["coinBonus"]
+                for x, y in coins["pos"][:count][picked].tolist():
+                    emitParticles(state, "coin", (x, y))
+                keepEntities(coins, ~picked)
+        else:
+            touching = sum(enemy.pos.distance_to(ally.pos) < enemy.size + ally.radius for enemy in state["enemies"])
+            coins = state["coins"]
+            picked = {index for index, coin in enumerate(coins) if coin.pos.distance_to(ally.pos) < coin.radius + ally.radius}
+            for index in sorted(picked):
+                state["coinsBank"] += coins[index].value * state["coinBonus"]
+                emitParticles(state, "coin", coins[index].pos)
+            if picked:
+                removeIndices(coins, picked, coinPool)
+        for _ in range(touching):
+            ally.health -= 35 * dt
+            ally.heat += 0.1 * dt * fps
+        pickCoinPiles(state, ally)
+        if ally.health <= 0:
+            # a fallen partner sits out until the next reboot; the run ends with the host
+            ally.isDead = True
+            ally.shootTimer = 0
+
+
+def addAlly(state):
+    # a co-op partner, spread out beside the host
+    ally = createPlayer(convert=not state["headless"])
+    side = len(state["allies"])
+    ally.pos.x += (side // 2 + 1) * 2.5 * ally.radius * (1 if side % 2 == 0 else -1)
+    ally.prev.update(ally.pos)
+    state["allies"].append(ally)
+    state["allyFrames"].append(createInputFrame())
+    return ally
+
+
+def updateGame(state, dt, frame):
+    player = state["player"]
     
-    # Update game objects
-    state["shots"] = [s for s in state["shots"] if updateShot(s, dt)]
-    for enemy in state["enemies"]:
-        updateEnemy(enemy, dt, player["pos"])
-    updateCoins(state, dt)
-    updateWaves(state, dt)
-    handleCollisions(state, dt)
+    # Handle movement
+    runPhase(state, "movePlayer", movePlayer, player, dt, frame)
+    actPlayer(state, player, frame)
+    for ally, allyFrame in zip(state["allies"], state["allyFrames"]):
+        if not ally.isDead:
+            movePlayer(ally, dt, allyFrame)
+            actPlayer(state, ally, allyFrame)
     
-    # Handle shop interactions
+    # Update game objects
+    runPhase(state, "updateShots", updateShots, state, dt)
+    runPhase(state, "updateEnemies", updateEnemies, state, dt)
+    runPhase(state, "updateCoins", updateCoins, state, dt)
+    runPhase(state, "updateWaves", updateWaves, state, dt)
+    runPhase(state, "handleCollisions", handleCollisions, state, dt)
+    runPhase(state, "cullShots", cullShots, state)
+    if state["allies"]:
+        runPhase(state, "touchAllies", touchAllies, state, dt)
+
+
+def stepGame(state, dt, frame):
+    # one simulation tick driven only by the input frame; no display needed
+    if frame["start"] and state["menu"]:
+        state["menu"] = False
     if state["shopActive"]:
-        updateShopNote(state, dt)
-        if keys[pygame.K_1]:
-            buyOption(state, 0)
-        elif keys[pygame.K_2]:
-            buyOption(state, 1)
-        elif keys[pygame.K_3]:
-            buyOption(state, 2)
-        elif keys[pygame.K_4]:
+        choice = frame["shopChoice"]
+        if 1 <= choice <= len(state["shopCards"]):
+            buyOption(state, choice - 1)
+        elif choice == len(state["shopCards"]) + 1 or frame["closeShop"]:
             closeShop(state)
+    updateShopNote(state, dt)
+    state["interpolate"] = not state["menu"] and not state["gameOver"] and not state["shopActive"]
+    if state["interpolate"]:
+        updateGame(state, dt, frame)
+        trackRunStats(state, dt)
+    if state["particles"] is not None and not state["shopActive"]:
+        runPhase(state, "updateParticles", updateParticles, state["particles"], dt)
+    runPhase(state, "updatePlayerAnimation", updatePlayerAnimation, state["player"], dt)
+    for ally in state["allies"]:
+        updatePlayerAnimation(ally, dt)
 
 
 def openShop(state):
     state["shopActive"] = True
     state["shopMessage"] = "shop paused reality"
     state["shopNoteTimer"] = 0.0
-    picks = random.sample(state["shopPool"], k=min(5, len(state["shopPool"])) )
+    picks = state["rng"].sample(state["shopPool"], k=min(5, len(state["shopPool"])) )
     state["shopCards"] = picks
 
 
 def closeShop(state):
     state["shopActive"] = False
     state["shopMessage"] = ""
-    state["shopTimer"] = random.uniform(18, 28)
+    state["shopTimer"] = state["rng"].uniform(18, 28)
     state["shopNoteTimer"] = 0.0
 
 
@@ -627,80 +1631,1486 @@ def buyOption(state, index):
         return
     state["coinsBank"] -= card["cost"]
     applyUpgrade(state, card["effect"])
+    state["runStats"]["upgrades"].append(card["name"])
     closeShop(state)
     state["shopMessage"] = f"bought {card['name']}"
     state["shopNoteTimer"] = 2.5
 
 
 def applyUpgrade(state, effect):
-    player = state["player"]
+    # the bank is shared, so every player gets what it buys
+    if effect == "coinBonus":
+        state["coinBonus"] += 1
+    for player in [state["player"]] + state["allies"]:
+        upgradePlayer(player, effect)
+
+
+def upgradePlayer(player, effect):
     if effect == "heatSink":
-        player["coolRate"] += 0.25
+        player.coolRate += 0.25
     elif effect == "damage":
-        player["damage"] += 1
+        player.damage += 1
     elif effect == "heal":
-        player["health"] = min(player["maxHealth"], player["health"] + 35)
+        player.health = min(player.maxHealth, player.health + 35)
     elif effect == "maxHealth":
-        player["maxHealth"] += 15
-        player["health"] = min(player["maxHealth"], player["health"] + 15)
+        player.maxHealth += 15
+        player.health = min(player.maxHealth, player.health + 15)
     elif effect == "speed":
-        player["speed"] += 45
+        player.speed += 45
     elif effect == "fireRate":
-        player["fireDelay"] = max(0.08, player["fireDelay"] - 0.02)
-    elif effect == "coinBonus":
-        state["coinBonus"] += 1
+        player.fireDelay = max(0.08, player.fireDelay - 0.02)
+
+
+# array backend
+# Enemies, shots and coins live in contiguous numpy columns and are advanced
+# with whole-array kernels. Results match the dict path within float tolerance.
+
+entityTypes = {"enemies": Enemy, "shots": Shot, "coins": Coin}
+entityFields = {
+    "enemies": {"pos": 2, "speed": 1, "hp": 1, "size": 1, "mood": 1, "prev": 2, "lag": 1},
+    "shots": {"pos": 2, "vel": 2, "damage": 1, "life": 1, "radius": 1, "prev": 2},
+    "coins": {"pos": 2, "vel": 2, "value": 1, "radius": 1, "prev": 2},
+}
+
+
+def createEntityStore(kind, capacity=256):
+    store = {"kind": kind, "count": 0}
+    for field, columns in entityFields[kind].items():
+        store[field] = np.zeros((capacity, columns) if columns > 1 else capacity)
+    return store
+
+
+def pushEntityRecord(store, record):
+    index = store["count"]
+    fields = entityFields[store["kind"]]
+    if index == len(store["pos"]):
+        for field in fields:
+            grown = np.zeros((index * 2,) + store[field].shape[1:])
+            grown[:index] = store[field]
+            store[field] = grown
+    for field, columns in fields.items():
+        value = getattr(record, field)
+        store[field][index] = (value.x, value.y) if columns > 1 else value
+    store["count"] = index + 1
+
+
+def keepEntities(store, keep):
+    # compact in place, preserving order
+    count = store["count"]
+    kept = int(np.count_nonzero(keep))
+    if kept == count:
+        return
+    for field in entityFields[store["kind"]]:
+        column = store[field]
+        column[:kept] = column[:count][keep]
+    store["count"] = kept
+
+
+def entityRecords(store):
+    # record view of a store, for tools and cross-checks against the list path
+    records = []
+    recordType = entityTypes[store["kind"]]
+    fields = entityFields[store["kind"]]
+    for index in range(store["count"]):
+        record = recordType.__new__(recordType)
+        for field, columns in fields.items():
+            value = store[field][index]
+            setattr(record, field, pygame.Vector2(value[0], value[1]) if columns > 1 else float(value))
+        records.append(record)
+    return records
+
+
+def updateShotArrays(shots, dt):
+    count = shots["count"]
+    pos = shots["pos"][:count]
+    life = shots["life"][:count]
+    shots["prev"][:count] = pos
+    pos += shots["vel"][:count] * dt
+    life -= dt
+
+
+def cullShotArrays(shots):
+    count = shots["count"]
+    pos = shots["pos"][:count]
+    keep = (shots["life"][:count] > 0) & (pos[:, 0] > -60) & (pos[:, 0] < width + 60) & (pos[:, 1] > -60) & (pos[:, 1] < height + 60)
+    keepEntities(shots, keep)
+
+
+def updateEnemyArrays(state, dt, targets):
+    enemies = state["enemies"]
+    count = enemies["count"]
+    pos = enemies["pos"][:count]
+    size = enemies["size"][:count]
+    enemies["prev"][:count] = pos
+    far = np.flatnonzero(~visibleMask(pos, size))
+    cursor = lodWindow(state, len(far))
+    lag = enemies["lag"][:count]
+    step = dt + lag
+    if len(far) > lodBudget:
+        waiting = np.zeros(count, dtype=bool)
+        waiting[far] = True
+        waiting[np.roll(far, -cursor)[:lodBudget]] = False
+        step[waiting] = 0.0
+        lag[waiting] += dt
+        lag[~waiting] = 0.0
+    else:
+        lag[:] = 0.0
+    state["enemyDt"] = max(dt, float(step.max())) if count else dt
+    points = np.array([(target.x, target.y) for target in targets])
+    if len(points) > 1:
+        offset = points[None, :, :] - pos[:, None, :]
+        nearest = np.argmin(offset[:, :, 0] * offset[:, :, 0] + offset[:, :, 1] * offset[:, :, 1], axis=1)
+        direction = points[nearest] - pos
+    else:
+        direction = points[0] - pos
+    length = np.sqrt(direction[:, 0] * direction[:, 0] + direction[:, 1] * direction[:, 1])
+    still = length == 0
+    if still.any():
+        direction[still] = (1.0, 0.0)
+        length[still] = 1.0
+    pos += direction / length[:, None] * enemies["speed"][:count, None] * step[:, None]
+    enemies["mood"][:count] += step * 3
+
+
+def visibleMask(pos, size):
+    x, y = pos[:, 0], pos[:, 1]
+    return (x > -size) & (x < width + size) & (y > -size) & (y < height + size)
+
+
+def updateCoinArrays(state, dt):
+    coins = state["coins"]
+    player = state["player"]
+    count = coins["count"]
+    pos = coins["pos"][:count]
+    vel = coins["vel"][:count]
+    radius = coins["radius"][:count]
+    coins["prev"][:count] = pos
+    vel[:, 1] += 250 * dt
+    pos += vel * dt
+    rest = cityFloor - radius
+    bounced = pos[:, 1] > rest
+    pos[bounced, 1] = rest[bounced]
+    vel[bounced, 1] *= -0.25
+    vel[bounced, 0] *= 0.75
+    resting = (pos[:, 1] >= rest) & (np.abs(vel[:, 1]) < 5)
+    vel[resting, 1] = 0
+    settled = resting & (np.abs(vel[:, 0]) < coinSleepSpeed)
+    excess = count - int(np.count_nonzero(settled)) - maxCoins
+    if excess > 0:
+        settled[np.flatnonzero(~settled)[:excess]] = True
+    if settled.any():
+        piles = state["coinPiles"]
+        for x, value in zip(pos[settled, 0].tolist(), coins["value"][:count][settled].tolist()):
+            piles[pileIndex(x)] += int(value)
+        keepEntities(coins, ~settled)
+        count = coins["count"]
+        pos = coins["pos"][:count]
+        radius = coins["radius"][:count]
+    offset = pos - (player.pos.x, player.pos.y)
+    picked = np.sqrt(offset[:, 0] * offset[:, 0] + offset[:, 1] * offset[:, 1]) < radius + player.radius
+    if picked.any():
+        state["coinsBank"] += int(coins["value"][:count][picked].sum()) * state["coinBonus"]
+        for x, y in pos[picked].tolist():
+            emitParticles(state, "coin", (x, y))
+        keepEntities(coins, ~picked)
+    pickCoinPiles(state)
+
+
+def gridPairs(points, queries, cellSize):
+    # every (query, point) pair whose cells touch; cellSize must cover the reach
+    stride = 1 << 21
+    pointCells = np.floor(points / cellSize).astype(np.int64)
+    pointKeys = pointCells[:, 0] * stride + pointCells[:, 1]
+    order = np.argsort(pointKeys, kind="stable")
+    sortedKeys = pointKeys[order]
+    queryCells = np.floor(queries / cellSize).astype(np.int64)
+    queryKeys = queryCells[:, 0] * stride + queryCells[:, 1]
+    queryIds = np.arange(len(queries))
+    queryParts, pointParts = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            target = queryKeys + dx * stride + dy
+            start = np.searchsorted(sortedKeys, target, "left")
+            counts = np.searchsorted(sortedKeys, target, "right") - start
+            total = int(counts.sum())
+            if not total:
+                continue
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            queryParts.append(np.repeat(queryIds, counts))
+            pointParts.append(order[np.repeat(start, counts) + offsets])
+    if not queryParts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    return np.concatenate(queryParts), np.concatenate(pointParts)
+
+
+def sweepHitTimes(start, end, reach):
+    # sweepHitTime for arrays of relative start and end offsets; NaN where nothing is hit
+    dx, dy = start[:, 0], start[:, 1]
+    vx = end[:, 0] - dx
+    vy = end[:, 1] - dy
+    gap = dx * dx + dy * dy - reach * reach
+    closing = dx * vx + dy * vy
+    speed = vx * vx + vy * vy
+    disc = closing * closing - speed * gap
+    hitTime = np.full(len(reach), np.nan)
+    moving = (gap >= 0) & (closing < 0) & (disc >= 0)
+    hitTime[moving] = (-closing[moving] - np.sqrt(disc[moving])) / speed[moving]
+    hitTime[hitTime > 1] = np.nan
+    hitTime[gap < 0] = 0.0
+    return hitTime
+
+
+def collideArrays(state, dt):
+    player = state["player"]
+    enemies = state["enemies"]
+    shots = state["shots"]
+    enemyCount = enemies["count"]
+    shotCount = shots["count"]
+    if enemyCount and shotCount:
+        enemyPos = enemies["pos"][:enemyCount]
+        shotPos = shots["pos"][:shotCount]
+        shotPrev = shots["prev"][:shotCount]
+        size = enemies["size"][:enemyCount]
+        shotRadius = shots["radius"][:shotCount]
+        travel = shotPos - shotPrev
+        halfTravel = np.sqrt(travel[:, 0] * travel[:, 0] + travel[:, 1] * travel[:, 1]) / 2
+        enemyStep = float(enemies["speed"][:enemyCount].max()) * max(dt, state["enemyDt"])
+        reach = float(size.max() + (shotRadius + halfTravel).max()) + enemyStep
+        shotIndex, enemyIndex = gridPairs(enemyPos, (shotPos + shotPrev) / 2, max(collisionCellSize, reach))
+        hitTime = sweepHitTimes(
+            shotPrev[shotIndex] - enemies["prev"][enemyIndex],
+            shotPos[shotIndex] - enemyPos[enemyIndex],
+            size[enemyIndex] + shotRadius[shotIndex],
+        )
+        hit = ~np.isnan(hitTime)
+        shotIndex = shotIndex[hit]
+        enemyIndex = enemyIndex[hit]
+        hitTime = hitTime[hit]
+        if len(shotIndex):
+            # a shot is spent on the enemy it reaches first (ties go to store order)
+            order = np.lexsort((enemyIndex, hitTime, shotIndex))
+            shotIndex = shotIndex[order]
+            enemyIndex = enemyIndex[order]
+            first = np.ones(len(shotIndex), dtype=bool)
+            first[1:] = shotIndex[1:] != shotIndex[:-1]
+            shotIndex = shotIndex[first]
+            enemyIndex = enemyIndex[first]
+            np.subtract.at(enemies["hp"], enemyIndex, shots["damage"][shotIndex])
+            state["score"] += 6 * len(shotIndex)
+            for x, y in shotPos[shotIndex].tolist():
+                emitParticles(state, "spark", (x, y))
+            hitEnemies = np.unique(enemyIndex)
+            killed = hitEnemies[enemies["hp"][hitEnemies] <= 0]
+            state["score"] += 30 * len(killed)
+            for x, y in enemies["pos"][killed].tolist():
+                emitParticles(state, "burst", (x, y))
+                dropCoins(state, pygame.Vector2(x, y))
+            spent = np.zeros(shotCount, dtype=bool)
+            spent[shotIndex] = True
+            keepEntities(shots, ~spent)
+            if len(killed):
+                dead = np.zeros(enemyCount, dtype=bool)
+                dead[killed] = True
+                keepEntities(enemies, ~dead)
+
+    count = enemies["count"]
+    offset = enemies["pos"][:count] - (player.pos.x, player.pos.y)
+    distance = np.sqrt(offset[:, 0] * offset[:, 0] + offset[:, 1] * offset[:, 1])
+    for _ in range(int(np.count_nonzero(distance < enemies["size"][:count] + player.radius))):
+        player.health -= 35 * dt
+        player.heat += 0.1 * dt * fps
+    if player.health <= 0 and not state["gameOver"]:
+        player.isDead = True
+        player.shootTimer = 0
+        state["gameOver"] = True
+        state["shopActive"] = False
+
+
+def spriteCorners(store, alpha=1.0):
+    # top-left blit positions, truncating like int() on the dict path
+    count = store["count"]
+    sizes = (store["size"] if "size" in store else store["radius"])[:count].astype(int)
+    halves = np.maximum(1, np.round(sizes * renderScale)).astype(int)
+    prev = store["prev"][:count]
+    pos = prev + (store["pos"][:count] - prev) * alpha
+    corners = (pos * renderScale).astype(int) - halves[:, None]
+    return corners.tolist(), sizes.tolist()
+
+
+def drawEnemyArrays(screen, enemies, alpha=1.0):
+    count = enemies["count"]
+    corners, sizes = spriteCorners(enemies, alpha)
+    buckets = np.minimum(enemyTintBuckets - 1, (enemies["mood"][:count] * ((enemyTintBuckets - 1) / 7.5)).astype(int))
+    shown = visibleMask(enemies["pos"][:count], enemies["size"][:count]).tolist()
+    rows = {size: enemySpriteRow(size) for size in set(sizes)}
+    return screen.blits([
+        (rows[size][bucket], corner)
+        for corner, size, bucket, visible in zip(corners, sizes, buckets.tolist(), shown)
+        if visible
+    ])
+
+
+def drawShotArrays(screen, shots, alpha=1.0):
+    corners, radii = spriteCorners(shots, alpha)
+    return screen.blits([(shotSprite(radius), corner) for corner, radius in zip(corners, radii)])
+
+
+def drawCoinArrays(screen, coins, alpha=1.0):
+    corners, radii = spriteCorners(coins, alpha)
+    return screen.blits([(coinSprite(radius), corner) for corner, radius in zip(corners, radii)])
+
+
+# particles: cosmetic bursts for hits, kills, coins and dashes in fixed-capacity
+# numpy columns. They roll their own generator, so they never touch the
+# simulation's random stream, and are drawn by adding light straight into the
+# frame's pixels, which beats one blit per particle by a wide margin.
+
+particleKinds = {
+    # colour, particles per burst, speed range, lifetime range, gravity
+    "spark": (neonPink, 6, (90, 260), (0.12, 0.3), 0),
+    "burst": (heatOrange, 40, (60, 340), (0.3, 0.9), 320),
+    "coin": (coinGold, 10, (40, 160), (0.25, 0.6), -60),
+    "dash": (neonBlue, 24, (30, 140), (0.2, 0.45), 0),
+}
+particleNames = tuple(particleKinds)
+particleFields = {"pos": 2, "prev": 2, "vel": 2, "life": 1, "span": 1, "kind": 1}
+particleDrag = 2.5  # fraction of speed shed per second, roughly
+
+
+def createParticles(seed):
+    capacity = int(particleBudget * particleQuality)
+    if np is None or capacity <= 0:
+        return None
+    particles = {"count": 0, "bursts": [], "rng": np.random.default_rng(seed)}
+    for field, columns in particleFields.items():
+        dtype = np.int8 if field == "kind" else np.float32
+        particles[field] = np.zeros((capacity, columns) if columns > 1 else capacity, dtype=dtype)
+    return particles
+
+
+def emitParticles(state, kind, position):
+    # bursts are queued here and spawned together on the next particle update
+    particles = state["particles"]
+    if particles is not None:
+        particles["bursts"].append((particleNames.index(kind), position[0], position[1]))
+
+
+def spawnParticles(particles):
+    bursts = np.array(particles["bursts"], dtype=np.float32)
+    particles["bursts"].clear()
+    kinds = bursts[:, 0].astype(np.intp)
+    sizes = np.array([max(1, round(particleKinds[name][1] * particleQuality)) for name in particleNames])
+    start = particles["count"]
+    total = min(int(sizes[kinds].sum()), len(particles["life"]) - start)  # past the cap, late bursts are cut short
+    if total <= 0:
+        return
+    end = start + total
+    kind = np.repeat(kinds, sizes[kinds])[:total]
+    rng = particles["rng"]
+    speeds, lifetimes = (np.array([particleKinds[name][column] for name in particleNames]) for column in (2, 3))
+    speed = rng.uniform(speeds[kind, 0], speeds[kind, 1])
+    angle = rng.uniform(0, 2 * math.pi, total)
+    particles["pos"][start:end] = np.repeat(bursts[:, 1:], sizes[kinds], axis=0)[:total]
+    particles["prev"][start:end] = particles["pos"][start:end]
+    particles["vel"][start:end, 0] = np.cos(angle) * speed
+    particles["vel"][start:end, 1] = np.sin(angle) * speed
+    particles["life"][start:end] = particles["span"][start:end] = rng.uniform(lifetimes[kind, 0], lifetimes[kind, 1])
+    particles["kind"][start:end] = kind
+    particles["count"] = end
+
+
+def updateParticles(particles, dt):
+    count = particles["count"]
+    if count:
+        pos = particles["pos"][:count]
+        vel = particles["vel"][:count]
+        life = particles["life"][:count]
+        particles["prev"][:count] = pos
+        gravity = np.array([particleKinds[name][4] for name in particleNames], dtype=np.float32)
+        vel *= max(0.0, 1 - particleDrag * dt)
+        vel[:, 1] += gravity[particles["kind"][:count]] * dt
+        pos += vel * dt
+        life -= dt
+        alive = life > 0
+        kept = int(np.count_nonzero(alive))
+        if kept < count:
+            for field in particleFields:
+                column = particles[field]
+                column[:kept] = column[:count][alive]
+            particles["count"] = kept
+    if particles["bursts"]:
+        spawnParticles(particles)
+
+
+def mirrorParticles(mirror, source):
+    if mirror is None:
+        mirror = {field: np.zeros_like(source[field]) for field in particleFields}
+    count = source["count"]
+    for field in particleFields:
+        mirror[field][:count] = source[field][:count]
+    mirror["count"] = count
+    return mirror
+
+
+def drawParticles(screen, particles, alpha=1.0):
+    # light from every particle is summed per pixel, then added with saturation
+    count = particles["count"]
+    if not count:
+        return []
+    prev = particles["prev"][:count]
+    pos = (prev + (particles["pos"][:count] - prev) * alpha) * renderScale
+    footprint = max(1, round(2 * renderScale))
+    w, h = screen.get_size()
+    x = pos[:, 0].astype(np.intp)
+    y = pos[:, 1].astype(np.intp)
+    inside = (x >= 0) & (x <= w - footprint) & (y >= 0) & (y <= h - footprint)
+    if not inside.any():
+        return []
+    x, y = x[inside], y[inside]
+    colors = np.array([particleKinds[name][0] for name in particleNames], dtype=np.float32)
+    fade = particles["life"][:count][inside] / particles["span"][:count][inside]
+    cells, slot = np.unique(x * h + y, return_inverse=True)
+    light = np.empty((len(cells), 3))
+    for channel in range(3):
+        light[:, channel] = np.bincount(slot, weights=colors[particles["kind"][:count][inside], channel] * fade)
+    light = np.minimum(light, 255).astype(np.uint8)
+    cx, cy = np.divmod(cells, h)
+    pixels = pygame.surfarray.pixels3d(screen)
+    for dx in range(footprint):
+        for dy in range(footprint):
+            lit = pixels[cx + dx, cy + dy]
+            pixels[cx + dx, cy + dy] = lit + np.minimum(light, 255 - lit)
+    del pixels  # unlocks the surface
+    left, top = int(x.min()), int(y.min())
+    return [pygame.Rect(left, top, int(x.max()) - left + footprint, int(y.max()) - top + footprint)]
+
+
+# snapshots
+# The simulation half of a state (no screen, clock or sprites) as JSON metadata
+# followed by float64 entity columns. Keyframes go into a ring bounded by
+# bytes; replays seek from the nearest one and kiosks resume from the newest.
+
+def snapshotEntities(state, kind):
+    # column-major: each field for every entity in turn, vectors as x, y pairs
+    fields = entityFields[kind]
+    if state["backend"] == "numpy":
+        store = state[kind]
+        count = store["count"]
+        return count, b"".join(store[field][:count].tobytes() for field in fields)
+    records = state[kind]
+    values = array("d")
+    for field, columns in fields.items():
+        getter = operator.attrgetter(field)
+        if columns > 1:
+            values.extend(chain.from_iterable(map(getter, records)))
+        else:
+            values.extend(map(getter, records))
+    return len(records), values.tobytes()
+
+
+def restoreEntities(state, kind, count, blob):
+    fields = entityFields[kind]
+    if state["backend"] == "numpy":
+        store = createEntityStore(kind, max(256, count))
+        offset = 0
+        for field, columns in fields.items():
+            length = count * columns * 8
+            column = np.frombuffer(blob[offset:offset + length])
+            store[field][:count] = column.reshape(count, columns) if columns > 1 else column
+            offset += length
+        store["count"] = count
+        state[kind] = store
+        return
+    pool = {"shots": shotPool, "coins": coinPool}.get(kind)
+    if pool is not None:
+        for record in state[kind]:
+            releaseRecord(pool, record)
+    values = array("d")
+    values.frombytes(blob)
+    restored, offset = [], 0
+    for field, columns in fields.items():
+        column = values[offset:offset + count * columns]
+        if columns > 1:
+            restored.append(list(map(pygame.Vector2, column[0::2], column[1::2])))
+        elif field in snapshotIntFields:
+            restored.append(list(map(int, column)))
+        else:
+            restored.append(column)
+        offset += count * columns
+    # record constructors take their fields in entityFields order
+    state[kind] = list(map(entityTypes[kind], *restored))
+
+
+def snapshotState(state):
+    player = state["player"]
+    meta = {key: state[key] for key in snapshotKeys}
+    meta["rng"] = state["rng"].getstate()
+    meta["player"] = {name: getattr(player, name) for name in Player.__slots__ if name not in ("pos", "prev", "animations", "sprites")}
+    meta["playerPos"] = [player.pos.x, player.pos.y, player.prev.x, player.prev.y]
+    meta["shopCards"] = [state["shopPool"].index(card) for card in state["shopCards"]]
+    meta["counts"] = {}
+    blobs = []
+    for kind in ("enemies", "shots", "coins"):
+        meta["counts"][kind], blob = snapshotEntities(state, kind)
+        blobs.append(blob)
+    encoded = json.dumps(meta, separators=(",", ":")).encode()
+    return b"".join([snapshotHeader.pack(snapshotMagic, snapshotVersion, len(encoded)), encoded] + blobs)
+
+
+def restoreSnapshot(state, data):
+    # overwrite the simulation half of state in place, keeping its screen, backend and profiler
+    if len(data) < snapshotHeader.size:
+        raise ValueError("not a Last Hope snapshot")
+    magic, version, size = snapshotHeader.unpack_from(data)
+    if magic != snapshotMagic or version != snapshotVersion:
+        raise ValueError(f"not a Last Hope snapshot (version {snapshotVersion})")
+    offset = snapshotHeader.size
+    meta = json.loads(data[offset:offset + size])
+    offset += size
+    lengths = {kind: meta["counts"][kind] * sum(entityFields[kind].values()) * 8 for kind in ("enemies", "shots", "coins")}
+    if offset + sum(lengths.values()) != len(data):
+        raise ValueError("truncated Last Hope snapshot")
+    for key in snapshotKeys:
+        state[key] = meta[key]
+    rngVersion, internal, gauss = meta["rng"]
+    state["rng"].setstate((rngVersion, tuple(internal), gauss))
+    player = state["player"]
+    for name, value in meta["player"].items():
+        setattr(player, name, value)
+    player.pos.update(meta["playerPos"][:2])
+    player.prev.update(meta["playerPos"][2:])
+    state["shopCards"] = [state["shopPool"][index] for index in meta["shopCards"]]
+    for kind, length in lengths.items():
+        restoreEntities(state, kind, meta["counts"][kind], data[offset:offset + length])
+        offset += length
+    state["dirtyRects"] = None
+
+
+def createSnapshotRing(interval=snapshotInterval, budget=snapshotBudget):
+    return {"interval": interval, "budget": budget, "untilNext": interval, "keyframes": deque(), "bytes": 0}
+
+
+def keepSnapshot(ring, frameIndex, data):
+    keyframes = ring["keyframes"]
+    if keyframes and keyframes[-1][0] >= frameIndex:
+        return  # a replay after seeking back; what it would add is already here
+    keyframes.append((frameIndex, data))
+    ring["bytes"] += len(data)
+    while ring["bytes"] > ring["budget"] and len(keyframes) > 1:
+        ring["bytes"] -= len(keyframes.popleft()[1])
+
+
+def tickSnapshots(ring, state, frameIndex, dt):
+    # returns the new keyframe when one was due, so callers can also persist it
+    ring["untilNext"] -= dt
+    if ring["untilNext"] > 0:
+        return None
+    ring["untilNext"] = ring["interval"]
+    data = snapshotState(state)
+    keepSnapshot(ring, frameIndex, data)
+    return data
+
+
+def findSnapshot(ring, frameIndex):
+    best = None
+    for keyframe in ring["keyframes"]:
+        if keyframe[0] > frameIndex:
+            break
+        best = keyframe
+    return best
+
+
+def writeSnapshotFile(path, data):
+    try:
+        with open(path + ".tmp", "wb") as handle:
+            handle.write(data)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass  # losing a resume point is better than stalling the frame
+
+
+def appendKeyframe(handle, frameIndex, data):
+    handle.write(keyframeHeader.pack(frameIndex, len(data)))
+    handle.write(data)
+
+
+def readKeyframes(path):
+    # the sidecar next to an input log; missing or truncated tails are ignored
+    keyframes = []
+    try:
+        with open(path, "rb") as handle:
+            data = handle.read()
+    except OSError:
+        return keyframes
+    offset = 0
+    while offset + keyframeHeader.size <= len(data):
+        frameIndex, length = keyframeHeader.unpack_from(data, offset)
+        offset += keyframeHeader.size
+        if offset + length > len(data):
+            break
+        keyframes.append((frameIndex, data[offset:offset + length]))
+        offset += length
+    return keyframes
+
+
+# profiler
+# Off by default: runPhase then costs one dict lookup per phase. F3 starts
+# recording the last profileSeconds of frames and shows the overlay, F4 dumps
+# them as Chrome trace-event JSON (open in chrome://tracing or Perfetto).
+
+def enableProfiler(state):
+    profiler = {
+        "frames": deque(),
+        "spans": [],
+        "gc": [],
+        "gcStarted": None,
+        "frameStart": 0.0,
+        "blocks": 0,
+        "note": "",
+        "noteTimer": 0.0,
+    }
+
+    def watchGc(phase, info):
+        if phase == "start":
+            profiler["gcStarted"] = time.perf_counter()
+        elif profiler["gcStarted"] is not None:
+            started = profiler["gcStarted"]
+            profiler["gc"].append((f"gc gen{info['generation']}", started, time.perf_counter() - started))
+            profiler["gcStarted"] = None
+
+    profiler["gcCallback"] = watchGc
+    gc.callbacks.append(watchGc)
+    state["profiler"] = profiler
+    return profiler
+
+
+def disableProfiler(state):
+    profiler = state["profiler"]
+    if profiler is not None:
+        gc.callbacks.remove(profiler["gcCallback"])
+    state["profiler"] = None
+    state["timings"] = None
+
+
+def beginProfileFrame(state):
+    profiler = state["profiler"]
+    if profiler is None:
+        return
+    state["timings"] = {}
+    profiler["spans"] = []
+    profiler["gc"] = []
+    profiler["blocks"] = sys.getallocatedblocks()
+    profiler["frameStart"] = time.perf_counter()
+
+
+def endProfileFrame(state, dt):
+    profiler = state["profiler"]
+    if profiler is None:
+        return
+    now = time.perf_counter()
+    frames = profiler["frames"]
+    frames.append({
+        "start": profiler["frameStart"],
+        "work": now - profiler["frameStart"],
+        "dt": dt,
+        "timings": state["timings"],
+        "spans": profiler["spans"],
+        "gc": profiler["gc"],
+        "counts": tuple(entityCount(state, kind) for kind in ("shots", "enemies", "coins")),
+        "blocks": sys.getallocatedblocks() - profiler["blocks"],
+    })
+    while frames and frames[0]["start"] < now - profileSeconds:
+        frames.popleft()
+    profiler["noteTimer"] = max(0.0, profiler["noteTimer"] - dt)
+
+
+def traceEvents(frames):
+    # complete ("X") events for frames, phases and collections plus counter tracks
+    if not frames:
+        return []
+    origin = frames[0]["start"]
+    micros = lambda seconds: round(seconds * 1e6, 1)
+    events = []
+    for frame in frames:
+        events.append({
+            "name": "frame", "cat": "frame", "ph": "X", "pid": 1, "tid": 1,
+            "ts": micros(frame["start"] - origin), "dur": micros(frame["work"]), "args": {"dt ms": frame["dt"] * 1000},
+        })
+        for category, spans in (("phase", frame["spans"]), ("gc", frame["gc"])):
+            for name, started, elapsed in spans:
+                events.append({
+                    "name": name, "cat": category, "ph": "X", "pid": 1, "tid": 1,
+                    "ts": micros(started - origin), "dur": micros(elapsed),
+                })
+        shots, enemies, coins = frame["counts"]
+        stamp = micros(frame["start"] - origin)
+        events.append({
+            "name": "entities", "ph": "C", "pid": 1, "ts": stamp,
+            "args": {"shots": shots, "enemies": enemies, "coins": coins},
+        })
+        events.append({"name": "allocated blocks", "ph": "C", "pid": 1, "ts": stamp, "args": {"delta": frame["blocks"]}})
+    return events
+
+
+def dumpTrace(state, path=None):
+    profiler = state["profiler"]
+    if profiler is None:
+        return None
+    path = path or os.path.join(traceDir, time.strftime("lasthope-trace-%Y%m%d-%H%M%S.json"))
+    with open(path, "w") as handle:
+        json.dump({"traceEvents": traceEvents(profiler["frames"]), "displayTimeUnit": "ms"}, handle)
+    profiler["note"], profiler["noteTimer"] = f"trace saved to {os.path.basename(path)}", 3.0
+    return path
+
+
+def getProfilerPanel(size):
+    global profilerPanel
+    if profilerPanel is None or profilerPanel.get_size() != size:
+        profilerPanel = pygame.Surface(size, pygame.SRCALPHA)
+        profilerPanel.fill((10, 10, 16, 210))
+    return profilerPanel
+
+
+def drawProfiler(screen, state):
+    profiler = state["profiler"]
+    frames = list(profiler["frames"])[-120:]
+    panel = scaledRect(width - 320, 136, 300, 300)
+    dirty = [screen.blit(getProfilerPanel(panel.size), panel)]
+    if not frames:
+        return dirty
+
+    # rolling frame-time graph: full bar is the frame interval, bright part is our own work
+    graph = scaledRect(width - 310, 146, 280, 60)
+    pxPerMs = graph.height / 33.3
+    for index, frame in enumerate(frames):
+        x = graph.right - scaled((len(frames) - index) * 2)
+        total = min(graph.height, int(frame["dt"] * 1000 * pxPerMs))
+        work = min(graph.height, int(frame["work"] * 1000 * pxPerMs))
+        pygame.draw.line(screen, lightGray, (x, graph.bottom), (x, graph.bottom - total))
+        pygame.draw.line(screen, heatOrange if frame["gc"] else neonBlue, (x, graph.bottom), (x, graph.bottom - work))
+    budget = graph.bottom - int(1000 / fps * pxPerMs)
+    pygame.draw.line(screen, neonPink, (graph.x, budget), (graph.right, budget))
+
+    recent = frames[-30:]
+    ordered = sorted(frame["work"] for frame in recent)
+    shots, enemies, coins = frames[-1]["counts"]
+    gcMs = sum(elapsed for frame in recent for _, _, elapsed in frame["gc"]) * 1000
+    blocks = sum(frame["blocks"] for frame in recent) / len(recent)
+    lines = [
+        (f"work {ordered[len(ordered) // 2] * 1000:.2f} max {ordered[-1] * 1000:.2f} ms", (255, 255, 255)),
+        (f"shots {shots} enemies {enemies} coins {coins}", (215, 255, 200)),
+        (f"blocks/frame {blocks:+.0f} gc {gcMs:.2f} ms", coinGold),
+    ]
+    phases = {}
+    for frame in recent:
+        for name, elapsed in frame["timings"].items():
+            phases[name] = phases.get(name, 0.0) + elapsed
+    y = graph.bottom + scaled(8)
+    for text, color in lines:
+        blitGlyphText(screen, getFont("small"), text, color, (panel.x + scaled(10), y))
+        y += scaled(20)
+    for name, total in sorted(phases.items(), key=lambda item: -item[1])[:8]:
+        blitGlyphText(screen, getFont("small"), name, (200, 220, 255), (panel.x + scaled(10), y))
+        blitGlyphText(screen, getFont("small"), f"{total / len(recent) * 1000:6.2f}", (200, 220, 255), (panel.right - scaled(70), y))
+        y += scaled(18)
+    if profiler["noteTimer"] > 0:
+        blitGlyphText(screen, getFont("small"), profiler["note"], heatOrange, (panel.x + scaled(10), panel.bottom - scaled(20)))
+    return dirty
 
 
 # main
 
-def runGame():
-    state = buildGameState()
-    while True:
-        dt = state["clock"].tick(fps) / 1000
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    pygame.quit()
-                    sys.exit()
-                if event.key == pygame.K_r:
-                    state = buildGameState()
-                if event.key == pygame.K_SPACE and state["menu"]:
-                    state["menu"] = False
-                if state["shopActive"]:
-                    digit = event.unicode if event.unicode else ""
-                    if digit.isdigit():
-                        choice = int(digit)
-                        if 1 <= choice <= len(state["shopCards"]):
-                            buyOption(state, choice - 1)
-                            continue
-                        if choice == len(state["shopCards"]) + 1:
-                            closeShop(state)
-                            continue
-                    if event.key in (pygame.K_RETURN, pygame.K_ESCAPE, pygame.K_KP_ENTER):
-                        closeShop(state)
-        if not state["menu"] and not state["gameOver"] and not state["shopActive"]:
-            updateGame(state, dt)
-        updatePlayerAnimation(state["player"], dt)
-        drawBackground(state["screen"])
-        drawCoins(state["screen"], state["coins"])
-        drawEnemies(state["screen"], state["enemies"])
-        drawShots(state["screen"], state["shots"])
-        drawPlayer(state["screen"], state["player"])
-        drawHud(state["screen"], state)
-        if state["menu"]:
-            drawMenu(state["screen"], state["dialog"])
-        if state["shopActive"]:
-            drawShop(state["screen"], state)
-        if state["gameOver"]:
-            drawGameOver(state["screen"])
+def renderGame(screen, state, alpha=1.0):
+    # returns the rects drawn this frame, for dirty-rect presentation
+    if not state["interpolate"]:
+        alpha = 1.0  # nothing moved last tick, so prev positions may be stale
+    if state["renderMode"] == "dirty" and state["dirtyRects"] is not None:
+        runPhase(state, "drawBackground", restoreBackground, screen, state["dirtyRects"])
+    else:
+        runPhase(state, "drawBackground", drawBackground, screen)
+    dirty = drawEntities(screen, state, alpha)
+    if state["particles"] is not None:
+        dirty += runPhase(state, "drawParticles", drawParticles, screen, state["particles"], alpha)
+    dirty += runPhase(state, "drawPlayer", drawPlayer, screen, state["player"], alpha)
+    for ally in state["allies"]:
+        dirty += drawPlayer(screen, ally, alpha)
+    dirty += runPhase(state, "drawHud", drawHud, screen, state)
+    if state["menu"]:
+        dirty += runPhase(state, "drawMenu", drawMenu, screen, state["dialog"], topScores(state["scoreStore"]))
+    if state["shopActive"]:
+        dirty += runPhase(state, "drawShop", drawShop, screen, state)
+    if state["gameOver"]:
+        dirty += runPhase(state, "drawGameOver", drawGameOver, screen)
+    if state["profiler"] is not None:
+        dirty += drawProfiler(screen, state)
+    return dirty
+
+
+def presentFrame(state, dirty):
+    window = pygame.display.get_surface()
+    if window is not state["screen"]:
+        # no hardware scaling: one pass up to the window, then a full flip
+        pygame.transform.scale(state["screen"], window.get_size(), window)
+        pygame.display.flip()
+        state["dirtyRects"] = dirty if state["renderMode"] == "dirty" else None
+        return
+    if state["renderMode"] != "dirty":
         pygame.display.flip()
+        return
+    previous = state["dirtyRects"]
+    if previous is None:
+        pygame.display.flip()
+    else:
+        # last frame's rects were restored to background, this frame's were drawn
+        changed = previous + dirty
+        if len(changed) > dirtyRectLimit:
+            changed = [changed[0].unionall(changed[1:])]
+        pygame.display.update(changed)
+    state["dirtyRects"] = dirty
+
+
+def rebootGame(state):
+    # the new run's seed comes from the old run, so reboots replay too
+    fresh = buildGameState(
+        state["backend"],
+        headless=state["headless"],
+        renderMode=state["renderMode"],
+        seed=state["rng"].getrandbits(63),
+        screen=state["screen"],
+    )
+    fresh["scoreStore"] = state["scoreStore"]
+    for _ in state["allies"]:
+        addAlly(fresh)
+    return fresh
+
+
+def loadResumePoint(state, path):
+    try:
+        with open(path, "rb") as handle:
+            restoreSnapshot(state, handle.read())
+    except (OSError, ValueError):
+        return False  # nothing saved yet, or a save from another version: start fresh
+    return True
+
+
+# high scores and run telemetry: each finished run is handed to a writer thread
+# that owns the sqlite connection (WAL, so the menu's reads never wait on a
+# write). The game only ever touches the queue and the cached top list.
+
+scoreSchema = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    finished REAL NOT NULL,
+    seed INTEGER,
+    backend TEXT,
+    score INTEGER NOT NULL,
+    wave INTEGER,
+    coins INTEGER,
+    survival REAL,
+    upgrades TEXT,
+    peakShots INTEGER,
+    peakEnemies INTEGER,
+    peakCoins INTEGER,
+    frameP50 REAL,
+    frameP95 REAL,
+    frameP99 REAL
+);
+CREATE INDEX IF NOT EXISTS runsByScore ON runs (score DESC, finished);
+"""
+
+
+def connectScores(path):
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")  # a crash may lose the last run, never the file
+    connection.executescript(scoreSchema)
+    return connection
+
+
+def queryLeaderboard(connection, limit=leaderboardSize):
+    # walks runsByScore, so it stays a short index scan however many runs pile up
+    return connection.execute(
+        "SELECT score, wave, survival, finished FROM runs ORDER BY score DESC, finished LIMIT ?", (limit,)
+    ).fetchall()
+
+
+def runRecord(state, frameTimes):
+    stats = state["runStats"]
+    return {
+        "finished": time.time(),
+        "seed": state["seed"],
+        "backend": state["backend"],
+        "score": state["score"],
+        "wave": state["wave"],
+        "coins": state["coinsBank"],
+        "survival": stats["time"],
+        "upgrades": list(stats["upgrades"]),
+        "peaks": dict(stats["peaks"]),
+        "frameTimes": frameTimes,
+    }
+
+
+def saveRun(connection, run):
+    ordered = sorted(run["frameTimes"])
+    percentiles = [percentile(ordered, fraction) * 1000 if ordered else None for fraction in (0.5, 0.95, 0.99)]
+    peaks = run["peaks"]
+    connection.execute(
+        "INSERT INTO runs (finished, seed, backend, score, wave, coins, survival, upgrades,"
+        " peakShots, peakEnemies, peakCoins, frameP50, frameP95, frameP99)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            run["finished"], run["seed"], run["backend"], run["score"], run["wave"], run["coins"], run["survival"],
+            json.dumps(run["upgrades"]), peaks["shots"], peaks["enemies"], peaks["coins"], *percentiles,
+        ),
+    )
+    connection.commit()
+
+
+def scoreWriter(store):
+    try:
+        connection = connectScores(store["path"])
+        store["top"] = queryLeaderboard(connection)  # the menu shows nothing until this lands
+    except sqlite3.Error as error:
+        store["error"] = error
+        return
+    try:
+        while True:
+            run = store["queue"].get()
+            if run is None:
+                break
+            try:
+                saveRun(connection, run)
+                store["top"] = queryLeaderboard(connection)
+            except sqlite3.Error as error:
+                store["error"] = error
+    finally:
+        connection.close()
+
+
+def openScoreStore(path):
+    store = {"path": path, "queue": queue.SimpleQueue(), "top": None, "error": None}
+    store["thread"] = threading.Thread(target=scoreWriter, args=(store,), name="scores", daemon=True)
+    store["thread"].start()
+    return store
+
+
+def submitRun(store, run):
+    store["queue"].put(run)
+
+
+def closeScoreStore(store):
+    # waits for queued runs to land, but never holds up quitting for long
+    store["queue"].put(None)
+    store["thread"].join(timeout=2.0)
+
+
+def topScores(store):
+    return None if store is None else store["top"]
+
+
+def openSession(
+    backend=None, renderMode=None, profile=False, seed=None, recordPath=None, resumePath=None, scoresPath=None
+):
+    # a windowed run plus whatever it records to: input log, keyframes, resume point and high scores
+    state = buildGameState(backend, renderMode=renderMode, seed=seed)
+    if scoresPath:
+        state["scoreStore"] = openScoreStore(scoresPath)
+    prerenderEntitySprites()
+    if profile:
+        enableProfiler(state)
+    resumed = resumePath is not None and loadResumePoint(state, resumePath)
+    session = {
+        "state": state,
+        "log": openInputLog(recordPath, state) if recordPath else None,
+        "keys": open(recordPath + ".keys", "wb") if recordPath else None,
+        "ring": createSnapshotRing() if recordPath or resumePath else None,
+        "resumePath": resumePath,
+        "frameIndex": 0,
+        "ticks": 0,
+        "runFrames": array("f"),  # frame times while the current run is in play
+    }
+    if session["keys"] is not None and resumed:
+        appendKeyframe(session["keys"], 0, snapshotState(state))  # the replay starts where the kiosk did
+    return session
+
+
+def playTick(session, dt, frame):
+    # one fixed tick: record it, reboot if asked, step and keep keyframes
+    if session["log"] is not None:
+        dt, frame = recordInput(session["log"], dt, frame)
+    state = session["state"]
+    if frame["reboot"]:
+        profiler = state["profiler"]
+        state = session["state"] = rebootGame(state)
+        if profiler is not None:
+            state["profiler"], state["timings"] = profiler, {}
+        session["runFrames"] = array("f")
+    wasOver = state["gameOver"]
+    stepGame(state, dt, frame)
+    if state["gameOver"] and not wasOver and state["scoreStore"] is not None:
+        frameTimes, session["runFrames"] = session["runFrames"], array("f")
+        submitRun(state["scoreStore"], runRecord(state, frameTimes))
+    session["frameIndex"] += 1
+    if session["ring"] is not None:
+        keyframe = runPhase(state, "snapshot", tickSnapshots, session["ring"], state, session["frameIndex"], dt)
+        if keyframe is not None:
+            if session["keys"] is not None:
+                appendKeyframe(session["keys"], session["frameIndex"], keyframe)
+            if session["resumePath"] is not None:
+                writeSnapshotFile(session["resumePath"], keyframe)
+
+
+def closeSession(session, frame=None):
+    frame = frame or createInputFrame(quit=True)
+    if session["log"] is not None:
+        recordInput(session["log"], 0.0, frame)
+        closeInputLog(session["log"], session["state"])
+        session["keys"].close()
+    if session["resumePath"] is not None:
+        writeSnapshotFile(session["resumePath"], snapshotState(session["state"]))
+    if session["state"]["scoreStore"] is not None:
+        closeScoreStore(session["state"]["scoreStore"])
+
+
+def handleDebugKeys(state, frame):
+    if frame["toggleProfiler"]:
+        if state["profiler"] is None:
+            enableProfiler(state)
+            beginProfileFrame(state)
+        else:
+            disableProfiler(state)
+    if frame["dumpTrace"]:
+        path = dumpTrace(state)
+        print(f"wrote {path}" if path else "press F3 to start the profiler first")
+
+
+def mergeInputFrame(pending, frame):
+    # held inputs follow the latest frame; presses wait for the next tick to consume them
+    if pending is None:
+        return frame
+    for name in ("start", "dash", "closeShop", "reboot"):
+        frame[name] = frame[name] or pending[name]
+    frame["shopChoice"] = frame["shopChoice"] or pending["shopChoice"]
+    return frame
+
+
+def consumeInputFrame(pending):
+    return dict(pending, start=False, dash=False, closeShop=False, reboot=False, shopChoice=0)
+
+
+def readFrameInput(view, policy):
+    # the player's input, or a scripted policy's when benchmarking
+    if policy is None:
+        return readInputFrame(pygame.event.get())
+    pygame.event.pump()
+    return policy(view)
+
+
+def playSerial(session, simRate=simRate, policy=None, frames=None, maxFps=fps):
+    # the simulation ticks at a fixed simRate whatever the display does; rendering
+    # blends each entity between its last two ticks so motion stays smooth.
+    # Returns the quit frame, or None after frames rendered frames.
+    state = session["state"]
+    step = 1 / simRate
+    accumulator = 0.0
+    pending = None
+    frameTimes = session.get("frameTimes")  # filled in when a benchmark asks for it
+    rendered = 0
+    while frames is None or rendered < frames:
+        rendered += 1
+        frameTime = state["clock"].tick(maxFps) / 1000
+        if frameTimes is not None:
+            frameTimes.append(frameTime)
+        # after a stall, drop time rather than spiral trying to catch up
+        accumulator = min(accumulator + frameTime, maxCatchUpSteps * step)
+        beginProfileFrame(state)
+        frame = runPhase(state, "input", readFrameInput, state, policy)
+        if frame["quit"]:
+            return frame
+        if frame["toggleProfiler"] and state["profiler"] is not None:
+            state["dirtyRects"] = None  # repaint whatever the overlay covered
+        if frame["cycleQuality"]:
+            cycleRenderScale(state)
+        handleDebugKeys(state, frame)
+        pending = mergeInputFrame(pending, frame)
+        while accumulator >= step:
+            accumulator -= step
+            tick, pending = pending, consumeInputFrame(pending)
+            playTick(session, step, tick)
+            session["ticks"] += 1
+            state = session["state"]
+        if state["interpolate"]:
+            session["runFrames"].append(frameTime)
+        dirty = renderGame(state["screen"], state, accumulator / step)
+        runPhase(state, "flip", presentFrame, state, dirty)
+        endProfileFrame(state, frameTime)
+    return None
+
+
+# pipelined mode: the simulation ticks on a worker thread and publishes render
+# snapshots into three rotating buffers. The main thread pumps input into a
+# queue, takes the latest buffer under the lock and draws it outside the lock,
+# while the worker fills the third, so pygame's GIL-free blits overlap the next
+# tick and neither thread waits on the other's work.
+
+renderKeys = (
+    "backend", "interpolate", "score", "coinsBank", "wave", "menu", "dialog", "shopActive", "shopMessage", "gameOver",
+    "scoreStore",
+)
+
+
+def createRenderBuffer(state):
+    player = copy.copy(state["player"])
+    player.pos, player.prev = pygame.Vector2(player.pos), pygame.Vector2(player.prev)
+    buffer = {"player": player, "records": {kind: [] for kind in entityFields}, "stamp": 0.0}
+    publishRenderState(buffer, state, time.perf_counter())
+    return buffer
+
+
+def mirrorRecords(records, source, kind):
+    # copy every record's fields into reused records so a tick allocates nothing
+    fields = entityFields[kind]
+    recordType = entityTypes[kind]
+    for record in source[len(records):]:
+        # record constructors take their fields in entityFields order; Enemy keeps the pos it is given
+        records.append(recordType(*(
+            pygame.Vector2(getattr(record, field)) if columns > 1 else getattr(record, field)
+            for field, columns in fields.items()
+        )))
+    for mirror, record in zip(records, source):
+        for field, columns in fields.items():
+            if columns > 1:
+                getattr(mirror, field).update(getattr(record, field))
+            else:
+                setattr(mirror, field, getattr(record, field))
+    return records[:len(source)]
+
+
+def mirrorStore(mirror, source):
+    count = source["count"]
+    if mirror is None or len(mirror["pos"]) < count:
+        mirror = createEntityStore(source["kind"], len(source["pos"]))
+    for field in entityFields[source["kind"]]:
+        mirror[field][:count] = source[field][:count]
+    mirror["count"] = count
+    return mirror
+
+
+def publishRenderState(buffer, state, stamp):
+    for key in renderKeys:
+        buffer[key] = state[key]
+    buffer["coinPiles"] = list(state["coinPiles"])
+    buffer["allies"] = []  # co-op hosts run serially
+    buffer["particles"] = None if state["particles"] is None else mirrorParticles(buffer.get("particles"), state["particles"])
+    buffer["shopCards"] = list(state["shopCards"])
+    player, mirror = state["player"], buffer["player"]
+    for name in Player.__slots__:
+        if name in ("pos", "prev"):
+            getattr(mirror, name).update(getattr(player, name))
+        else:
+            setattr(mirror, name, getattr(player, name))
+    for kind in entityFields:
+        if state["backend"] == "numpy":
+            buffer[kind] = mirrorStore(buffer.get(kind), state[kind])
+        else:
+            buffer[kind] = mirrorRecords(buffer["records"][kind], state[kind], kind)
+    profiler = state["profiler"]
+    buffer["profiler"] = None if profiler is None else {
+        "frames": list(profiler["frames"])[-120:],
+        "note": profiler["note"],
+        "noteTimer": profiler["noteTimer"],
+    }
+    buffer["stamp"] = stamp
+
+
+def simulationWorker(session, pipeline, step):
+    try:
+        simulationLoop(session, pipeline, step)
+    except BaseException as error:  # handed to the main thread, which stops drawing
+        pipeline["error"] = error
+
+
+def simulationLoop(session, pipeline, step):
+    # ticks on wall-clock time, draining whatever input arrived since the last tick
+    inputs = pipeline["inputs"]
+    pending = createInputFrame()
+    nextTick = time.perf_counter()
+    while not pipeline["stop"].is_set():
+        now = time.perf_counter()
+        if now < nextTick:
+            time.sleep(nextTick - now)
+            continue
+        nextTick = max(nextTick, now - maxCatchUpSteps * step)
+        while not inputs.empty():
+            frame = inputs.get_nowait()
+            handleDebugKeys(session["state"], frame)
+            pending = mergeInputFrame(pending, frame)
+        tick, pending = pending, consumeInputFrame(pending)
+        beginProfileFrame(session["state"])
+        playTick(session, step, tick)
+        endProfileFrame(session["state"], step)
+        nextTick += step
+        session["ticks"] += 1
+        with pipeline["lock"]:
+            back = ({0, 1, 2} - {pipeline["latest"], pipeline["reading"]}).pop()
+        publishRenderState(pipeline["buffers"][back], session["state"], nextTick - step)
+        with pipeline["lock"]:
+            pipeline["latest"] = back
+
+
+def playPipelined(session, simRate=simRate, policy=None, frames=None, maxFps=fps):
+    state = session["state"]
+    step = 1 / simRate
+    pipeline = {
+        "inputs": queue.SimpleQueue(),
+        "stop": threading.Event(),
+        "lock": threading.Lock(),
+        "buffers": [createRenderBuffer(state) for _ in range(3)],
+        "latest": 0,  # newest complete buffer
+        "reading": 0,  # the buffer being drawn; the worker never writes it or latest
+        "error": None,
+    }
+    # what the renderer owns; the rest of each frame's view comes from the buffer it holds
+    view = {"screen": state["screen"], "renderMode": state["renderMode"], "dirtyRects": None, "timings": None}
+    view.update(pipeline["buffers"][0])
+    worker = threading.Thread(target=simulationWorker, args=(session, pipeline, step), name="simulation", daemon=True)
+    worker.start()
+    frameTimes = session.get("frameTimes")
+    clock = state["clock"]
+    frame = None
+    rendered = 0
+    try:
+        while (frames is None or rendered < frames) and worker.is_alive():
+            rendered += 1
+            frameTime = clock.tick(maxFps) / 1000
+            if frameTimes is not None:
+                frameTimes.append(frameTime)
+            frame = readFrameInput(view, policy)
+            if frame["quit"]:
+                break
+            if frame["toggleProfiler"]:
+                view["dirtyRects"] = None  # repaint whatever the overlay covered
+            if frame["cycleQuality"]:
+                cycleRenderScale(view)  # the display belongs to this thread
+            pipeline["inputs"].put(frame)
+            with pipeline["lock"]:
+                pipeline["reading"] = pipeline["latest"]
+            front = pipeline["buffers"][pipeline["reading"]]
+            view.update(front)
+            alpha = min(1.0, (time.perf_counter() - front["stamp"]) / step)
+            dirty = renderGame(view["screen"], view, alpha)
+            presentFrame(view, dirty)
+            if view["interpolate"]:
+                session["runFrames"].append(frameTime)
+            frame = None
+    finally:
+        pipeline["stop"].set()
+        worker.join()
+    if pipeline["error"] is not None:
+        raise pipeline["error"]
+    return frame
+
+
+def runGame(
+    backend=None,
+    renderMode=None,
+    profile=False,
+    seed=None,
+    recordPath=None,
+    resumePath=None,
+    simRate=simRate,
+    pipelined=False,
+):
+    session = openSession(backend, renderMode, profile, seed, recordPath, resumePath, scorePath)
+    frame = (playPipelined if pipelined else playSerial)(session, simRate)
+    closeSession(session, frame)
+    pygame.quit()
+    sys.exit()
+
+
+def nearestEnemyPos(state):
+    if state["backend"] == "numpy":
+        enemies = state["enemies"]
+        if not enemies["count"]:
+            return None
+        offset = enemies["pos"][:enemies["count"]] - (state["player"].pos.x, state["player"].pos.y)
+        x, y = enemies["pos"][int(np.argmin((offset * offset).sum(axis=1)))]
+        return pygame.Vector2(x, y)
+    if not state["enemies"]:
+        return None
+    return min(state["enemies"], key=lambda enemy: enemy.pos.distance_squared_to(state["player"].pos)).pos
+
+
+def turretPolicy(state):
+    # stand still, shoot at whatever is closest and skip every shop
+    target = nearestEnemyPos(state)
+    return createInputFrame(
+        start=True,
+        fire=target is not None,
+        aim=(target.x, target.y) if target is not None else (width / 2, height / 2),
+        closeShop=True,
+    )
+
+
+def runHeadless(
+    policy=turretPolicy, seconds=60.0, dt=1 / fps, backend=None, rebootOnDeath=False, seed=None, recordPath=None
+):
+    # uncapped simulation with no window; the policy maps the state to an input frame
+    state = buildGameState(backend, headless=True, seed=seed)
+    log = openInputLog(recordPath, state) if recordPath else None
+    keys = open(recordPath + ".keys", "wb") if recordPath else None
+    ring = createSnapshotRing() if recordPath else None
+    frameIndex = 0
+    elapsed = 0.0
+    while elapsed < seconds:
+        frame = policy(state)
+        if rebootOnDeath and state["gameOver"]:
+            frame["reboot"] = True
+        stepDt = dt
+        if log is not None:
+            stepDt, frame = recordInput(log, dt, frame)
+        if frame["reboot"]:
+            state = rebootGame(state)
+        stepGame(state, stepDt, frame)
+        frameIndex += 1
+        if ring is not None:
+            keyframe = tickSnapshots(ring, state, frameIndex, stepDt)
+            if keyframe is not None:
+                appendKeyframe(keys, frameIndex, keyframe)
+        elapsed += dt
+    if log is not None:
+        closeInputLog(log, state)
+        keys.close()
+    return state
+
+
+def replayFrame(state, dt, frame):
+    if frame["reboot"]:
+        state = rebootGame(state)
+    stepGame(state, dt, frame)
+    return state
+
+
+def seekReplay(state, recording, ring, index, target):
+    # jump from frame index to target via the nearest keyframe, simulating only the gap
+    keyframe = findSnapshot(ring, target)
+    if keyframe is not None and (target < index or keyframe[0] > index):
+        restoreSnapshot(state, keyframe[1])
+        index = keyframe[0]
+    elif target < index:
+        state = buildGameState(
+            state["backend"], headless=state["headless"], renderMode=state["renderMode"], seed=recording["seed"]
+        )
+        index = 0
+    frames = recording["frames"]
+    while index < min(target, len(frames)) and not frames[index][1]["quit"]:
+        dt, frame = frames[index]
+        state = replayFrame(state, dt, frame)
+        index += 1
+        tickSnapshots(ring, state, index, dt)
+    state["dirtyRects"] = None
+    return state, index
+
+
+def replayInputLog(path, render=False, backend=None, renderMode=None, seek=None):
+    # re-drive a recorded run: uncapped without a window, or paced at its tick rate with one
+    # (left/right arrows jump 10 s). Keyframes saved next to the log make seeking cheap.
+    recording = readInputLog(path)
+    state = buildGameState(
+        backend or recording["backend"], headless=not render, renderMode=renderMode, seed=recording["seed"]
+    )
+    if render:
+        prerenderEntitySprites()
+    ring = createSnapshotRing()
+    for frameIndex, data in readKeyframes(path + ".keys"):
+        keepSnapshot(ring, frameIndex, data)
+    starting = findSnapshot(ring, 0)
+    if starting is not None:
+        restoreSnapshot(state, starting[1])  # a recording that began from a resume point
+    else:
+        keepSnapshot(ring, 0, snapshotState(state))
+    frames = recording["frames"]
+    clock = [0.0]
+    for dt, _ in frames:
+        clock.append(clock[-1] + dt)
+    index = 0
+    if seek:
+        state, index = seekReplay(state, recording, ring, index, bisect.bisect_left(clock, seek))
+    while index < len(frames):
+        dt, frame = frames[index]
+        if frame["quit"]:
+            break
+        state = replayFrame(state, dt, frame)
+        index += 1
+        tickSnapshots(ring, state, index, dt)
+        if render:
+            jump = 0.0
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return state, recording
+                if event.type == pygame.KEYDOWN and event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                    jump += 10.0 if event.key == pygame.K_RIGHT else -10.0
+            if jump:
+                target = bisect.bisect_left(clock, max(0.0, clock[index] + jump))
+                state, index = seekReplay(state, recording, ring, index, target)
+            presentFrame(state, renderGame(state["screen"], state))
+            state["clock"].tick(1 / dt if dt > 0 else fps)
+    return state, recording
 
 
 def main():
-    runGame()
+    global particleQuality
+    parser = argparse.ArgumentParser(description="Last Hope")
+    parser.add_argument("--backend", choices=["dict", "numpy"])
+    parser.add_argument("--render", choices=["full", "dirty"], help="dirty only repaints regions that changed")
+    parser.add_argument("--headless", action="store_true", help="simulate without a window, as fast as possible")
+    parser.add_argument("--seconds", type=float, default=600.0, help="simulated time for --headless")
+    parser.add_argument("--profile", action="store_true", help="start with the profiler overlay on (F3 toggles it)")
+    parser.add_argument("--seed", type=int, help="seed for the run's random number generator")
+    parser.add_argument("--record", metavar="PATH", help="write every frame's input and dt to an input log")
+    parser.add_argument("--replay", metavar="PATH", help="re-run an input log (uncapped with --headless)")
+    parser.add_argument("--seek", type=float, metavar="SECONDS", help="start a replay this far into the recording")
+    parser.add_argument("--resume", metavar="PATH", help="kiosk mode: resume from and keep saving to this snapshot")
+    parser.add_argument("--sim-rate", type=int, default=simRate, help="fixed simulation ticks per second")
+    parser.add_argument("--pipeline", action="store_true", help="simulate on a worker thread while the main thread draws")
+    parser.add_argument("--render-scale", type=float, default=renderScale,
+                        help="internal resolution as a fraction of the window, e.g. 0.5 (F6 cycles presets)")
+    parser.add_argument("--particles", type=float, default=particleQuality,
+                        help="particle effects quality: 1 is full, 0.5 half the bursts and cap, 0 off")
+    parser.add_argument("--scores", action="store_true", help="print the high-score table and exit")
+    args = parser.parse_args()
+    if args.scores:
+        connection = connectScores(scorePath)
+        for rank, (score, wave, survival, finished) in enumerate(queryLeaderboard(connection, 20), 1):
+            played = time.strftime("%Y-%m-%d %H:%M", time.localtime(finished))
+            print(f"{rank:>3}. {score:>7}  wave {wave:>3}  {survival:7.1f}s  {played}")
+        connection.close()
+        return
+    if args.render_scale != renderScale:
+        setRenderScale(args.render_scale)
+    particleQuality = args.particles
+    if args.replay:
+        started = time.perf_counter()
+        state, recording = replayInputLog(args.replay, not args.headless, args.backend, args.render, args.seek)
+        result = {key: state[key] for key in ("score", "wave", "coinsBank")}
+        print(
+            f"replayed {len(recording['frames'])} frames in {time.perf_counter() - started:.2f}s: "
+            f"score {result['score']} wave {result['wave']} coins {result['coinsBank']}"
+        )
+        if recording["expected"] is not None and recording["expected"] != result:
+            print(f"replay diverged from the recording, which ended at {recording['expected']}")
+            sys.exit(1)
+        return
+    if args.headless:
+        started = time.perf_counter()
+        state = runHeadless(seconds=args.seconds, backend=args.backend, seed=args.seed, recordPath=args.record)
+        print(
+            f"simulated {args.seconds:.0f}s in {time.perf_counter() - started:.2f}s: "
+            f"score {state['score']} wave {state['wave']} coins {state['coinsBank']}"
+        )
+        return
+    runGame(args.backend, args.render, args.profile, args.seed, args.record, args.resume, args.sim_rate, args.pipeline)
 
 
 if __name__ == "__main__":
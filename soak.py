@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import bot
+import main
+
+# hours of simulated play through the normal update path, rebooting with R
+# whenever the bot dies (and every --reboot-minutes regardless). Each window of
+# simulated time reports RSS, traced Python memory, entity counts and tick
+# cost; the run fails if memory or per-tick cost grew past the thresholds.
+
+
+def residentBytes():
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource  # no procfs: peak RSS is the closest we can get
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def entityCounts(state):
+    counts = {kind: main.entityCount(state, kind) for kind in ("shots", "enemies", "coins")}
+    counts["particles"] = 0 if state["particles"] is None else state["particles"]["count"]
+    return counts
+
+
+def soakWindow(run, ticks):
+    # one window of simulated time; returns the tick times
+    dt = 1 / main.fps
+    samples = []
+    for _ in range(ticks):
+        state = run["state"]
+        frame = bot.botFrame(run["bot"], state)
+        run["sinceReboot"] += dt
+        if state["gameOver"] or run["sinceReboot"] >= run["rebootAfter"]:
+            frame["reboot"] = True
+        start = time.perf_counter()
+        if frame["reboot"]:
+            state = run["state"] = main.rebootGame(state)
+            run["reboots"] += 1
+            run["sinceReboot"] = 0.0
+            if state["player"].sprites is not run["sprites"]:
+                run["spriteReloads"] += 1  # a reboot should share the decoded frames, not load them again
+        main.stepGame(state, dt, frame)
+        if run["render"]:
+            main.presentFrame(state, main.renderGame(state["screen"], state))
+        samples.append(time.perf_counter() - start)
+        for kind, count in entityCounts(state).items():
+            run["peaks"][kind] = max(run["peaks"][kind], count)
+    return samples
+
+
+def soak(hours, windowMinutes, backend, seed, spec, rebootMinutes, render, traceFrames):
+    if traceFrames:
+        tracemalloc.start(traceFrames)
+    state = main.buildGameState(backend, headless=not render, seed=seed)
+    if render:
+        main.prerenderEntitySprites()
+    run = {
+        "state": state,
+        "bot": bot.createBot(spec, seed),
+        "render": render,
+        "reboots": 0,
+        "spriteReloads": 0,
+        "sprites": state["player"].sprites,
+        "sinceReboot": 0.0,
+        "rebootAfter": rebootMinutes * 60 if rebootMinutes else float("inf"),
+        "peaks": {kind: 0 for kind in ("shots", "enemies", "coins", "particles")},
+    }
+    windows, baseline = [], None
+    ticks = int(windowMinutes * 60 * main.fps)
+    print(f"{'minute':>7} {'tick ms':>8} {'p99 ms':>7} {'rss MB':>7} {'traced MB':>9} {'reboots':>7}  peak shots/enemies/coins/particles")
+    for index in range(max(1, round(hours * 60 / windowMinutes))):
+        samples = sorted(soakWindow(run, ticks))
+        window = {
+            "minute": (index + 1) * windowMinutes,
+            "tick": sum(samples) / len(samples) * 1000,
+            "p99": main.percentile(samples, 0.99) * 1000,
+            "rss": residentBytes() / 2 ** 20,
+            "traced": tracemalloc.get_traced_memory()[0] / 2 ** 20 if traceFrames else 0.0,
+            "reboots": run["reboots"],
+            "blocks": sys.getallocatedblocks(),
+            "peaks": dict(run["peaks"]),
+            "spriteReloads": run["spriteReloads"],
+        }
+        windows.append(window)
+        run["peaks"] = dict.fromkeys(run["peaks"], 0)
+        if baseline is None and traceFrames:
+            baseline = tracemalloc.take_snapshot()  # after the first window, once caches and pools have warmed up
+        peaks = "/".join(str(count) for count in window["peaks"].values())
+        print(
+            f"{window['minute']:>7g} {window['tick']:8.3f} {window['p99']:7.3f} {window['rss']:7.1f}"
+            f" {window['traced']:9.2f} {window['reboots']:>7}  {peaks}"
+        )
+    growth = []
+    if baseline is not None:
+        ownFrames = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        growth = tracemalloc.take_snapshot().filter_traces(ownFrames).compare_to(baseline.filter_traces(ownFrames), "lineno")
+        tracemalloc.stop()
+    return windows, growth
+
+
+def checkThresholds(windows, maxRssGrowth, maxTracedGrowth, maxTickGrowth):
+    # the first window is warm-up (caches, pools, the allocator's arenas); later ones are judged against the second
+    if len(windows) < 3:
+        return []
+    reference, last = windows[1], windows[-1]
+    failures = []
+    if last["rss"] - reference["rss"] > maxRssGrowth:
+        failures.append(f"RSS grew {last['rss'] - reference['rss']:.1f} MB (limit {maxRssGrowth:g} MB)")
+    if last["traced"] - reference["traced"] > maxTracedGrowth:
+        failures.append(f"traced memory grew {last['traced'] - reference['traced']:.2f} MB (limit {maxTracedGrowth:g} MB)")
+    # the median late window, so one busy window doesn't fail the run
+    late = sorted(window["tick"] for window in windows[len(windows) // 2:])
+    tickRatio = main.percentile(late, 0.5) / reference["tick"]
+    if tickRatio > maxTickGrowth:
+        failures.append(f"tick cost grew {tickRatio:.2f}x (limit {maxTickGrowth:g}x)")
+    if last["spriteReloads"]:
+        failures.append(f"{last['spriteReloads']} reboots loaded the player sprites again")
+    return failures
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Last Hope soak test: hours of bot play, watching for leaks and slowdowns")
+    parser.add_argument("--hours", type=float, default=4.0, help="simulated time to play")
+    parser.add_argument("--window", type=float, default=10.0, help="simulated minutes per report line")
+    parser.add_argument("--bot", choices=list(bot.botPresets), default="soak")
+    parser.add_argument("--backend", choices=["dict", "numpy"])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reboot-minutes", type=float, default=15.0, help="press R this often even if the bot survives (0: never)")
+    parser.add_argument("--render", action="store_true", help="also draw every tick to an off-screen display")
+    parser.add_argument("--trace-frames", type=int, default=1, help="tracemalloc stack depth (0 turns tracing off)")
+    parser.add_argument("--top", type=int, default=10, help="allocation sites to list by growth")
+    parser.add_argument("--max-rss-growth", type=float, default=32.0, help="MB of RSS growth allowed after warm-up")
+    parser.add_argument("--max-traced-growth", type=float, default=8.0, help="MB of traced growth allowed after warm-up")
+    parser.add_argument("--max-tick-growth", type=float, default=1.5, help="allowed ratio of late to early tick cost")
+    parser.add_argument("--out", help="write every window's numbers to this JSON file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+    started = time.perf_counter()
+    windows, growth = soak(
+        args.hours, args.window, args.backend, args.seed, bot.botPresets[args.bot],
+        args.reboot_minutes, args.render, args.trace_frames,
+    )
+    print(f"soaked {args.hours:g} simulated hours in {time.perf_counter() - started:.0f}s")
+    if growth:
+        print(f"top {args.top} allocation sites by growth since the first window:")
+        for stat in growth[:args.top]:
+            print(f"  {stat}")
+    if args.out:
+        with open(args.out, "w") as handle:
+            json.dump({"args": vars(args), "windows": windows}, handle, indent=2)
+    failures = checkThresholds(windows, args.max_rss_growth, args.max_traced_growth, args.max_tick_growth)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        raise SystemExit(1)